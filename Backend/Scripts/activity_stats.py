@@ -0,0 +1,55 @@
+"""
+Maintain the per-user and per-panchayat activity counters
+
+The counters are kept current by triggers on surveys. Use this after bulk
+data fixes made outside the application, or on a schedule to catch drift.
+Run from the Backend directory:
+
+    python Scripts/activity_stats.py check       # report drift, exit 1 if any
+    python Scripts/activity_stats.py reconcile   # correct drifted counters only
+    python Scripts/activity_stats.py rebuild     # recompute everything in bulk
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.activity_stats import rebuild_activity_stats, find_activity_drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["check", "reconcile", "rebuild"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        if args.command == "rebuild":
+            rebuild_activity_stats(db)
+            db.commit()
+            print(f"Activity counters rebuilt in {time.perf_counter() - started:.2f}s")
+            return
+
+        drift = find_activity_drift(db, fix=args.command == "reconcile")
+        db.commit()
+        for entry in drift:
+            print(
+                f"{entry['scope']:<10} {entry['key']:<30} "
+                f"count {entry['stored_count']} -> {entry['actual_count']}  "
+                f"last {entry['stored_last_survey_date']} -> {entry['actual_last_survey_date']}"
+            )
+        action = "corrected" if args.command == "reconcile" else "found"
+        print(f"{len(drift)} drifted counters {action} in {time.perf_counter() - started:.2f}s")
+        if drift and args.command == "check":
+            sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
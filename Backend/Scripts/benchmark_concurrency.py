@@ -0,0 +1,123 @@
+"""
+Concurrent request throughput benchmark
+
+Fires authenticated GET requests at a running server from many concurrent
+clients and reports throughput and latency. Run it once against a build
+with the blocking database session and once with the async one, saving
+each run, then compare:
+
+    python Scripts/benchmark_concurrency.py --output before.json
+    python Scripts/benchmark_concurrency.py --output after.json
+    python Scripts/benchmark_concurrency.py --compare before.json after.json
+
+The gap grows with database latency: with a remote database every blocking
+query stalls the whole worker, while async queries overlap.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DEFAULT_PATHS = ["/api/sync/status", "/api/surveys/changes?limit=50", "/api/schemas"]
+
+
+def login(base_url: str, username: str, password: str) -> str:
+    body = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    with urllib.request.urlopen(f"{base_url}/api/auth/login", data=body) as response:
+        return json.load(response)["access_token"]
+
+
+def run(base_url: str, token: str, paths, concurrency: int, total: int) -> dict:
+    """Send `total` requests cycling through `paths` with `concurrency` workers"""
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def one(i: int):
+        request = urllib.request.Request(f"{base_url}{paths[i % len(paths)]}", headers=headers)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                code = response.status
+        except urllib.error.HTTPError as e:
+            code = e.code
+        return time.perf_counter() - started, code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, code in samples if code >= 400)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2),
+            "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p95": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+            "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        },
+    }
+
+
+def compare(before_file: str, after_file: str):
+    with open(before_file) as f:
+        before = json.load(f)
+    with open(after_file) as f:
+        after = json.load(f)
+
+    print(f"{'concurrency':>12} {'before rps':>12} {'after rps':>12} {'speedup':>9} {'before p95':>11} {'after p95':>10}")
+    for b, a in zip(before, after):
+        print(
+            f"{b['concurrency']:>12} {b['requests_per_second']:>12} {a['requests_per_second']:>12} "
+            f"{a['requests_per_second'] / b['requests_per_second']:>8.2f}x "
+            f"{b['latency_ms']['p95']:>10}ms {a['latency_ms']['p95']:>8}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--path", action="append", dest="paths", help="endpoint to hit (repeatable)")
+    parser.add_argument("--concurrency", type=int, action="append", help="concurrent clients (repeatable)")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per concurrency level")
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    token = login(args.base_url, args.username, args.password)
+    paths = args.paths or DEFAULT_PATHS
+
+    results = []
+    for concurrency in args.concurrency or [1, 10, 50]:
+        run(args.base_url, token, paths, concurrency, min(args.requests, 50))  # warm up
+        result = run(args.base_url, token, paths, concurrency, args.requests)
+        results.append(result)
+        print(
+            f"concurrency={concurrency:<4} {result['requests_per_second']:>8} req/s  "
+            f"p50={result['latency_ms']['p50']}ms  p95={result['latency_ms']['p95']}ms  "
+            f"errors={result['errors']}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
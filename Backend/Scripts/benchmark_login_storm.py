@@ -0,0 +1,173 @@
+"""
+Login storm benchmark
+
+Measures what a burst of logins does to everyone else on the server.
+Probe clients send authenticated GET requests, first on an idle server
+and then while many clients log in back to back. The script reports
+probe p50/p99 latency for both phases, plus login throughput and the
+number of logins shed with 503. Run it against a server started with a
+single worker:
+
+    python Scripts/benchmark_login_storm.py --output after.json
+    python Scripts/benchmark_login_storm.py --compare before.json after.json
+
+With hashing on the event loop every login stalls the probes for the
+full PBKDF2 time. With the hashing pool they only wait behind I/O.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DEFAULT_PATHS = ["/api/sync/status", "/api/schemas", "/api/ping"]
+
+
+def login(base_url: str, username: str, password: str):
+    body = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    try:
+        with urllib.request.urlopen(f"{base_url}/api/auth/login", data=body) as response:
+            return response.status, json.load(response)["access_token"]
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def percentiles(latencies) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"p50": None, "p99": None, "max": None}
+    return {
+        "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 2),
+        "max": round(latencies[-1] * 1000, 2),
+    }
+
+
+def probe(base_url: str, token: str, paths, clients: int, seconds: float) -> dict:
+    """Hit `paths` from `clients` threads for `seconds` and collect latencies"""
+    headers = {"Authorization": f"Bearer {token}"}
+    deadline = time.perf_counter() + seconds
+    latencies, errors = [], []
+
+    def client(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            request = urllib.request.Request(f"{base_url}{paths[i % len(paths)]}", headers=headers)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+            except urllib.error.HTTPError:
+                errors.append(1)
+            latencies.append(time.perf_counter() - started)
+            i += 1
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return {"requests": len(latencies), "errors": len(errors), "latency_ms": percentiles(latencies)}
+
+
+def storm(base_url: str, username: str, password: str, clients: int, stop: threading.Event) -> dict:
+    """Log in from `clients` threads until `stop` is set"""
+    codes, latencies = [], []
+
+    def client(_):
+        while not stop.is_set():
+            started = time.perf_counter()
+            code, _ = login(base_url, username, password)
+            latencies.append(time.perf_counter() - started)
+            codes.append(code)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - started
+    return {
+        "logins": codes.count(200),
+        "shed_503": codes.count(503),
+        "other_errors": sum(1 for code in codes if code not in (200, 503)),
+        "logins_per_second": round(codes.count(200) / elapsed, 1),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def compare(before_file: str, after_file: str):
+    with open(before_file) as f:
+        before = json.load(f)
+    with open(after_file) as f:
+        after = json.load(f)
+
+    print(f"{'':>24} {'before':>10} {'after':>10}")
+    for label, path in [
+        ("idle probe p50 (ms)", ("idle", "latency_ms", "p50")),
+        ("idle probe p99 (ms)", ("idle", "latency_ms", "p99")),
+        ("storm probe p50 (ms)", ("during_storm", "latency_ms", "p50")),
+        ("storm probe p99 (ms)", ("during_storm", "latency_ms", "p99")),
+        ("logins/s", ("logins", "logins_per_second")),
+        ("login p99 (ms)", ("logins", "latency_ms", "p99")),
+    ]:
+        b, a = before, after
+        for key in path:
+            b, a = b[key], a[key]
+        print(f"{label:>24} {b:>10} {a:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--path", action="append", dest="paths", help="probe endpoint (repeatable)")
+    parser.add_argument("--probe-clients", type=int, default=4)
+    parser.add_argument("--login-clients", type=int, default=100, help="concurrent clients logging in")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    code, token = login(args.base_url, args.username, args.password)
+    if token is None:
+        raise SystemExit(f"Login failed with HTTP {code}")
+    paths = args.paths or DEFAULT_PATHS
+
+    probe(args.base_url, token, paths, args.probe_clients, 1)  # warm up
+    idle = probe(args.base_url, token, paths, args.probe_clients, args.seconds)
+
+    stop = threading.Event()
+    logins = {}
+    storm_thread = threading.Thread(target=lambda: logins.update(
+        storm(args.base_url, args.username, args.password, args.login_clients, stop)
+    ))
+    storm_thread.start()
+    time.sleep(1)  # let the storm build up
+    during = probe(args.base_url, token, paths, args.probe_clients, args.seconds)
+    stop.set()
+    storm_thread.join()
+
+    results = {"idle": idle, "during_storm": during, "logins": logins}
+    for label, result in [("idle", idle), ("during storm", during)]:
+        print(
+            f"probes {label:<13} {result['requests']:>6} requests  "
+            f"p50={result['latency_ms']['p50']}ms  p99={result['latency_ms']['p99']}ms  "
+            f"errors={result['errors']}"
+        )
+    print(
+        f"logins {logins['logins']} ok ({logins['logins_per_second']}/s)  shed={logins['shed_503']}  "
+        f"p50={logins['latency_ms']['p50']}ms  p99={logins['latency_ms']['p99']}ms"
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Admin survey search benchmark
+
+Seeds synthetic surveys (1M by default) and creators, then times the old
+leading-wildcard ILIKE search against the indexed search used by
+GET /api/users/surveys, for a few terms. Both must find the same surveys,
+including terms found only inside a word ("pur" in "Rampur"); the script
+exits with an error if they differ. The indexed search needs pg_trgm for
+its indexes. Run from the Backend directory against a scratch database:
+
+    python Scripts/benchmark_search.py --rows 1000000
+    python Scripts/benchmark_search.py --cleanup
+
+Seeded rows use the BENCH_ prefix and are removed with --cleanup.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, desc, or_, text
+from sqlalchemy.dialects import postgresql
+
+from app.database import engine
+from app.models.models import Survey, User
+from app.services.survey_search import search_clause, search_rank
+
+DEFAULT_TERMS = ["phul", "rampur kalan", "bench user 42", "pur", "lera", "zzzz"]
+
+
+def seed(rows: int, users: int):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO panchayats (panchayat_id, name) VALUES ('BENCH_P', 'Benchmark') "
+            "ON CONFLICT DO NOTHING"
+        ))
+        conn.execute(text(
+            "INSERT INTO users (user_id, username, hashed_password, role, full_name, panchayat_id) "
+            "SELECT 'BENCH_U' || g, 'bench_user_' || g, 'x', 'staff', 'Bench User ' || g, 'BENCH_P' "
+            "FROM generate_series(1, :users) g ON CONFLICT DO NOTHING"
+        ), {"users": users})
+        # A handful of real-looking names among random ones
+        conn.execute(text(
+            "INSERT INTO surveys (survey_id, panchayat_id, user_id, village_name, created_at, updated_at, "
+            "version, completion_percentage, is_complete, sync_status) "
+            "SELECT 'BENCH_S' || g, 'BENCH_P', 'BENCH_U' || (g % :users + 1), "
+            "CASE WHEN g % 100000 = 0 THEN 'Phulera' WHEN g % 50000 = 7 THEN 'Rampur Kalan' "
+            "ELSE 'Village ' || md5(g::text) END, "
+            "now() - make_interval(secs => g), now() - make_interval(secs => g), 1, 0, false, 'synced' "
+            "FROM generate_series(1, :rows) g ON CONFLICT DO NOTHING"
+        ), {"rows": rows, "users": users})
+        conn.execute(text("ANALYZE surveys"))
+        conn.execute(text("ANALYZE users"))
+
+
+def cleanup():
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM surveys WHERE survey_id LIKE 'BENCH\\_S%'"))
+        conn.execute(text("DELETE FROM users WHERE user_id LIKE 'BENCH\\_U%'"))
+        conn.execute(text("DELETE FROM panchayats WHERE panchayat_id = 'BENCH_P'"))
+
+
+def ilike_query(term: str):
+    pattern = f"%{term}%"
+    return select(Survey.survey_id).join(User, Survey.user_id == User.user_id).where(or_(
+        Survey.village_name.ilike(pattern), User.username.ilike(pattern), User.full_name.ilike(pattern)
+    )).order_by(desc(Survey.updated_at))
+
+
+def indexed_query(term: str):
+    return select(Survey.survey_id).join(User, Survey.user_id == User.user_id).where(
+        search_clause(term)
+    ).order_by(desc(search_rank(term)), desc(Survey.updated_at))
+
+
+def run_query(query, repeat: int) -> tuple:
+    """(median ms, survey ids of the last run)"""
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            ids = conn.exec_driver_sql(sql.replace("%", "%%")).scalars().all()
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="surveys to seed")
+    parser.add_argument("--users", type=int, default=5000, help="creators to seed")
+    parser.add_argument("--term", action="append", dest="terms", help="search term (repeatable)")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--cleanup", action="store_true", help="remove seeded rows and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        return
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed(args.rows, args.users)
+        print(f"seeded {args.rows} surveys in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'term':<18} {'ilike ms':>10} {'indexed ms':>11} {'speedup':>9} {'hits':>6}")
+    mismatched = []
+    for term in args.terms or DEFAULT_TERMS:
+        ilike_ms, _ = run_query(ilike_query(term).limit(args.limit), args.repeat)
+        indexed_ms, _ = run_query(indexed_query(term).limit(args.limit), args.repeat)
+        # Same rows from both searches, compared in full rather than per page
+        _, ilike_ids = run_query(ilike_query(term), 1)
+        _, indexed_ids = run_query(indexed_query(term), 1)
+        if set(ilike_ids) != set(indexed_ids):
+            mismatched.append(term)
+        print(f"{term:<18} {ilike_ms:>10.1f} {indexed_ms:>11.1f} {ilike_ms / indexed_ms:>8.1f}x "
+              f"{len(indexed_ids):>6}")
+
+    if mismatched:
+        sys.exit(f"ILIKE and indexed search found different surveys for: {', '.join(mismatched)}")
+
+
+if __name__ == "__main__":
+    main()
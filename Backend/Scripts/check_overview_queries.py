@@ -0,0 +1,120 @@
+"""
+Query count regression check for GET /api/users/overview
+
+Seeds synthetic staff with surveys, calls the endpoint in-process and
+counts the SQL statements it runs. The overview must stay a single query
+whatever the number of users; the old per-user lookups ran 3N+2. Exits
+with status 1 on a regression. Run from the Backend directory against a
+scratch database:
+
+    python Scripts/check_overview_queries.py --users 2000
+    python Scripts/check_overview_queries.py --cleanup
+
+Seeded rows use the BENCH_ prefix and are removed with --cleanup.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+
+from app.database import engine, async_engine
+from app.main import app
+from app.utils.security import create_access_token
+
+EXPECTED_QUERIES = 1
+
+
+def seed(users: int, surveys_per_user: int):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO panchayats (panchayat_id, name) VALUES ('BENCH_P', 'Benchmark') "
+            "ON CONFLICT DO NOTHING"
+        ))
+        conn.execute(text(
+            "INSERT INTO users (user_id, username, hashed_password, role, full_name, panchayat_id, "
+            "is_active, created_at) "
+            "SELECT 'BENCH_U' || g, 'bench_user_' || g, 'x', 'staff', 'Bench User ' || g, 'BENCH_P', "
+            "g % 10 <> 0, now() "
+            "FROM generate_series(1, :users) g ON CONFLICT DO NOTHING"
+        ), {"users": users})
+        conn.execute(text(
+            "INSERT INTO surveys (survey_id, panchayat_id, user_id, village_name, created_at, updated_at, "
+            "version, completion_percentage, is_complete, sync_status) "
+            "SELECT 'BENCH_S' || g, 'BENCH_P', 'BENCH_U' || (g % :users + 1), 'Village ' || g, "
+            "now() - make_interval(secs => g), now() - make_interval(secs => g), 1, 0, false, 'synced' "
+            "FROM generate_series(1, :surveys) g ON CONFLICT DO NOTHING"
+        ), {"users": users, "surveys": users * surveys_per_user})
+        conn.execute(text("ANALYZE surveys"))
+        conn.execute(text("ANALYZE users"))
+
+
+def cleanup():
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM surveys WHERE survey_id LIKE 'BENCH\\_S%'"))
+        conn.execute(text("DELETE FROM users WHERE user_id LIKE 'BENCH\\_U%'"))
+        conn.execute(text("DELETE FROM panchayats WHERE panchayat_id = 'BENCH_P'"))
+
+
+def check(params: dict) -> bool:
+    # Admin claims are trusted as signed, so authentication adds no query
+    token = create_access_token({
+        "sub": "bench_admin", "user_id": "BENCH_ADMIN", "role": "admin", "panchayat_id": None, "ver": 0
+    })
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Each TestClient call runs its own event loop; start from a fresh pool
+    async_engine.sync_engine.dispose(close=False)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        started = time.perf_counter()
+        response = TestClient(app).get(
+            "/api/users/overview", params=params, headers={"Authorization": f"Bearer {token}"}
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+    response.raise_for_status()
+    body = response.json()
+    ok = len(statements) == EXPECTED_QUERIES
+    print(
+        f"{'ok  ' if ok else 'FAIL'} {params}: {len(statements)} queries (expected {EXPECTED_QUERIES}), "
+        f"{body['total_users']} users, {len(body['users'])} on page, {elapsed * 1000:.1f}ms"
+    )
+    if not ok:
+        for statement in statements:
+            print("    " + " ".join(statement.split())[:160])
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--surveys-per-user", type=int, default=5)
+    parser.add_argument("--cleanup", action="store_true", help="remove seeded rows and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        return
+
+    seed(args.users, args.surveys_per_user)
+    results = [
+        check({}),
+        check({"limit": 500, "sort_by": "surveys_created", "sort_order": "desc"}),
+        check({"skip": 100, "limit": 50, "sort_by": "last_survey_date"}),
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Stage survey counter deltas and apply them at commit
+
+Revision ID: 2d8f4b6a9c13
+Revises: 7f2c9b4e1d56
+Create Date: 2026-10-18 17:12:44.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2d8f4b6a9c13'
+down_revision = '7f2c9b4e1d56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Triggers on surveys stage their counter deltas; one deferred trigger
+    # sums and applies them at commit, table by table in key order
+    op.execute("""
+CREATE OR REPLACE FUNCTION stage_survey_counter_deltas() RETURNS void AS $$
+BEGIN
+    IF to_regclass('pg_temp.survey_counter_deltas') IS NULL THEN
+        CREATE TEMP TABLE survey_counter_deltas (
+            counter text NOT NULL,  -- list_revision, sync_status, user_activity, panchayat_activity
+            key text,
+            sync_status text,
+            delta bigint NOT NULL,
+            latest timestamp
+        ) ON COMMIT DELETE ROWS;
+        CREATE CONSTRAINT TRIGGER survey_counter_deltas_apply AFTER INSERT ON survey_counter_deltas
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION apply_survey_counter_deltas();
+    END IF;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION user_activity_apply(p_user_id text, p_count bigint,
+                                               p_added_latest timestamp, p_removed_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO user_activity_stats (user_id, surveys_created, last_survey_date)
+    VALUES (p_user_id, p_count, CASE
+        WHEN p_removed_latest IS NULL OR p_removed_latest < p_added_latest THEN p_added_latest
+        WHEN p_added_latest IS NOT NULL THEN (SELECT max(created_at) FROM surveys WHERE surveys.user_id = p_user_id)
+    END)
+    ON CONFLICT (user_id) DO UPDATE SET
+        surveys_created = user_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = CASE
+            WHEN p_removed_latest IS NULL OR p_removed_latest < user_activity_stats.last_survey_date
+                THEN GREATEST(user_activity_stats.last_survey_date, EXCLUDED.last_survey_date)
+            ELSE (SELECT max(created_at) FROM surveys WHERE surveys.user_id = p_user_id)
+        END
+$$;
+
+CREATE OR REPLACE FUNCTION panchayat_activity_apply(p_panchayat_id text, p_count bigint,
+                                                    p_added_latest timestamp, p_removed_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO panchayat_activity_stats (panchayat_id, surveys_created, last_survey_date)
+    VALUES (p_panchayat_id, p_count, CASE
+        WHEN p_removed_latest IS NULL OR p_removed_latest < p_added_latest THEN p_added_latest
+        WHEN p_added_latest IS NOT NULL THEN (SELECT max(created_at) FROM surveys WHERE surveys.panchayat_id = p_panchayat_id)
+    END)
+    ON CONFLICT (panchayat_id) DO UPDATE SET
+        surveys_created = panchayat_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = CASE
+            WHEN p_removed_latest IS NULL OR p_removed_latest < panchayat_activity_stats.last_survey_date
+                THEN GREATEST(panchayat_activity_stats.last_survey_date, EXCLUDED.last_survey_date)
+            ELSE (SELECT max(created_at) FROM surveys WHERE surveys.panchayat_id = p_panchayat_id)
+        END
+$$;
+
+CREATE OR REPLACE FUNCTION apply_survey_counter_deltas() RETURNS trigger AS $$
+BEGIN
+    -- Fires once per staged row; the first call applies them all
+    IF NOT EXISTS (SELECT 1 FROM pg_temp.survey_counter_deltas) THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO survey_list_revisions (panchayat_id, revision)
+    SELECT DISTINCT key, 1 FROM pg_temp.survey_counter_deltas
+    WHERE counter = 'list_revision' ORDER BY 1
+    ON CONFLICT (panchayat_id) DO UPDATE SET revision = survey_list_revisions.revision + 1;
+
+    INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+    SELECT key, sync_status, sum(delta) FROM pg_temp.survey_counter_deltas
+    WHERE counter = 'sync_status'
+    GROUP BY 1, 2 HAVING sum(delta) <> 0 ORDER BY 1, 2
+    ON CONFLICT (panchayat_id, sync_status)
+    DO UPDATE SET survey_count = sync_status_counts.survey_count + EXCLUDED.survey_count;
+
+    PERFORM user_activity_apply(key, sum(delta)::bigint,
+                                max(latest) FILTER (WHERE delta > 0), max(latest) FILTER (WHERE delta < 0))
+    FROM pg_temp.survey_counter_deltas WHERE counter = 'user_activity'
+    GROUP BY key ORDER BY key;
+
+    PERFORM panchayat_activity_apply(key, sum(delta)::bigint,
+                                     max(latest) FILTER (WHERE delta > 0), max(latest) FILTER (WHERE delta < 0))
+    FROM pg_temp.survey_counter_deltas WHERE counter = 'panchayat_activity'
+    GROUP BY key ORDER BY key;
+
+    DELETE FROM pg_temp.survey_counter_deltas;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION surveys_bump_list_revision() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta)
+        SELECT DISTINCT 'list_revision', panchayat_id, 1 FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta)
+        SELECT 'list_revision', panchayat_id, 1 FROM (
+            SELECT panchayat_id FROM old_rows UNION SELECT panchayat_id FROM new_rows
+        ) touched;
+    ELSE
+        INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta)
+        SELECT DISTINCT 'list_revision', panchayat_id, 1 FROM old_rows;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, sync_status, delta)
+    SELECT 'sync_status', panchayat_id, COALESCE(sync_status, 'unknown'), count(*)
+    FROM new_rows GROUP BY 2, 3;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_update() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, sync_status, delta)
+    SELECT 'sync_status', panchayat_id, status, sum(delta) FROM (
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown') AS status, -1 AS delta FROM old_rows
+        UNION ALL
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown') AS status, 1 AS delta FROM new_rows
+    ) changes
+    GROUP BY 2, 3 HAVING sum(delta) <> 0;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, sync_status, delta)
+    SELECT 'sync_status', panchayat_id, COALESCE(sync_status, 'unknown'), -count(*)
+    FROM old_rows GROUP BY 2, 3;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta, latest)
+    SELECT 'user_activity', user_id, count(*), max(created_at) FROM new_rows GROUP BY 2
+    UNION ALL
+    SELECT 'panchayat_activity', panchayat_id, count(*), max(created_at) FROM new_rows GROUP BY 2;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta, latest)
+    SELECT 'user_activity', user_id, -count(*), max(created_at) FROM old_rows GROUP BY 2
+    UNION ALL
+    SELECT 'panchayat_activity', panchayat_id, -count(*), max(created_at) FROM old_rows GROUP BY 2;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_reassign() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta, latest) VALUES
+        ('user_activity', OLD.user_id, -1, OLD.created_at),
+        ('user_activity', NEW.user_id, 1, NEW.created_at),
+        ('panchayat_activity', OLD.panchayat_id, -1, OLD.created_at),
+        ('panchayat_activity', NEW.panchayat_id, 1, NEW.created_at);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS user_activity_add(text, bigint, timestamp);
+DROP FUNCTION IF EXISTS user_activity_remove(text, bigint, timestamp);
+DROP FUNCTION IF EXISTS panchayat_activity_add(text, bigint, timestamp);
+DROP FUNCTION IF EXISTS panchayat_activity_remove(text, bigint, timestamp);
+""")
+
+
+def downgrade() -> None:
+    # Back to counters updated by each statement
+    op.execute("""
+CREATE OR REPLACE FUNCTION user_activity_add(p_user_id text, p_count bigint, p_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO user_activity_stats (user_id, surveys_created, last_survey_date)
+    VALUES (p_user_id, p_count, p_latest)
+    ON CONFLICT (user_id) DO UPDATE SET
+        surveys_created = user_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = GREATEST(user_activity_stats.last_survey_date, EXCLUDED.last_survey_date)
+$$;
+
+CREATE OR REPLACE FUNCTION user_activity_remove(p_user_id text, p_count bigint, p_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO user_activity_stats (user_id, surveys_created, last_survey_date)
+    VALUES (p_user_id, -p_count, NULL)
+    ON CONFLICT (user_id) DO UPDATE SET
+        surveys_created = user_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = CASE
+            WHEN p_latest < user_activity_stats.last_survey_date THEN user_activity_stats.last_survey_date
+            ELSE (SELECT max(created_at) FROM surveys WHERE surveys.user_id = p_user_id)
+        END
+$$;
+
+CREATE OR REPLACE FUNCTION panchayat_activity_add(p_panchayat_id text, p_count bigint, p_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO panchayat_activity_stats (panchayat_id, surveys_created, last_survey_date)
+    VALUES (p_panchayat_id, p_count, p_latest)
+    ON CONFLICT (panchayat_id) DO UPDATE SET
+        surveys_created = panchayat_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = GREATEST(panchayat_activity_stats.last_survey_date, EXCLUDED.last_survey_date)
+$$;
+
+CREATE OR REPLACE FUNCTION panchayat_activity_remove(p_panchayat_id text, p_count bigint, p_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO panchayat_activity_stats (panchayat_id, surveys_created, last_survey_date)
+    VALUES (p_panchayat_id, -p_count, NULL)
+    ON CONFLICT (panchayat_id) DO UPDATE SET
+        surveys_created = panchayat_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = CASE
+            WHEN p_latest < panchayat_activity_stats.last_survey_date THEN panchayat_activity_stats.last_survey_date
+            ELSE (SELECT max(created_at) FROM surveys WHERE surveys.panchayat_id = p_panchayat_id)
+        END
+$$;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM user_activity_add(user_id, count(*), max(created_at))
+    FROM new_rows GROUP BY user_id ORDER BY user_id;
+    PERFORM panchayat_activity_add(panchayat_id, count(*), max(created_at))
+    FROM new_rows GROUP BY panchayat_id ORDER BY panchayat_id;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM user_activity_remove(user_id, count(*), max(created_at))
+    FROM old_rows GROUP BY user_id ORDER BY user_id;
+    PERFORM panchayat_activity_remove(panchayat_id, count(*), max(created_at))
+    FROM old_rows GROUP BY panchayat_id ORDER BY panchayat_id;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_reassign() RETURNS trigger AS $$
+BEGIN
+    PERFORM user_activity_remove(OLD.user_id, 1, OLD.created_at);
+    PERFORM user_activity_add(NEW.user_id, 1, NEW.created_at);
+    PERFORM panchayat_activity_remove(OLD.panchayat_id, 1, OLD.created_at);
+    PERFORM panchayat_activity_add(NEW.panchayat_id, 1, NEW.created_at);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+    SELECT panchayat_id, COALESCE(sync_status, 'unknown'), count(*)
+    FROM new_rows GROUP BY 1, 2 ORDER BY 1, 2
+    ON CONFLICT (panchayat_id, sync_status)
+    DO UPDATE SET survey_count = sync_status_counts.survey_count + EXCLUDED.survey_count;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_update() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+    SELECT panchayat_id, status, sum(delta) FROM (
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown') AS status, -1 AS delta FROM old_rows
+        UNION ALL
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown') AS status, 1 AS delta FROM new_rows
+    ) changes
+    GROUP BY 1, 2 HAVING sum(delta) <> 0 ORDER BY 1, 2
+    ON CONFLICT (panchayat_id, sync_status)
+    DO UPDATE SET survey_count = sync_status_counts.survey_count + EXCLUDED.survey_count;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_delete() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+    SELECT panchayat_id, COALESCE(sync_status, 'unknown'), -count(*)
+    FROM old_rows GROUP BY 1, 2 ORDER BY 1, 2
+    ON CONFLICT (panchayat_id, sync_status)
+    DO UPDATE SET survey_count = sync_status_counts.survey_count + EXCLUDED.survey_count;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION surveys_bump_list_revision() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO survey_list_revisions (panchayat_id, revision)
+        SELECT DISTINCT panchayat_id, 1 FROM new_rows ORDER BY 1
+        ON CONFLICT (panchayat_id) DO UPDATE SET revision = survey_list_revisions.revision + 1;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO survey_list_revisions (panchayat_id, revision)
+        SELECT panchayat_id, 1 FROM (
+            SELECT panchayat_id FROM old_rows UNION SELECT panchayat_id FROM new_rows
+        ) touched ORDER BY 1
+        ON CONFLICT (panchayat_id) DO UPDATE SET revision = survey_list_revisions.revision + 1;
+    ELSE
+        INSERT INTO survey_list_revisions (panchayat_id, revision)
+        SELECT DISTINCT panchayat_id, 1 FROM old_rows ORDER BY 1
+        ON CONFLICT (panchayat_id) DO UPDATE SET revision = survey_list_revisions.revision + 1;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+""")
+    op.execute("DROP FUNCTION IF EXISTS apply_survey_counter_deltas()")
+    op.execute("DROP FUNCTION IF EXISTS stage_survey_counter_deltas()")
+    op.execute("DROP FUNCTION IF EXISTS user_activity_apply(text, bigint, timestamp, timestamp)")
+    op.execute("DROP FUNCTION IF EXISTS panchayat_activity_apply(text, bigint, timestamp, timestamp)")
@@ -0,0 +1,87 @@
+"""Add survey change feed
+
+Revision ID: 3f7a0c5d9e12
+Revises: 8d41c6f2e7b3
+Create Date: 2026-10-17 12:41:52.907634
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3f7a0c5d9e12'
+down_revision = '8d41c6f2e7b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('surveys', sa.Column('change_xid', sa.BigInteger(), nullable=True))
+    op.add_column('surveys', sa.Column('change_seq', sa.BigInteger(), nullable=True))
+    op.create_table('survey_tombstones',
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('panchayat_id', sa.String(length=50), nullable=False),
+    sa.Column('change_xid', sa.BigInteger(), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('survey_id')
+    )
+    op.execute("""
+CREATE SEQUENCE IF NOT EXISTS survey_change_seq;
+
+CREATE OR REPLACE FUNCTION surveys_stamp_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    NEW.change_seq := nextval('survey_change_seq');
+    IF TG_OP = 'INSERT' THEN
+        DELETE FROM survey_tombstones WHERE survey_id = NEW.survey_id;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION surveys_record_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO survey_tombstones (survey_id, panchayat_id, change_xid, change_seq, deleted_at)
+    VALUES (OLD.survey_id, OLD.panchayat_id, pg_current_xact_id()::text::bigint,
+            nextval('survey_change_seq'), now() AT TIME ZONE 'utc')
+    ON CONFLICT (survey_id) DO UPDATE SET
+        panchayat_id = EXCLUDED.panchayat_id,
+        change_xid = EXCLUDED.change_xid,
+        change_seq = EXCLUDED.change_seq,
+        deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_change_stamp') THEN
+        CREATE TRIGGER surveys_change_stamp BEFORE INSERT OR UPDATE ON surveys
+        FOR EACH ROW EXECUTE FUNCTION surveys_stamp_change();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_change_tombstone') THEN
+        CREATE TRIGGER surveys_change_tombstone AFTER DELETE ON surveys
+        FOR EACH ROW EXECUTE FUNCTION surveys_record_tombstone();
+    END IF;
+END $$;
+""")
+    # Stamp existing surveys through the new trigger
+    op.execute("UPDATE surveys SET change_seq = NULL")
+    op.create_index('ix_surveys_panchayat_change', 'surveys', ['panchayat_id', 'change_xid', 'change_seq'], unique=False)
+    op.create_index('ix_surveys_change', 'surveys', ['change_xid', 'change_seq'], unique=False)
+    op.create_index('ix_survey_tombstones_panchayat_change', 'survey_tombstones', ['panchayat_id', 'change_xid', 'change_seq'], unique=False)
+    op.create_index('ix_survey_tombstones_change', 'survey_tombstones', ['change_xid', 'change_seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS surveys_change_stamp ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_change_tombstone ON surveys")
+    op.execute("DROP FUNCTION IF EXISTS surveys_stamp_change()")
+    op.execute("DROP FUNCTION IF EXISTS surveys_record_tombstone()")
+    op.execute("DROP SEQUENCE IF EXISTS survey_change_seq")
+    op.drop_index('ix_survey_tombstones_change', table_name='survey_tombstones')
+    op.drop_index('ix_survey_tombstones_panchayat_change', table_name='survey_tombstones')
+    op.drop_table('survey_tombstones')
+    op.drop_index('ix_surveys_change', table_name='surveys')
+    op.drop_index('ix_surveys_panchayat_change', table_name='surveys')
+    op.drop_column('surveys', 'change_seq')
+    op.drop_column('surveys', 'change_xid')
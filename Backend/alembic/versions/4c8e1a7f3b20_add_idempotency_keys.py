@@ -0,0 +1,35 @@
+"""Add idempotency keys
+
+Revision ID: 4c8e1a7f3b20
+Revises: b8e3f1c5d742
+Create Date: 2026-10-18 09:12:40.215871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '4c8e1a7f3b20'
+down_revision = 'b8e3f1c5d742'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('idempotency_keys',
+    sa.Column('key', sa.Text(), nullable=False),
+    sa.Column('user_id', sa.String(length=50), nullable=False),
+    sa.Column('request_hash', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('response', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_idempotency_keys_user_id'), 'idempotency_keys', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_idempotency_keys_user_id'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,94 @@
+"""Add sync status counters
+
+Revision ID: 5e2b7d90a4c1
+Revises: c0940043b15a
+Create Date: 2026-10-17 10:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5e2b7d90a4c1'
+down_revision = 'c0940043b15a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sync_status_counts',
+    sa.Column('panchayat_id', sa.String(length=50), nullable=False),
+    sa.Column('sync_status', sa.String(length=20), nullable=False),
+    sa.Column('survey_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('panchayat_id', 'sync_status')
+    )
+    # Statement-level triggers on surveys; the first install backfills the counters
+    op.execute("""
+CREATE OR REPLACE FUNCTION sync_status_counts_on_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+    SELECT panchayat_id, COALESCE(sync_status, 'unknown'), count(*)
+    FROM new_rows GROUP BY 1, 2 ORDER BY 1, 2
+    ON CONFLICT (panchayat_id, sync_status)
+    DO UPDATE SET survey_count = sync_status_counts.survey_count + EXCLUDED.survey_count;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_update() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+    SELECT panchayat_id, status, sum(delta) FROM (
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown') AS status, -1 AS delta FROM old_rows
+        UNION ALL
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown') AS status, 1 AS delta FROM new_rows
+    ) changes
+    GROUP BY 1, 2 HAVING sum(delta) <> 0 ORDER BY 1, 2
+    ON CONFLICT (panchayat_id, sync_status)
+    DO UPDATE SET survey_count = sync_status_counts.survey_count + EXCLUDED.survey_count;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_delete() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+    SELECT panchayat_id, COALESCE(sync_status, 'unknown'), -count(*)
+    FROM old_rows GROUP BY 1, 2 ORDER BY 1, 2
+    ON CONFLICT (panchayat_id, sync_status)
+    DO UPDATE SET survey_count = sync_status_counts.survey_count + EXCLUDED.survey_count;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_sync_counts_insert') THEN
+        CREATE TRIGGER surveys_sync_counts_insert AFTER INSERT ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_status_counts_on_insert();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_sync_counts_update') THEN
+        CREATE TRIGGER surveys_sync_counts_update AFTER UPDATE ON surveys
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_status_counts_on_update();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_sync_counts_delete') THEN
+        CREATE TRIGGER surveys_sync_counts_delete AFTER DELETE ON surveys
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_status_counts_on_delete();
+        -- First install on an existing database: backfill the counters
+        DELETE FROM sync_status_counts;
+        INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown'), count(*)
+        FROM surveys GROUP BY 1, 2;
+    END IF;
+END $$;
+""")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS surveys_sync_counts_insert ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_sync_counts_update ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_sync_counts_delete ON surveys")
+    op.execute("DROP FUNCTION IF EXISTS sync_status_counts_on_insert()")
+    op.execute("DROP FUNCTION IF EXISTS sync_status_counts_on_update()")
+    op.execute("DROP FUNCTION IF EXISTS sync_status_counts_on_delete()")
+    op.drop_table('sync_status_counts')
@@ -0,0 +1,71 @@
+"""Add survey change notification triggers
+
+Revision ID: 6b9e2d4a8f10
+Revises: 3f7a0c5d9e12
+Create Date: 2026-10-17 13:20:08.114273
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6b9e2d4a8f10'
+down_revision = '3f7a0c5d9e12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+CREATE OR REPLACE FUNCTION surveys_notify_change() RETURNS trigger AS $$
+DECLARE
+    changed record;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        FOR changed IN
+            SELECT panchayat_id, currval('survey_change_seq') AS version
+            FROM old_rows GROUP BY panchayat_id
+        LOOP
+            PERFORM pg_notify('sampark_changes', json_build_object(
+                'type', 'survey', 'panchayat_id', changed.panchayat_id, 'version', changed.version
+            )::text);
+        END LOOP;
+    ELSE
+        FOR changed IN
+            SELECT panchayat_id, max(change_seq) AS version
+            FROM new_rows GROUP BY panchayat_id
+        LOOP
+            PERFORM pg_notify('sampark_changes', json_build_object(
+                'type', 'survey', 'panchayat_id', changed.panchayat_id, 'version', changed.version
+            )::text);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_notify_insert') THEN
+        CREATE TRIGGER surveys_notify_insert AFTER INSERT ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_notify_change();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_notify_update') THEN
+        CREATE TRIGGER surveys_notify_update AFTER UPDATE ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_notify_change();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_notify_delete') THEN
+        CREATE TRIGGER surveys_notify_delete AFTER DELETE ON surveys
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_notify_change();
+    END IF;
+END $$;
+""")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS surveys_notify_insert ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_notify_update ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_notify_delete ON surveys")
+    op.execute("DROP FUNCTION IF EXISTS surveys_notify_change()")
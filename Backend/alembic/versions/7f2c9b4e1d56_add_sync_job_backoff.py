@@ -0,0 +1,29 @@
+"""Add sync job retry backoff; cascade sync jobs with their user
+
+Revision ID: 7f2c9b4e1d56
+Revises: 4c8e1a7f3b20
+Create Date: 2026-10-18 14:36:02.907154
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7f2c9b4e1d56'
+down_revision = '4c8e1a7f3b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sync_jobs', sa.Column('available_at', sa.DateTime(), nullable=True))
+    op.drop_constraint('sync_jobs_user_id_fkey', 'sync_jobs', type_='foreignkey')
+    op.create_foreign_key('sync_jobs_user_id_fkey', 'sync_jobs', 'users', ['user_id'], ['user_id'], ondelete='CASCADE')
+    op.create_index(op.f('ix_sync_jobs_user_id'), 'sync_jobs', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_sync_jobs_user_id'), table_name='sync_jobs')
+    op.drop_constraint('sync_jobs_user_id_fkey', 'sync_jobs', type_='foreignkey')
+    op.create_foreign_key('sync_jobs_user_id_fkey', 'sync_jobs', 'users', ['user_id'], ['user_id'])
+    op.drop_column('sync_jobs', 'available_at')
@@ -0,0 +1,42 @@
+"""Add sync jobs queue
+
+Revision ID: 8d41c6f2e7b3
+Revises: 5e2b7d90a4c1
+Create Date: 2026-10-17 11:20:05.318470
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8d41c6f2e7b3'
+down_revision = '5e2b7d90a4c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sync_jobs',
+    sa.Column('job_id', sa.String(length=50), nullable=False),
+    sa.Column('user_id', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('results', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('summary', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index(op.f('ix_sync_jobs_job_id'), 'sync_jobs', ['job_id'], unique=False)
+    op.create_index('ix_sync_jobs_status_created_at', 'sync_jobs', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_jobs_status_created_at', table_name='sync_jobs')
+    op.drop_index(op.f('ix_sync_jobs_job_id'), table_name='sync_jobs')
+    op.drop_table('sync_jobs')
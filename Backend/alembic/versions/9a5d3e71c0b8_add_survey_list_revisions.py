@@ -0,0 +1,71 @@
+"""Add survey list revisions
+
+Revision ID: 9a5d3e71c0b8
+Revises: e4c81b3f5a27
+Create Date: 2026-10-17 14:48:10.271934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9a5d3e71c0b8'
+down_revision = 'e4c81b3f5a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('survey_list_revisions',
+    sa.Column('panchayat_id', sa.String(length=50), nullable=False),
+    sa.Column('revision', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('panchayat_id')
+    )
+    op.execute("""
+CREATE OR REPLACE FUNCTION surveys_bump_list_revision() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO survey_list_revisions (panchayat_id, revision)
+        SELECT DISTINCT panchayat_id, 1 FROM new_rows ORDER BY 1
+        ON CONFLICT (panchayat_id) DO UPDATE SET revision = survey_list_revisions.revision + 1;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO survey_list_revisions (panchayat_id, revision)
+        SELECT panchayat_id, 1 FROM (
+            SELECT panchayat_id FROM old_rows UNION SELECT panchayat_id FROM new_rows
+        ) touched ORDER BY 1
+        ON CONFLICT (panchayat_id) DO UPDATE SET revision = survey_list_revisions.revision + 1;
+    ELSE
+        INSERT INTO survey_list_revisions (panchayat_id, revision)
+        SELECT DISTINCT panchayat_id, 1 FROM old_rows ORDER BY 1
+        ON CONFLICT (panchayat_id) DO UPDATE SET revision = survey_list_revisions.revision + 1;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_list_revision_insert') THEN
+        CREATE TRIGGER surveys_list_revision_insert AFTER INSERT ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_bump_list_revision();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_list_revision_update') THEN
+        CREATE TRIGGER surveys_list_revision_update AFTER UPDATE ON surveys
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_bump_list_revision();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_list_revision_delete') THEN
+        CREATE TRIGGER surveys_list_revision_delete AFTER DELETE ON surveys
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_bump_list_revision();
+    END IF;
+END $$;
+""")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS surveys_list_revision_insert ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_list_revision_update ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_list_revision_delete ON surveys")
+    op.execute("DROP FUNCTION IF EXISTS surveys_bump_list_revision()")
+    op.drop_table('survey_list_revisions')
@@ -0,0 +1,146 @@
+"""Add activity stats
+
+Revision ID: b8e3f1c5d742
+Revises: a7d2e94b6c31
+Create Date: 2026-10-17 19:21:48.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b8e3f1c5d742'
+down_revision = 'a7d2e94b6c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_activity_stats',
+    sa.Column('user_id', sa.String(length=50), nullable=False),
+    sa.Column('surveys_created', sa.Integer(), nullable=False),
+    sa.Column('last_survey_date', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('panchayat_activity_stats',
+    sa.Column('panchayat_id', sa.String(length=50), nullable=False),
+    sa.Column('surveys_created', sa.Integer(), nullable=False),
+    sa.Column('last_survey_date', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('panchayat_id')
+    )
+    # Triggers on surveys; the first install backfills the counters
+    op.execute("""
+CREATE OR REPLACE FUNCTION user_activity_add(p_user_id text, p_count bigint, p_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO user_activity_stats (user_id, surveys_created, last_survey_date)
+    VALUES (p_user_id, p_count, p_latest)
+    ON CONFLICT (user_id) DO UPDATE SET
+        surveys_created = user_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = GREATEST(user_activity_stats.last_survey_date, EXCLUDED.last_survey_date)
+$$;
+
+CREATE OR REPLACE FUNCTION user_activity_remove(p_user_id text, p_count bigint, p_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO user_activity_stats (user_id, surveys_created, last_survey_date)
+    VALUES (p_user_id, -p_count, NULL)
+    ON CONFLICT (user_id) DO UPDATE SET
+        surveys_created = user_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = CASE
+            WHEN p_latest < user_activity_stats.last_survey_date THEN user_activity_stats.last_survey_date
+            ELSE (SELECT max(created_at) FROM surveys WHERE surveys.user_id = p_user_id)
+        END
+$$;
+
+CREATE OR REPLACE FUNCTION panchayat_activity_add(p_panchayat_id text, p_count bigint, p_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO panchayat_activity_stats (panchayat_id, surveys_created, last_survey_date)
+    VALUES (p_panchayat_id, p_count, p_latest)
+    ON CONFLICT (panchayat_id) DO UPDATE SET
+        surveys_created = panchayat_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = GREATEST(panchayat_activity_stats.last_survey_date, EXCLUDED.last_survey_date)
+$$;
+
+CREATE OR REPLACE FUNCTION panchayat_activity_remove(p_panchayat_id text, p_count bigint, p_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO panchayat_activity_stats (panchayat_id, surveys_created, last_survey_date)
+    VALUES (p_panchayat_id, -p_count, NULL)
+    ON CONFLICT (panchayat_id) DO UPDATE SET
+        surveys_created = panchayat_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = CASE
+            WHEN p_latest < panchayat_activity_stats.last_survey_date THEN panchayat_activity_stats.last_survey_date
+            ELSE (SELECT max(created_at) FROM surveys WHERE surveys.panchayat_id = p_panchayat_id)
+        END
+$$;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM user_activity_add(user_id, count(*), max(created_at))
+    FROM new_rows GROUP BY user_id ORDER BY user_id;
+    PERFORM panchayat_activity_add(panchayat_id, count(*), max(created_at))
+    FROM new_rows GROUP BY panchayat_id ORDER BY panchayat_id;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM user_activity_remove(user_id, count(*), max(created_at))
+    FROM old_rows GROUP BY user_id ORDER BY user_id;
+    PERFORM panchayat_activity_remove(panchayat_id, count(*), max(created_at))
+    FROM old_rows GROUP BY panchayat_id ORDER BY panchayat_id;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_reassign() RETURNS trigger AS $$
+BEGIN
+    PERFORM user_activity_remove(OLD.user_id, 1, OLD.created_at);
+    PERFORM user_activity_add(NEW.user_id, 1, NEW.created_at);
+    PERFORM panchayat_activity_remove(OLD.panchayat_id, 1, OLD.created_at);
+    PERFORM panchayat_activity_add(NEW.panchayat_id, 1, NEW.created_at);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_activity_insert') THEN
+        CREATE TRIGGER surveys_activity_insert AFTER INSERT ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION activity_stats_on_insert();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_activity_reassign') THEN
+        CREATE TRIGGER surveys_activity_reassign AFTER UPDATE OF user_id, panchayat_id, created_at ON surveys
+        FOR EACH ROW WHEN (
+            OLD.user_id IS DISTINCT FROM NEW.user_id
+            OR OLD.panchayat_id IS DISTINCT FROM NEW.panchayat_id
+            OR OLD.created_at IS DISTINCT FROM NEW.created_at
+        )
+        EXECUTE FUNCTION activity_stats_on_reassign();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_activity_delete') THEN
+        CREATE TRIGGER surveys_activity_delete AFTER DELETE ON surveys
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION activity_stats_on_delete();
+        -- First install on an existing database: backfill the counters
+        DELETE FROM user_activity_stats;
+        INSERT INTO user_activity_stats (user_id, surveys_created, last_survey_date)
+        SELECT user_id, count(*), max(created_at) FROM surveys GROUP BY 1;
+        DELETE FROM panchayat_activity_stats;
+        INSERT INTO panchayat_activity_stats (panchayat_id, surveys_created, last_survey_date)
+        SELECT panchayat_id, count(*), max(created_at) FROM surveys GROUP BY 1;
+    END IF;
+END $$;
+""")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS surveys_activity_insert ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_activity_reassign ON surveys")
+    op.execute("DROP TRIGGER IF EXISTS surveys_activity_delete ON surveys")
+    op.execute("DROP FUNCTION IF EXISTS activity_stats_on_insert()")
+    op.execute("DROP FUNCTION IF EXISTS activity_stats_on_delete()")
+    op.execute("DROP FUNCTION IF EXISTS activity_stats_on_reassign()")
+    op.execute("DROP FUNCTION IF EXISTS user_activity_add(text, bigint, timestamp)")
+    op.execute("DROP FUNCTION IF EXISTS user_activity_remove(text, bigint, timestamp)")
+    op.execute("DROP FUNCTION IF EXISTS panchayat_activity_add(text, bigint, timestamp)")
+    op.execute("DROP FUNCTION IF EXISTS panchayat_activity_remove(text, bigint, timestamp)")
+    op.drop_table('panchayat_activity_stats')
+    op.drop_table('user_activity_stats')
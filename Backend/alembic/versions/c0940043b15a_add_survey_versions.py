@@ -0,0 +1,31 @@
+"""Add survey versions for three-way merge
+
+Revision ID: c0940043b15a
+Revises: a14e6300cf9e
+Create Date: 2026-10-17 09:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'c0940043b15a'
+down_revision = 'a14e6300cf9e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('survey_versions',
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['survey_id'], ['surveys.survey_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('survey_id', 'version')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('survey_versions')
@@ -0,0 +1,50 @@
+"""Add survey answer filter indexes
+
+Revision ID: c27b8f4d1a63
+Revises: 9a5d3e71c0b8
+Create Date: 2026-10-17 15:21:44.903517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c27b8f4d1a63'
+down_revision = '9a5d3e71c0b8'
+branch_labels = None
+depends_on = None
+
+MODULE_FIELDS = [
+    'basic_info', 'infrastructure', 'sanitation',
+    'connectivity', 'land_forest', 'electricity', 'waste_management'
+]
+
+
+def upgrade() -> None:
+    for field in MODULE_FIELDS:
+        op.create_index(f'ix_surveys_{field}_gin', 'surveys', [field], unique=False,
+                        postgresql_using='gin', postgresql_ops={field: 'jsonb_path_ops'})
+    op.execute("""
+CREATE OR REPLACE FUNCTION survey_numeric(value jsonb) RETURNS numeric
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN jsonb_typeof(value) = 'number' THEN (value #>> '{}')::numeric
+        WHEN jsonb_typeof(value) = 'string' AND (value #>> '{}') ~ '^ *-?[0-9]+([.][0-9]+)? *$'
+            THEN trim(value #>> '{}')::numeric
+    END
+$$;
+
+CREATE INDEX IF NOT EXISTS ix_surveys_basic_info_total_population ON surveys (survey_numeric(basic_info -> 'total_population'));
+
+CREATE INDEX IF NOT EXISTS ix_surveys_basic_info_total_households ON surveys (survey_numeric(basic_info -> 'total_households'));
+""")
+
+
+def downgrade() -> None:
+    op.execute("""
+DROP INDEX IF EXISTS ix_surveys_basic_info_total_households;
+DROP INDEX IF EXISTS ix_surveys_basic_info_total_population;
+DROP FUNCTION IF EXISTS survey_numeric(jsonb);
+""")
+    for field in reversed(MODULE_FIELDS):
+        op.drop_index(f'ix_surveys_{field}_gin', table_name='surveys')
@@ -0,0 +1,41 @@
+"""Add survey search indexes
+
+Revision ID: d5f2a9c47e18
+Revises: c27b8f4d1a63
+Create Date: 2026-10-17 16:05:12.384019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd5f2a9c47e18'
+down_revision = 'c27b8f4d1a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_surveys_user_updated', 'surveys', ['user_id', 'updated_at'], unique=False)
+    op.execute("""
+CREATE OR REPLACE FUNCTION survey_search_query(term text) RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT to_tsquery('simple', coalesce(string_agg(quote_literal(lexeme) || ':*', ' & '), ''))
+    FROM unnest(tsvector_to_array(to_tsvector('simple', term))) AS lexeme
+$$;
+
+CREATE INDEX IF NOT EXISTS ix_surveys_village_search
+    ON surveys USING gin (to_tsvector('simple', coalesce(village_name, '')));
+
+CREATE INDEX IF NOT EXISTS ix_users_search
+    ON users USING gin (to_tsvector('simple', coalesce(username, '') || ' ' || coalesce(full_name, '')));
+""")
+
+
+def downgrade() -> None:
+    op.execute("""
+DROP INDEX IF EXISTS ix_users_search;
+DROP INDEX IF EXISTS ix_surveys_village_search;
+DROP FUNCTION IF EXISTS survey_search_query(text);
+""")
+    op.drop_index('ix_surveys_user_updated', table_name='surveys')
@@ -0,0 +1,25 @@
+"""Add survey list keyset indexes
+
+Revision ID: e4c81b3f5a27
+Revises: 6b9e2d4a8f10
+Create Date: 2026-10-17 14:02:31.552810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e4c81b3f5a27'
+down_revision = '6b9e2d4a8f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_surveys_panchayat_updated', 'surveys', ['panchayat_id', 'updated_at', 'survey_id'], unique=False)
+    op.create_index('ix_surveys_updated', 'surveys', ['updated_at', 'survey_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_surveys_updated', table_name='surveys')
+    op.drop_index('ix_surveys_panchayat_updated', table_name='surveys')
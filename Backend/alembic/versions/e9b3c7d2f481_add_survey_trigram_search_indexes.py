@@ -0,0 +1,55 @@
+"""Add trigram indexes for the survey search
+
+Revision ID: e9b3c7d2f481
+Revises: 2d8f4b6a9c13
+Create Date: 2026-10-18 18:40:27.615930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e9b3c7d2f481'
+down_revision = '2d8f4b6a9c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Substring (ILIKE '%term%') search replaces word prefixes; without
+    # pg_trgm the indexes are skipped and search runs unindexed
+    op.execute("""
+DROP INDEX IF EXISTS ix_surveys_village_search;
+DROP INDEX IF EXISTS ix_users_search;
+DROP FUNCTION IF EXISTS survey_search_query(text);
+
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS ix_surveys_village_trgm
+        ON surveys USING gin (village_name gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS ix_users_name_trgm
+        ON users USING gin (username gin_trgm_ops, full_name gin_trgm_ops);
+EXCEPTION WHEN feature_not_supported OR insufficient_privilege THEN
+    RAISE WARNING USING MESSAGE = 'pg_trgm is not available, survey search is not indexed: ' || SQLERRM;
+END $$;
+""")
+
+
+def downgrade() -> None:
+    op.execute("""
+DROP INDEX IF EXISTS ix_users_name_trgm;
+DROP INDEX IF EXISTS ix_surveys_village_trgm;
+
+CREATE OR REPLACE FUNCTION survey_search_query(term text) RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT to_tsquery('simple', coalesce(string_agg(quote_literal(lexeme) || ':*', ' & '), ''))
+    FROM unnest(tsvector_to_array(to_tsvector('simple', term))) AS lexeme
+$$;
+
+CREATE INDEX IF NOT EXISTS ix_surveys_village_search
+    ON surveys USING gin (to_tsvector('simple', coalesce(village_name, '')));
+
+CREATE INDEX IF NOT EXISTS ix_users_search
+    ON users USING gin (to_tsvector('simple', coalesce(username, '') || ' ' || coalesce(full_name, '')));
+""")
@@ -0,0 +1,28 @@
+"""Add token revocations
+
+Revision ID: f3a6c1e92b45
+Revises: d5f2a9c47e18
+Create Date: 2026-10-17 16:42:37.106254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f3a6c1e92b45'
+down_revision = 'd5f2a9c47e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('token_revocations',
+    sa.Column('user_id', sa.String(length=50), nullable=False),
+    sa.Column('token_version', sa.Integer(), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('token_revocations')
@@ -12,12 +12,39 @@ class Settings(BaseSettings):
     # JWT Authentication
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # 7 days
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15  # renewed through refresh tokens
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30  # counted from the last refresh
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60  # authenticated user cache per worker (0 disables)
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PASSWORD_HASH_WORKERS: int = 2  # concurrent password hashes per process
+    PASSWORD_HASH_MAX_QUEUE: int = 500  # hashes waiting beyond this are refused with 503
+    PASSWORD_HASH_PROCESSES: bool = False  # hash in worker processes instead of threads
+    BULK_IMPORT_MAX_ROWS: int = 1000  # users per bulk import request
+    BULK_IMPORT_HASH_WORKERS: int = 4  # processes hashing bulk import passwords
     
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     
+    # Sync
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # 24 hours
+    IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS: int = 300  # keys held this long by a crashed request are taken over
+    SURVEY_VERSION_HISTORY: int = 20  # merge base snapshots kept per survey
+    SYNC_JOB_WORKERS: int = 2  # background workers per process (0 disables)
+    SYNC_JOB_POLL_SECONDS: float = 2.0
+    SYNC_JOB_TIMEOUT_SECONDS: int = 600  # running jobs older than this are reclaimed
+    SYNC_JOB_MAX_ATTEMPTS: int = 3
+    SYNC_JOB_RETRY_BACKOFF_SECONDS: int = 30  # delay before a retry, doubled per attempt
+    CHANGE_EVENTS_ENABLED: bool = True  # LISTEN for change notices and serve /api/sync/events
+    CHANGE_EVENTS_HEARTBEAT_SECONDS: int = 25
+    
+    # Export
+    EXPORT_BATCH_SIZE: int = 1000  # rows fetched per cursor round trip and sent per chunk
+    
+    # Compression
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # bytes; smaller responses are sent uncompressed
+    MAX_DECOMPRESSED_BODY_BYTES: int = 50 * 1024 * 1024  # 50 MB
+    
     # CORS
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
     
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
@@ -6,12 +8,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# Convert DATABASE_URL from postgresql:// to postgresql+asyncpg://
-database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql://")
+database_url = settings.DATABASE_URL
 
 logger.info(f"Connecting to database: {database_url[:50]}...")
 
 # Create database engine with proper connection pooling and timeouts
+# (used by startup table creation, background workers and scripts)
 engine = create_engine(
     database_url,
     pool_pre_ping=True,  # Verify connections before using
@@ -32,6 +34,42 @@ engine = create_engine(
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _asyncpg_url_and_args(url: str):
+    """
+    Convert DATABASE_URL from postgresql:// to postgresql+asyncpg://
+
+    libpq-only query options are not understood by asyncpg: sslmode is
+    passed on as asyncpg's ssl argument and the rest are dropped.
+    """
+    url = make_url(url).set(drivername="postgresql+asyncpg")
+    connect_args = {"timeout": 10}
+    if "sslmode" in url.query:
+        connect_args["ssl"] = url.query["sslmode"]
+    url = url.difference_update_query(["sslmode", "channel_binding", "connect_timeout"])
+    return url, connect_args
+
+
+async_database_url, async_connect_args = _asyncpg_url_and_args(database_url)
+
+# Async engine used by the API routers; queries wait on the event loop
+# instead of blocking it
+async_engine = create_async_engine(
+    async_database_url,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20,
+    pool_recycle=3600,
+    pool_timeout=30,
+    connect_args=async_connect_args
+)
+
+# Objects stay usable after commit without a reload (lazy IO is not
+# possible outside an await)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -49,3 +87,15 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency to get an async database session.
+    Usage in routes:
+        @router.get("/")
+        async def endpoint(db: AsyncSession = Depends(get_async_db)):
+            result = await db.execute(select(...))
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
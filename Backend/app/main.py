@@ -5,7 +5,12 @@ import logging
 
 from .config import settings
 from .database import engine, Base
+from .utils.compression import RequestDecompressionMiddleware, ResponseCompressionMiddleware
 from .routers import auth, surveys, schemas, sync, users
+from .services.sync_jobs import sync_job_workers
+from .services.notifications import change_hub
+from .services.principals import revocations
+from .services.password_hashing import password_hasher, bulk_password_hasher, PasswordHashingBusy
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +35,18 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Compressed request bodies (gzip/zstd) and negotiated response compression.
+# Added before CORS so CORS wraps them and their error responses carry
+# CORS headers too (the last middleware added is the outermost).
+app.add_middleware(
+    RequestDecompressionMiddleware,
+    max_body_size=settings.MAX_DECOMPRESSED_BODY_BYTES
+)
+app.add_middleware(
+    ResponseCompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE
+)
+
 # Configure CORS - Allow custom domains and Vercel deployments
 app.add_middleware(
     CORSMiddleware,
@@ -44,7 +61,10 @@ app.add_middleware(
     allow_origin_regex=r"https://.*\.vercel\.app",  # Allow all Vercel preview URLs
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "User-Agent"],
+    allow_headers=[
+        "Content-Type", "Authorization", "Accept", "Origin", "User-Agent",
+        "Content-Encoding", "Idempotency-Key", "If-None-Match"
+    ],
     expose_headers=["*"],
     max_age=3600,
 )
@@ -57,6 +77,28 @@ app.include_router(sync.router)
 app.include_router(users.router)
 
 
+@app.on_event("startup")
+async def start_background_workers():
+    """Start the background workers that apply queued sync jobs and fan out change notices"""
+    try:
+        await revocations.load()
+    except Exception as e:
+        logger.error(f"Failed to load token revocations: {e}")
+    if settings.SYNC_JOB_WORKERS > 0:
+        sync_job_workers.start()
+    # The listener also carries principal cache invalidations between workers
+    if settings.CHANGE_EVENTS_ENABLED or settings.PRINCIPAL_CACHE_TTL_SECONDS > 0:
+        change_hub.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await sync_job_workers.stop()
+    await change_hub.stop()
+    password_hasher.shutdown()
+    bulk_password_hasher.shutdown()
+
+
 @app.get("/")
 async def root():
     """Root endpoint - API health check"""
@@ -97,6 +139,15 @@ async def not_found_handler(request, exc):
     )
 
 
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many password operations in progress, please retry shortly"},
+        headers={"Retry-After": "2"}
+    )
+
+
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
     return JSONResponse(
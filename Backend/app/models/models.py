@@ -1,9 +1,15 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database import Base
 
+# Survey module columns, each stored as JSONB
+MODULE_FIELDS = [
+    "basic_info", "infrastructure", "sanitation",
+    "connectivity", "land_forest", "electricity", "waste_management"
+]
+
 
 class User(Base):
     """User model for Panchayat staff authentication"""
@@ -77,10 +83,114 @@ class Survey(Base):
     client_timestamp = Column(DateTime)
     server_timestamp = Column(DateTime, default=datetime.utcnow)
     
+    # Change feed position, stamped by database trigger on every write
+    change_xid = Column(BigInteger)
+    change_seq = Column(BigInteger)
+    
     # Relationships
     panchayat = relationship("Panchayat", back_populates="surveys")
     user = relationship("User", back_populates="surveys")
     sync_logs = relationship("SyncLog", back_populates="survey", cascade="all, delete-orphan")
+    versions = relationship("SurveyVersion", cascade="all, delete-orphan", passive_deletes=True)
+    
+    __table_args__ = (
+        Index("ix_surveys_panchayat_change", "panchayat_id", "change_xid", "change_seq"),
+        Index("ix_surveys_change", "change_xid", "change_seq"),
+        Index("ix_surveys_panchayat_updated", "panchayat_id", "updated_at", "survey_id"),
+        Index("ix_surveys_updated", "updated_at", "survey_id"),
+        Index("ix_surveys_user_updated", "user_id", "updated_at"),
+        # Containment (@>) lookups on module answers, see services/survey_filters
+        *[
+            Index(f"ix_surveys_{field}_gin", field, postgresql_using="gin",
+                  postgresql_ops={field: "jsonb_path_ops"})
+            for field in MODULE_FIELDS
+        ],
+    )
+
+
+class SurveyTombstone(Base):
+    """Marker left by a deleted survey so pull sync can propagate the delete"""
+    __tablename__ = "survey_tombstones"
+    
+    survey_id = Column(String(50), primary_key=True)
+    panchayat_id = Column(String(50), nullable=False)
+    change_xid = Column(BigInteger, nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_survey_tombstones_panchayat_change", "panchayat_id", "change_xid", "change_seq"),
+        Index("ix_survey_tombstones_change", "change_xid", "change_seq"),
+    )
+
+
+class SurveyVersion(Base):
+    """Snapshot of a survey's module data at one version, used as three-way merge base"""
+    __tablename__ = "survey_versions"
+    
+    survey_id = Column(String(50), ForeignKey("surveys.survey_id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, primary_key=True)
+    data = Column(JSONB, nullable=False)  # module name -> module data
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SyncStatusCount(Base):
+    """Survey count per panchayat and sync status, maintained by triggers on surveys"""
+    __tablename__ = "sync_status_counts"
+    
+    panchayat_id = Column(String(50), primary_key=True)
+    sync_status = Column(String(20), primary_key=True)
+    survey_count = Column(Integer, nullable=False, default=0)
+
+
+class UserActivityStat(Base):
+    """Surveys created and latest survey date per user, maintained by triggers on surveys"""
+    __tablename__ = "user_activity_stats"
+    
+    user_id = Column(String(50), primary_key=True)
+    surveys_created = Column(Integer, nullable=False, default=0)
+    last_survey_date = Column(DateTime)
+
+
+class PanchayatActivityStat(Base):
+    """Surveys created and latest survey date per panchayat, maintained by triggers on surveys"""
+    __tablename__ = "panchayat_activity_stats"
+    
+    panchayat_id = Column(String(50), primary_key=True)
+    surveys_created = Column(Integer, nullable=False, default=0)
+    last_survey_date = Column(DateTime)
+
+
+class SurveyListRevision(Base):
+    """Per-panchayat counter bumped by every survey write, used to validate cached lists"""
+    __tablename__ = "survey_list_revisions"
+    
+    panchayat_id = Column(String(50), primary_key=True)
+    revision = Column(BigInteger, nullable=False, default=0)
+
+
+class TokenRevocation(Base):
+    """Current token version of a user whose access tokens were revoked"""
+    __tablename__ = "token_revocations"
+    
+    # No foreign key: revocations must outlive deleted users
+    user_id = Column(String(50), primary_key=True)
+    token_version = Column(Integer, nullable=False, default=1)
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RefreshToken(Base):
+    """Refresh token, stored as its SHA-256 hash; each one is used once and rotated"""
+    __tablename__ = "refresh_tokens"
+    
+    token_hash = Column(String(64), primary_key=True)
+    family_id = Column(String(50), nullable=False, index=True)  # Tokens rotated from one login
+    user_id = Column(String(50), ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    token_version = Column(Integer, nullable=False, default=0)  # Access token version it was issued at
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime)  # Set when rotated; presenting it again means it leaked
+    revoked_at = Column(DateTime)
 
 
 class SyncLog(Base):
@@ -108,6 +218,42 @@ class SyncLog(Base):
     survey = relationship("Survey", back_populates="sync_logs")
 
 
+class SyncJob(Base):
+    """Batch sync stored for asynchronous processing by background workers"""
+    __tablename__ = "sync_jobs"
+    
+    job_id = Column(String(50), primary_key=True, index=True)
+    user_id = Column(String(50), ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(20), default="queued")  # queued, running, completed, failed
+    
+    payload = Column(JSONB, nullable=False)  # Submitted surveys
+    results = Column(JSONB)  # Per-survey results once applied
+    summary = Column(JSONB)  # SyncResponse-shaped summary
+    error_message = Column(Text)
+    attempts = Column(Integer, default=0)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    available_at = Column(DateTime)  # a requeued job is not retried before this
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_sync_jobs_status_created_at", "status", "created_at"),
+    )
+
+
+class IdempotencyKey(Base):
+    """Outcome of a request sent with an idempotency key, shared by all workers"""
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(Text, primary_key=True)  # user_id:scope:client key
+    user_id = Column(String(50), ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    request_hash = Column(String(64), nullable=False)  # SHA-256 of the request the key was first used for
+    status = Column(String(20), nullable=False)  # in_progress, completed, released (may be retried)
+    response = Column(JSONB)  # Stored once completed
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class FormSchema(Base):
     """Schema definitions for different survey modules"""
     __tablename__ = "form_schemas"
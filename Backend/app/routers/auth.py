@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 import uuid
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.models import User, Panchayat
-from ..schemas.schemas import UserCreate, UserResponse, Token, UserLogin
-from ..utils.security import verify_password, get_password_hash, create_access_token
-from ..utils.dependencies import get_current_user, check_admin_role
+from ..schemas.schemas import (
+    UserCreate, UserResponse, Token, UserLogin, TokenData, RefreshRequest, RefreshResponse,
+    BulkUserImportResponse
+)
+from ..utils.security import create_access_token, user_claims
+from ..utils.dependencies import get_current_user, get_current_principal, check_admin_role, load_current_user
+from ..services.principals import invalidate_principal, current_token_version
+from ..services.password_hashing import password_hasher
+from ..services.refresh_tokens import issue_refresh_token, rotate_refresh_token
+from ..services.user_import import parse_user_rows, import_users
 from ..config import settings
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
@@ -17,14 +25,14 @@ router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user: UserCreate,
-    db: Session = Depends(get_db),
-    current_admin: User = Depends(check_admin_role)  # Only admins can register users
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(check_admin_role)  # Only admins can register users
 ):
     """
     Register a new user (admin only)
     """
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = await db.scalar(select(User).where(User.username == user.username))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -33,16 +41,19 @@ async def register_user(
     
     # Check if email already exists
     if user.email:
-        existing_email = db.query(User).filter(User.email == user.email).first()
+        existing_email = await db.scalar(select(User).where(User.email == user.email))
         if existing_email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
     
+    # Release the connection while waiting for the hashing pool
+    await db.commit()
+    
     # Create new user
     user_id = f"USER_{uuid.uuid4().hex[:12].upper()}"
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     
     db_user = User(
         user_id=user_id,
@@ -55,16 +66,46 @@ async def register_user(
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 
+@router.post("/register/bulk", response_model=BulkUserImportResponse)
+async def register_users_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(check_admin_role)
+):
+    """
+    Register many users at once (admin only)
+    
+    Request body: a JSON array of users (same fields as /register), or CSV
+    (Content-Type: text/csv) with a header line naming the columns
+    username, password, email, full_name, role, panchayat_id.
+    
+    Valid rows are created even when others fail; every failure is listed
+    in `errors` with its 1-based row number among the submitted users.
+    """
+    try:
+        rows = parse_user_rows(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_IMPORT_MAX_ROWS} users per import"
+        )
+    
+    return await import_users(db, rows)
+
+
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Login endpoint - returns JWT token
@@ -72,9 +113,13 @@ async def login(
     Use username and password to get access token
     """
     # Find user by username
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    
+    # Release the connection while waiting for the hashing pool, so a login
+    # storm cannot starve other requests of connections
+    await db.commit()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -87,19 +132,20 @@ async def login(
             detail="Inactive user account"
         )
     
-    # Create access token
+    # Create access token carrying the claims needed for authorization
+    token_version = await current_token_version(db, user.user_id)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "user_id": user.user_id},
+        data=user_claims(user, token_version),
         expires_delta=access_token_expires
     )
+    refresh_token = await issue_refresh_token(db, user.user_id, token_version)
+    await db.commit()
     
     # Get panchayat info if exists
     panchayat_info = None
     if user.panchayat_id:
-        panchayat = db.query(Panchayat).filter(
-            Panchayat.panchayat_id == user.panchayat_id
-        ).first()
+        panchayat = await db.get(Panchayat, user.panchayat_id)
         if panchayat:
             panchayat_info = {
                 "panchayat_id": panchayat.panchayat_id,
@@ -111,12 +157,45 @@ async def login(
     
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "user_info": user,
         "panchayat_info": panchayat_info
     }
 
 
+@router.post("/refresh", response_model=RefreshResponse)
+async def refresh_access_token(
+    request: RefreshRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Exchange a refresh token for a new access token and refresh token
+    
+    The refresh token is used up; presenting it again revokes every token
+    descended from the same login. No password is checked.
+    """
+    rotated = await rotate_refresh_token(db, request.refresh_token)
+    await db.commit()  # Keeps a reuse revocation even when refusing
+    
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    user_id, token_version, refresh_token = rotated
+    user = await load_current_user(user_id, db)
+    access_token = create_access_token(data=user_claims(user, token_version))
+    
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """
@@ -126,10 +205,19 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/logout")
-async def logout():
+async def logout(
+    current_user: TokenData = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Logout endpoint (token invalidation handled on client side)
+    Logout endpoint
+    
+    Revokes every access and refresh token issued to the user so far, on
+    all devices.
     """
+    await invalidate_principal(db, current_user.user_id, revoke_tokens=True)
+    await db.commit()
+    
     return {"message": "Successfully logged out"}
 
 
@@ -137,8 +225,8 @@ async def logout():
 async def change_password(
     current_password: str,
     new_password: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: TokenData = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Change user password
@@ -146,19 +234,35 @@ async def change_password(
     Requires:
     - current_password: Current password for verification
     - new_password: New password to set
+    
+    Tokens issued before the change are revoked; the response carries a
+    new access token and refresh token for this session.
     """
+    # The cached principal carries no password hash
+    user = await db.get(User, current_user.user_id)
+    await db.commit()  # Release the connection while hashing
+    
     # Verify current password
-    if not verify_password(current_password, current_user.hashed_password):
+    if not await password_hasher.verify(current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Current password is incorrect"
         )
     
     # Hash new password
-    new_hashed_password = get_password_hash(new_password)
+    new_hashed_password = await password_hasher.hash(new_password)
     
     # Update password in database
-    current_user.hashed_password = new_hashed_password
-    db.commit()
+    user.hashed_password = new_hashed_password
+    await invalidate_principal(db, user.user_id, revoke_tokens=True)
+    token_version = await current_token_version(db, user.user_id)
+    access_token = create_access_token(data=user_claims(user, token_version))
+    refresh_token = await issue_refresh_token(db, user.user_id, token_version)
+    await db.commit()
     
-    return {"message": "Password changed successfully"}
+    return {
+        "message": "Password changed successfully",
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
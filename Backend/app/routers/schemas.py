@@ -1,27 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import datetime
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.models import FormSchema
-from ..schemas.schemas import FormSchemaCreate, FormSchemaResponse
-from ..utils.dependencies import get_current_user, check_admin_role, User
+from ..schemas.schemas import FormSchemaCreate, FormSchemaResponse, TokenData
+from ..services.notifications import notify_schema_change
+from ..utils.dependencies import get_current_principal, check_admin_role
+from ..utils.etags import make_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter(prefix="/api/schemas", tags=["Form Schemas"])
 
 
 @router.get("", response_model=dict)
 async def get_all_schemas(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
     """
     Get all active form schemas
     
-    Returns schemas grouped by module name
+    Returns schemas grouped by module name. The ETag is built from the
+    count and latest update of active schemas; a matching If-None-Match
+    gets 304 after that single aggregate query.
     """
-    schemas = db.query(FormSchema).filter(FormSchema.is_active == True).all()
+    count, last_updated = (await db.execute(
+        select(func.count(), func.max(FormSchema.updated_at)).where(FormSchema.is_active == True)
+    )).one()
+    etag = make_etag(count, _timestamp(last_updated))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    schemas = (await db.scalars(select(FormSchema).where(FormSchema.is_active == True))).all()
     
     # Group schemas by module name
     schemas_dict = {}
@@ -33,6 +47,7 @@ async def get_all_schemas(
             "updated_at": schema.updated_at.isoformat()
         }
     
+    set_etag(response, etag)
     return {
         "schemas": schemas_dict,
         "version": "1.0",  # Overall schema version
@@ -43,14 +58,22 @@ async def get_all_schemas(
 @router.get("/{module_name}", response_model=FormSchemaResponse)
 async def get_schema_by_module(
     module_name: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
-    """Get schema for a specific module (e.g., basic_info, infrastructure)"""
-    schema = db.query(FormSchema).filter(
-        FormSchema.module_name == module_name,
-        FormSchema.is_active == True
-    ).first()
+    """
+    Get schema for a specific module (e.g., basic_info, infrastructure)
+    
+    Answers a matching If-None-Match with 304 and no body.
+    """
+    schema = await db.scalar(
+        select(FormSchema).where(
+            FormSchema.module_name == module_name,
+            FormSchema.is_active == True
+        ).limit(1)
+    )
     
     if not schema:
         raise HTTPException(
@@ -58,14 +81,19 @@ async def get_schema_by_module(
             detail=f"Schema for module '{module_name}' not found"
         )
     
+    etag = make_etag(schema.schema_id, schema.version, _timestamp(schema.updated_at))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    set_etag(response, etag)
     return schema
 
 
 @router.post("", response_model=FormSchemaResponse, status_code=status.HTTP_201_CREATED)
 async def create_schema(
     schema: FormSchemaCreate,
-    db: Session = Depends(get_db),
-    current_admin: User = Depends(check_admin_role)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(check_admin_role)
 ):
     """
     Create a new form schema (admin only)
@@ -73,9 +101,7 @@ async def create_schema(
     This allows adding new survey modules dynamically
     """
     # Check if schema with same ID exists
-    existing = db.query(FormSchema).filter(
-        FormSchema.schema_id == schema.schema_id
-    ).first()
+    existing = await db.get(FormSchema, schema.schema_id)
     
     if existing:
         raise HTTPException(
@@ -85,8 +111,9 @@ async def create_schema(
     
     db_schema = FormSchema(**schema.dict())
     db.add(db_schema)
-    db.commit()
-    db.refresh(db_schema)
+    await notify_schema_change(db, db_schema.module_name, db_schema.version)
+    await db.commit()
+    await db.refresh(db_schema)
     
     return db_schema
 
@@ -95,11 +122,11 @@ async def create_schema(
 async def update_schema(
     schema_id: str,
     schema_update: FormSchemaCreate,
-    db: Session = Depends(get_db),
-    current_admin: User = Depends(check_admin_role)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(check_admin_role)
 ):
     """Update an existing schema (admin only)"""
-    db_schema = db.query(FormSchema).filter(FormSchema.schema_id == schema_id).first()
+    db_schema = await db.get(FormSchema, schema_id)
     
     if not db_schema:
         raise HTTPException(
@@ -112,9 +139,10 @@ async def update_schema(
         setattr(db_schema, field, value)
     
     db_schema.updated_at = datetime.utcnow()
+    await notify_schema_change(db, db_schema.module_name, db_schema.version)
     
-    db.commit()
-    db.refresh(db_schema)
+    await db.commit()
+    await db.refresh(db_schema)
     
     return db_schema
 
@@ -122,11 +150,11 @@ async def update_schema(
 @router.delete("/{schema_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_schema(
     schema_id: str,
-    db: Session = Depends(get_db),
-    current_admin: User = Depends(check_admin_role)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(check_admin_role)
 ):
     """Deactivate a schema (admin only) - soft delete"""
-    schema = db.query(FormSchema).filter(FormSchema.schema_id == schema_id).first()
+    schema = await db.get(FormSchema, schema_id)
     
     if not schema:
         raise HTTPException(
@@ -135,6 +163,13 @@ async def delete_schema(
         )
     
     schema.is_active = False
-    db.commit()
+    await notify_schema_change(db, schema.module_name, schema.version)
+    await db.commit()
     
     return None
+
+
+# ============= Helper Functions =============
+
+def _timestamp(value: Optional[datetime]) -> str:
+    return value.strftime("%Y%m%d%H%M%S%f") if value else "0"
@@ -1,25 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
+from urllib.parse import urlencode
+import base64
+import hashlib
 import uuid
 
-from ..database import get_db
-from ..models.models import Survey, User
+from ..database import get_async_db
+from ..models.models import Survey, MODULE_FIELDS
 from ..schemas.schemas import (
-    SurveyCreate, SurveyUpdate, SurveyResponse, 
-    ConflictResponse, ConflictField
+    SurveyCreate, SurveyUpdate, SurveyResponse, ModuleUpdate, ModuleUpdateResponse,
+    ConflictResponse, ConflictField, SurveyChangesPage, TokenData
 )
-from ..utils.dependencies import get_current_user, check_admin_role
+from ..services.change_feed import read_changes, read_list_revision, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..services.merge import merge_survey_modules, load_base_versions, three_way_merge
+from ..services.survey_writes import guarded_update, insert_if_absent
+from ..services.survey_filters import compile_filter
+from ..utils.dependencies import get_current_principal, check_admin_role
+from ..utils.etags import make_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter(prefix="/api/surveys", tags=["Surveys"])
 
+# Columns selectable with ?fields= on the survey list
+SURVEY_LIST_FIELDS = list(SurveyResponse.model_fields)
+SUMMARY_FIELDS = [
+    "survey_id", "village_name", "completion_percentage",
+    "is_complete", "sync_status", "version", "updated_at"
+]
+
+# Columns returned by a module write, besides the module itself
+MODULE_RESPONSE_COLUMNS = ["survey_id", "version", "change_seq", "server_timestamp"]
+
 
 @router.post("", response_model=SurveyResponse, status_code=status.HTTP_201_CREATED)
 async def create_survey(
     survey: SurveyCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
     """
     Create a new survey or sync offline data
@@ -27,140 +49,227 @@ async def create_survey(
     Handles:
     - New survey creation
     - Update if survey already exists (upsert behavior for sync)
-    - Conflict detection based on timestamps
+    - Optimistic concurrency: send the version you last received
+      (`version` or `base_version`) and the update only applies if the
+      survey is still at it. Otherwise the edit is three-way merged onto
+      the current version; only keys changed differently on both sides
+      are conflicts (409). Without a version, modules that differ from a
+      server copy newer than client_timestamp are conflicts (409); the
+      write is still guarded by the version read, so it never overwrites
+      a concurrent one.
+    
+    A create, or an update at the expected version, is a single statement
+    returning the new row.
     """
-    # Check if survey already exists
-    existing_survey = db.query(Survey).filter(
-        Survey.survey_id == survey.survey_id
-    ).first()
+    expected = expected_version(survey)
+    values = upsert_values(survey)
+    row = None
+    
+    if expected is not None:
+        row = (await db.execute(guarded_update(survey.survey_id, expected, values))).first()
+    
+    if row is None:
+        row = (await db.execute(insert_if_absent({
+            **survey.dict(exclude={"base_version", "version"}),
+            "user_id": current_user.user_id,
+            "sync_status": "synced"
+        }))).first()
     
-    if existing_survey:
+    if row is None:
         # Survey exists - update it instead of creating
         print(f"Survey {survey.survey_id} already exists, updating instead of creating")
         
-        # Check for conflicts based on timestamps
-        if survey.client_timestamp and existing_survey.server_timestamp:
-            client_ts = survey.client_timestamp
-            server_ts = existing_survey.server_timestamp
-            
-            # Make both timezone-naive for comparison
-            if client_ts.tzinfo is not None:
-                client_ts = client_ts.replace(tzinfo=None)
-            if server_ts.tzinfo is not None:
-                server_ts = server_ts.replace(tzinfo=None)
-            
-            # Only raise conflict if server is newer AND data actually differs
-            if server_ts > client_ts:
-                conflicts = detect_conflicts(existing_survey, survey)
-                if conflicts:
-                    raise HTTPException(
-                        status_code=status.HTTP_409_CONFLICT,
-                        detail={
-                            "status": "conflict",
-                            "survey_id": survey.survey_id,
-                            "conflicts": conflicts,
-                            "message": "Data conflict detected"
-                        }
-                    )
-        
-        # Update existing survey with new data (only update if value is provided)
-        if survey.village_name is not None:
-            existing_survey.village_name = survey.village_name
-        if survey.basic_info is not None:
-            existing_survey.basic_info = survey.basic_info
-        if survey.infrastructure is not None:
-            existing_survey.infrastructure = survey.infrastructure
-        if survey.sanitation is not None:
-            existing_survey.sanitation = survey.sanitation
-        if survey.connectivity is not None:
-            existing_survey.connectivity = survey.connectivity
-        if survey.land_forest is not None:
-            existing_survey.land_forest = survey.land_forest
-        if survey.electricity is not None:
-            existing_survey.electricity = survey.electricity
-        if survey.waste_management is not None:
-            existing_survey.waste_management = survey.waste_management
-        
-        # Always update completion tracking from client
-        existing_survey.completion_percentage = survey.completion_percentage
-        existing_survey.is_complete = survey.is_complete
-        existing_survey.sync_status = "synced"
-        existing_survey.last_synced_at = datetime.utcnow()
-        existing_survey.client_timestamp = survey.client_timestamp
-        existing_survey.server_timestamp = datetime.utcnow()
-        existing_survey.version += 1
-        
-        db.commit()
-        db.refresh(existing_survey)
-        
-        return existing_survey
-    
-    # Create new survey
-    db_survey = Survey(
-        survey_id=survey.survey_id,
-        panchayat_id=survey.panchayat_id,
-        user_id=current_user.user_id,
-        village_name=survey.village_name,
-        basic_info=survey.basic_info,
-        infrastructure=survey.infrastructure,
-        sanitation=survey.sanitation,
-        connectivity=survey.connectivity,
-        land_forest=survey.land_forest,
-        electricity=survey.electricity,
-        waste_management=survey.waste_management,
-        completion_percentage=survey.completion_percentage,
-        is_complete=survey.is_complete,
-        sync_status="synced",
-        last_synced_at=datetime.utcnow(),
-        client_timestamp=survey.client_timestamp,
-        server_timestamp=datetime.utcnow()
-    )
+        current = await db.get(Survey, survey.survey_id, populate_existing=True)
+        if current is None:
+            raise_concurrent_modification(survey.survey_id)
+        row = await write_with_merge(db, current, expected, survey, values)
     
-    db.add(db_survey)
-    db.commit()
-    db.refresh(db_survey)
+    await db.commit()
     
-    return db_survey
+    set_etag(response, survey_etag(row))
+    return row
 
 
 @router.get("", response_model=List[SurveyResponse])
 async def get_surveys(
+    response: Response,
     panchayat_id: Optional[str] = Query(None),
     since: Optional[datetime] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    summary: bool = Query(False),
+    filter: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
     """
-    Get surveys for a panchayat
+    Get surveys for a panchayat, most recently updated first
     
     Query params:
     - panchayat_id: Filter by panchayat (defaults to user's panchayat)
     - since: Get surveys updated after this date (for sync)
+    - limit: Page size; enables keyset pagination. The cursor of the next
+      page is returned in the X-Next-Cursor header (absent on the last page)
+    - cursor: X-Next-Cursor value from the previous page
+    - fields: Comma-separated columns to return, e.g.
+      survey_id,village_name,sync_status; module data is only read from
+      the database when a module is requested
+    - summary: Shorthand for fields=survey_id,village_name,
+      completion_percentage,is_complete,sync_status,version,updated_at
+    - filter: Conditions on module answers, e.g.
+      sanitation.open_defecation = yes and basic_info.total_population > 5000
+      (operators = != > >= < <=, combined with and / or / not and
+      parentheses; see services/survey_filters)
+    
+    Without limit or cursor, all matching surveys are returned.
+    
+    The ETag is the panchayat's list revision, bumped by every survey
+    write, plus a digest of the other query options; a matching
+    If-None-Match is answered 304 after one primary key lookup, without
+    reading any surveys.
     """
-    query = db.query(Survey)
+    scope = panchayat_id or current_user.panchayat_id
+    revision = await db.run_sync(read_list_revision, scope)
+    variant = list_query_digest(
+        since=since, limit=limit, cursor=cursor, fields=fields, summary=summary, filter=filter
+    )
+    etag = make_etag(scope or "all", revision, *([variant] if variant else []))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    if summary and not fields:
+        fields = ",".join(SUMMARY_FIELDS)
+    columns = parse_fields(fields) if fields else None
+    
+    if columns:
+        # Keyset columns are always read so the next cursor can be built
+        selected = list(dict.fromkeys(columns + ["updated_at", "survey_id"]))
+        query = select(*[getattr(Survey, column) for column in selected])
+    else:
+        query = select(Survey)
     
     # Filter by panchayat
-    if panchayat_id:
-        query = query.filter(Survey.panchayat_id == panchayat_id)
-    elif current_user.panchayat_id:
-        query = query.filter(Survey.panchayat_id == current_user.panchayat_id)
+    if scope:
+        query = query.where(Survey.panchayat_id == scope)
     
     # Filter by date for incremental sync
     if since:
-        query = query.filter(Survey.updated_at > since)
+        query = query.where(Survey.updated_at > since)
+    
+    if filter:
+        try:
+            query = query.where(compile_filter(filter))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    if cursor:
+        try:
+            position = decode_list_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.where(tuple_(Survey.updated_at, Survey.survey_id) < position)
+        limit = limit or DEFAULT_PAGE_SIZE
+    
+    query = query.order_by(Survey.updated_at.desc(), Survey.survey_id.desc())
+    if limit:
+        query = query.limit(limit + 1)
+    
+    if columns:
+        surveys = (await db.execute(query)).mappings().all()
+    else:
+        surveys = (await db.scalars(query)).all()
     
-    surveys = query.order_by(Survey.updated_at.desc()).all()
+    headers = {}
+    if limit and len(surveys) > limit:
+        surveys = surveys[:limit]
+        last = surveys[-1]
+        if columns:
+            headers["X-Next-Cursor"] = encode_list_cursor(last["updated_at"], last["survey_id"])
+        else:
+            headers["X-Next-Cursor"] = encode_list_cursor(last.updated_at, last.survey_id)
+    
+    if columns:
+        rows = [{column: row[column] for column in columns} for row in surveys]
+        json_response = JSONResponse(content=jsonable_encoder(rows), headers=headers)
+        set_etag(json_response, etag)
+        return json_response
+    
+    response.headers.update(headers)
+    set_etag(response, etag)
     return surveys
 
 
+@router.get("/changes", response_model=SurveyChangesPage)
+async def get_survey_changes(
+    panchayat_id: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
+):
+    """
+    Pull sync - surveys changed or deleted after a cursor
+    
+    Query params:
+    - panchayat_id: Filter by panchayat (defaults to user's panchayat)
+    - cursor: next_cursor from the previous page (omit for a full download)
+    - limit: Page size
+    
+    Changes come in commit-safe order by a server-side change sequence, so
+    a device can stop anywhere and resume from its last cursor without
+    missing or relying on clock-based timestamps.
+    """
+    try:
+        page = await db.run_sync(read_changes, panchayat_id or current_user.panchayat_id, cursor, limit)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    return {
+        "changes": [
+            {"survey_id": survey_id, "deleted": survey is None, "survey": survey}
+            for _, survey, survey_id in page["changes"]
+        ],
+        "next_cursor": page["next_cursor"],
+        "has_more": page["has_more"]
+    }
+
+
 @router.get("/{survey_id}", response_model=SurveyResponse)
 async def get_survey(
     survey_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
-    """Get a specific survey by ID"""
-    survey = db.query(Survey).filter(Survey.survey_id == survey_id).first()
+    """
+    Get a specific survey by ID
+    
+    The ETag changes with every write to the survey. With a matching
+    If-None-Match only the version columns are read and 304 is returned.
+    """
+    if if_none_match:
+        current = (await db.execute(
+            select(Survey.panchayat_id, Survey.version, Survey.change_seq)
+            .where(Survey.survey_id == survey_id)
+        )).first()
+        if (current is not None
+                and (current_user.role != "staff" or current.panchayat_id == current_user.panchayat_id)
+                and etag_matches(if_none_match, survey_etag(current))):
+            return not_modified(survey_etag(current))
+    
+    survey = await db.get(Survey, survey_id)
     
     if not survey:
         raise HTTPException(
@@ -175,6 +284,7 @@ async def get_survey(
             detail="Access denied"
         )
     
+    set_etag(response, survey_etag(survey))
     return survey
 
 
@@ -182,74 +292,162 @@ async def get_survey(
 async def update_survey(
     survey_id: str,
     survey_update: SurveyUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
     """
     Update an existing survey
     
-    Handles conflict detection based on timestamps
+    Send the version you last received (`version` or `base_version`): the
+    write is a single UPDATE ... WHERE version = ? RETURNING. If the survey
+    moved on since, the edit is three-way merged onto the current version
+    and only keys changed differently on both sides conflict (409).
+    Without a version, modules that differ from a server copy newer than
+    client_timestamp conflict (409), and the write is guarded by the
+    version read.
     """
-    db_survey = db.query(Survey).filter(Survey.survey_id == survey_id).first()
+    values = {
+        field: value for field, value in survey_update.dict(exclude_unset=True).items()
+        if field not in ("client_timestamp", "base_version", "version")
+    }
+    scope = current_user.panchayat_id if current_user.role == "staff" else None
+    expected = expected_version(survey_update)
     
-    if not db_survey:
+    row = None
+    if expected is not None:
+        row = (await db.execute(guarded_update(survey_id, expected, values, scope))).first()
+    
+    if row is None:
+        db_survey = await db.get(Survey, survey_id, populate_existing=True)
+        
+        if not db_survey:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Survey not found"
+            )
+        
+        # Check access
+        if current_user.role == "staff" and db_survey.panchayat_id != current_user.panchayat_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        
+        row = await write_with_merge(db, db_survey, expected, survey_update, values, scope)
+    
+    await db.commit()
+    
+    set_etag(response, survey_etag(row))
+    return row
+
+
+@router.patch("/{survey_id}/modules/{module}", response_model=ModuleUpdateResponse)
+async def update_survey_module(
+    survey_id: str,
+    module: str,
+    module_update: ModuleUpdate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
+):
+    """
+    Save a single survey module
+    
+    Writes only that module's column (plus completion tracking when sent)
+    and bumps the survey version. Leaving out `data` keeps the module as
+    it is; `"data": null` clears it. With `version` the write is guarded like
+    PUT, but a stale write is merged and checked for conflicts in this
+    module only, so edits to other modules never block it. Without a
+    version the module conflicts if it differs from a server copy newer
+    than client_timestamp.
+    """
+    if module not in MODULE_FIELDS:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Survey not found"
+            detail=f"Unknown module '{module}'"
         )
     
-    # Check access
-    if current_user.role == "staff" and db_survey.panchayat_id != current_user.panchayat_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied"
-        )
+    # Completion tracking is only written when sent with a value
+    values = module_update.dict(exclude={"data", "version"}, exclude_none=True)
+    if "data" in module_update.model_fields_set:
+        values[module] = module_update.data
+    scope = current_user.panchayat_id if current_user.role == "staff" else None
+    expected = module_update.version
+    
+    row = None
+    if expected is not None:
+        row = (await db.execute(
+            guarded_update(survey_id, expected, values, scope, MODULE_RESPONSE_COLUMNS + [module])
+        )).first()
     
-    # Check for conflicts
-    if survey_update.client_timestamp and db_survey.server_timestamp:
-        # Ensure both datetimes are timezone-aware or naive
-        client_ts = survey_update.client_timestamp
-        server_ts = db_survey.server_timestamp
+    if row is None:
+        current = (await db.execute(
+            select(
+                Survey.panchayat_id, Survey.version, Survey.server_timestamp,
+                getattr(Survey, module).label("data")
+            )
+            .where(Survey.survey_id == survey_id)
+        )).first()
         
-        # Make both timezone-naive for comparison
-        if client_ts.tzinfo is not None:
-            client_ts = client_ts.replace(tzinfo=None)
-        if server_ts.tzinfo is not None:
-            server_ts = server_ts.replace(tzinfo=None)
-            
-        if server_ts > client_ts:
-            conflicts = detect_conflicts(db_survey, survey_update)
-            if conflicts:
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail={
-                        "status": "conflict",
-                        "survey_id": survey_id,
-                        "conflicts": conflicts
-                    }
-                )
-    
-    # Update fields
-    update_data = survey_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        if field != "client_timestamp":
-            setattr(db_survey, field, value)
-    
-    db_survey.version += 1
-    db_survey.server_timestamp = datetime.utcnow()
-    db_survey.last_synced_at = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(db_survey)
-    
-    return db_survey
+        if not current:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Survey not found"
+            )
+        
+        # Check access
+        if current_user.role == "staff" and current.panchayat_id != current_user.panchayat_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        
+        conflicts = []
+        if module_update.data is not None and expected is not None:
+            values[module], conflicts = await merge_module(db, survey_id, module, expected, current.data, module_update.data)
+        elif module_update.data is not None and written_after(current.server_timestamp, module_update.client_timestamp):
+            if current.data is not None and current.data != module_update.data:
+                conflicts = [{
+                    "field_name": module,
+                    "server_value": current.data,
+                    "client_value": module_update.data
+                }]
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "status": "conflict",
+                    "survey_id": survey_id,
+                    "server_version": current.version,
+                    "conflicts": conflicts,
+                    "message": "Data conflict detected"
+                }
+            )
+        
+        row = (await db.execute(
+            guarded_update(survey_id, current.version or 0, values, scope, MODULE_RESPONSE_COLUMNS + [module])
+        )).first()
+        if row is None:
+            raise_concurrent_modification(survey_id)
+    
+    await db.commit()
+    
+    set_etag(response, survey_etag(row))
+    return {
+        "survey_id": row.survey_id,
+        "module": module,
+        "data": getattr(row, module),
+        "version": row.version,
+        "server_timestamp": row.server_timestamp
+    }
 
 
 @router.delete("/{survey_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_survey(
     survey_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)  # Allow any authenticated user
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)  # Allow any authenticated user
 ):
     """
     Delete a survey
@@ -257,7 +455,7 @@ async def delete_survey(
     - Admins/block officers can delete any survey
     - Staff can only delete surveys from their own panchayat
     """
-    survey = db.query(Survey).filter(Survey.survey_id == survey_id).first()
+    survey = await db.get(Survey, survey_id)
     
     if not survey:
         raise HTTPException(
@@ -275,14 +473,201 @@ async def delete_survey(
             )
     # Admins and block officers can delete any survey (no additional check needed)
     
-    db.delete(survey)
-    db.commit()
+    await db.delete(survey)
+    await db.commit()
     
     return None
 
 
 # ============= Helper Functions =============
 
+def survey_etag(survey) -> str:
+    """Validator for one survey: its version plus the change sequence of its last write"""
+    return make_etag(survey.version, survey.change_seq)
+
+
+def parse_fields(fields: str) -> Optional[List[str]]:
+    """Validate a ?fields= list against the survey response columns; None means all"""
+    columns = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [column for column in columns if column not in SURVEY_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(SURVEY_LIST_FIELDS)}"
+        )
+    return columns or None
+
+
+def list_query_digest(**options) -> Optional[str]:
+    """Short digest of the query options that shape a list response; None when none are set"""
+    normalized = urlencode(sorted(
+        (name, value.isoformat() if isinstance(value, datetime) else str(value).strip())
+        for name, value in options.items()
+        if value not in (None, False, "")
+    ))
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+
+def encode_list_cursor(updated_at: datetime, survey_id: str) -> str:
+    """Opaque cursor for an (updated_at, survey_id) list position"""
+    return base64.urlsafe_b64encode(f"{updated_at.isoformat()}|{survey_id}".encode()).decode()
+
+
+def decode_list_cursor(cursor: str) -> tuple:
+    """Inverse of encode_list_cursor. Raises ValueError."""
+    try:
+        updated_at, survey_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except (UnicodeDecodeError, base64.binascii.Error):
+        raise ValueError("Invalid cursor")
+    return (datetime.fromisoformat(updated_at), survey_id)
+
+
+def expected_version(incoming) -> Optional[int]:
+    """The server version the client last saw, if it sent one"""
+    if incoming.base_version is not None:
+        return incoming.base_version
+    return incoming.version
+
+
+def upsert_values(survey: SurveyCreate) -> dict:
+    """Columns written when POST /api/surveys updates an existing survey"""
+    values = {
+        field: getattr(survey, field) for field in MODULE_FIELDS
+        if getattr(survey, field) is not None
+    }
+    if survey.village_name is not None:
+        values["village_name"] = survey.village_name
+    
+    # Always update completion tracking from client
+    values.update(
+        completion_percentage=survey.completion_percentage,
+        is_complete=survey.is_complete,
+        sync_status="synced",
+        client_timestamp=survey.client_timestamp
+    )
+    return values
+
+
+async def write_with_merge(
+    db: AsyncSession,
+    current: Survey,
+    expected: Optional[int],
+    incoming,
+    values: dict,
+    scope: Optional[str] = None
+):
+    """
+    Write again after the guarded write found the survey at another version
+    
+    The incoming modules are merged onto `current` (see
+    merge_incoming_modules), or for a client without a version checked
+    against it by timestamp, and written guarded by the current version, so
+    a write racing in between is never overwritten. Raises 409 on
+    conflicting keys or if the survey moved on again.
+    """
+    modules = {}
+    conflicts = []
+    if expected is not None:
+        modules, conflicts = await merge_incoming_modules(db, current, incoming, expected)
+    elif written_after(current.server_timestamp, incoming.client_timestamp):
+        conflicts = detect_conflicts(current, incoming)
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "status": "conflict",
+                "survey_id": current.survey_id,
+                "server_version": current.version,
+                "conflicts": conflicts,
+                "message": "Data conflict detected"
+            }
+        )
+    
+    # Module values come from the merge; an explicit null still clears a module
+    row = (await db.execute(
+        guarded_update(current.survey_id, current.version or 0, {**values, **modules}, scope)
+    )).first()
+    if row is None:
+        raise_concurrent_modification(current.survey_id)
+    return row
+
+
+def raise_concurrent_modification(survey_id: str):
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "status": "conflict",
+            "survey_id": survey_id,
+            "conflicts": [],
+            "message": "Survey was modified concurrently, please retry"
+        }
+    )
+
+
+async def merge_module(
+    db: AsyncSession,
+    survey_id: str,
+    module: str,
+    expected: int,
+    server_value: Optional[dict],
+    client_value: dict
+) -> tuple:
+    """
+    Merge one module onto its current value (see merge_incoming_modules)
+    
+    Returns (merged_value, conflicts).
+    """
+    base = (await db.run_sync(load_base_versions, [(survey_id, expected)])).get((survey_id, expected))
+    if base is not None and module in base:
+        merged, conflicts = three_way_merge(base[module], server_value, client_value)
+        return merged, [
+            {"field_name": f"{module}.{conflict.pop('key')}", **conflict}
+            for conflict in conflicts
+        ]
+    
+    if server_value is not None and server_value != client_value:
+        return client_value, [{
+            "field_name": module,
+            "server_value": server_value,
+            "client_value": client_value
+        }]
+    return client_value, []
+
+
+async def merge_incoming_modules(db: AsyncSession, db_survey: Survey, incoming, expected: int) -> tuple:
+    """
+    Decide which module values to write for a survey that moved past `expected`
+    
+    With the snapshot of the expected version stored, run a key-level
+    three-way merge: non-overlapping edits are merged and only keys changed
+    differently on both sides conflict. Without it, any module whose server
+    copy differs from the incoming one is a conflict.
+    
+    Returns (modules_to_write, conflicts)
+    """
+    base = (await db.run_sync(load_base_versions, [(db_survey.survey_id, expected)])).get(
+        (db_survey.survey_id, expected)
+    )
+    if base is not None:
+        return merge_survey_modules(base, db_survey, incoming)
+    
+    modules = {
+        field: getattr(incoming, field) for field in MODULE_FIELDS
+        if getattr(incoming, field, None) is not None
+    }
+    return modules, detect_conflicts(db_survey, incoming)
+
+
+def written_after(server_timestamp: Optional[datetime], client_timestamp: Optional[datetime]) -> bool:
+    """Whether the server copy is newer than the client's copy (only known when both are set)"""
+    if server_timestamp is None or client_timestamp is None:
+        return False
+    # Make both timezone-naive for comparison
+    return server_timestamp.replace(tzinfo=None) > client_timestamp.replace(tzinfo=None)
+
+
 def detect_conflicts(db_survey: Survey, incoming_survey) -> List[dict]:
     """
     Detect conflicts between database survey and incoming survey
@@ -311,8 +696,8 @@ def detect_conflicts(db_survey: Survey, incoming_survey) -> List[dict]:
                 "field_name": field,
                 "server_value": db_value,
                 "client_value": incoming_value,
-                "server_timestamp": db_survey.server_timestamp.isoformat(),
-                "client_timestamp": getattr(incoming_survey, "client_timestamp", datetime.utcnow()).isoformat()
+                "server_timestamp": (db_survey.server_timestamp or datetime.utcnow()).isoformat(),
+                "client_timestamp": (getattr(incoming_survey, "client_timestamp", None) or datetime.utcnow()).isoformat()
             })
     
     return conflicts
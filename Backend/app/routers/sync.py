@@ -1,13 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
-import uuid
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from typing import List, Optional
+import asyncio
+import json
+import logging
 
-from ..database import get_db
-from ..models.models import Survey, SyncLog, User
-from ..schemas.schemas import SyncRequest, SyncResponse, SurveyCreate
-from ..utils.dependencies import get_current_user
+from ..config import settings
+from ..database import get_async_db, AsyncSessionLocal
+from ..models.models import SyncLog, SyncJob
+from ..schemas.schemas import (
+    SyncRequest, SyncResponse, SyncSurvey,
+    DeltaSyncRequest, DeltaSyncResponse,
+    SyncJobAccepted, SyncJobStatus, TokenData
+)
+from ..services.delta_sync import apply_delta_batch_once
+from ..services.notifications import change_hub
+from ..services.idempotency import (
+    IdempotencyInProgress, IdempotencyKeyReused,
+    request_fingerprint, claim_key, complete_key, release_key, batch_key
+)
+from ..services.sync_engine import apply_sync_batch_once, summarize_results
+from ..services.sync_jobs import enqueue_sync_job, sync_job_workers
+from ..services.sync_counters import read_sync_status_counts, rebuild_sync_status_counts
+from ..utils.dependencies import get_current_principal, get_event_stream_user, check_admin_role
+from ..utils.streaming import NDJSONStreamingResponse, iter_ndjson_lines, ndjson_line
+
+logger = logging.getLogger(__name__)
+
+# Surveys validated and applied per transaction on the streaming endpoint
+STREAM_CHUNK_SIZE = 50
 
 router = APIRouter(prefix="/api/sync", tags=["Sync"])
 
@@ -15,8 +39,9 @@ router = APIRouter(prefix="/api/sync", tags=["Sync"])
 @router.post("/batch", response_model=SyncResponse)
 async def batch_sync(
     sync_request: SyncRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
     """
     Batch sync multiple surveys from offline device
@@ -25,103 +50,265 @@ async def batch_sync(
     - Multiple survey submissions at once
     - Conflict detection for each survey
     - Logging sync operations
+    
+    The whole batch is applied with set-based statements (one prefetch,
+    one upsert, one bulk log insert) instead of per-survey round trips.
+    
+    Retries: send the same Idempotency-Key header with the same body to get
+    the stored response of the first attempt; a batch that was not fully
+    synced is retried, skipping the surveys already applied. Surveys may
+    also carry their own idempotency_key; already applied surveys are
+    answered from the stored result.
     """
-    synced_count = 0
-    failed_count = 0
-    conflicts = []
+    key = batch_key(current_user.user_id, idempotency_key) if idempotency_key else None
+    stored = await _claim_idempotent(db, key, current_user, sync_request.model_dump(mode="json"))
+    if stored is not None:
+        return stored
     
-    for survey_data in sync_request.surveys:
-        try:
-            # Check if survey exists
-            existing_survey = db.query(Survey).filter(
-                Survey.survey_id == survey_data.survey_id
-            ).first()
-            
-            if existing_survey:
-                # Update existing survey
-                result = update_existing_survey(db, existing_survey, survey_data, current_user)
-                if result["status"] == "conflict":
-                    conflicts.append(survey_data.survey_id)
-                    failed_count += 1
-                    log_sync_operation(
-                        db, survey_data.survey_id, current_user.user_id,
-                        "update", "conflict", result.get("conflicts")
-                    )
-                else:
-                    synced_count += 1
-                    log_sync_operation(
-                        db, survey_data.survey_id, current_user.user_id,
-                        "update", "success"
-                    )
-            else:
-                # Create new survey
-                create_new_survey(db, survey_data, current_user)
-                synced_count += 1
-                log_sync_operation(
-                    db, survey_data.survey_id, current_user.user_id,
-                    "create", "success"
-                )
+    try:
+        results = await db.run_sync(apply_sync_batch_once, sync_request.surveys, current_user, key)
+        response = summarize_results(results)
+        await _settle_idempotent(db, key, response, final=response["status"] == "completed")
+    except Exception:
+        await _release_idempotent(db, key)
+        raise
+    
+    return response
+
+
+@router.post("/jobs", response_model=SyncJobAccepted, status_code=status.HTTP_202_ACCEPTED)
+async def create_sync_job(
+    sync_request: SyncRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
+):
+    """
+    Queue a batch sync for background processing
+    
+    Stores the batch and returns 202 with a job id right away; background
+    workers apply it with the same engine as /api/sync/batch. Poll
+    GET /api/sync/jobs/{job_id} for per-survey results.
+    
+    A repeated Idempotency-Key returns the job created by the first attempt.
+    """
+    key = batch_key(current_user.user_id, f"job:{idempotency_key}") if idempotency_key else None
+    stored = await _claim_idempotent(db, key, current_user, sync_request.model_dump(mode="json"))
+    if stored is not None:
+        response.headers["Location"] = stored["status_url"]
+        return stored
+    
+    try:
+        job = await db.run_sync(enqueue_sync_job, sync_request.surveys, current_user)
+        accepted = {
+            "job_id": job.job_id,
+            "status": "queued",
+            "status_url": f"/api/sync/jobs/{job.job_id}"
+        }
+        await _settle_idempotent(db, key, accepted, final=True)
+    except Exception:
+        await _release_idempotent(db, key)
+        raise
+    
+    sync_job_workers.notify()
+    response.headers["Location"] = accepted["status_url"]
+    return accepted
+
+
+@router.get("/jobs/{job_id}", response_model=SyncJobStatus)
+async def get_sync_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
+):
+    """
+    Get the status of a queued sync job
+    
+    Per-survey results and the summary are included once the job completed.
+    """
+    job = await db.get(SyncJob, job_id)
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sync job not found"
+        )
+    
+    # Users can only see their own jobs; admins and block officers see all
+    if current_user.role == "staff" and job.user_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    return job
+
+
+@router.post("/delta", response_model=DeltaSyncResponse)
+async def delta_sync(
+    delta_request: DeltaSyncRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
+):
+    """
+    Delta sync - send only changed answers instead of whole modules
+    
+    Each delta carries the survey version the device last saw and, per
+    module, the keys that changed (null removes a key). A delta applies only
+    if the survey is still at base_version; otherwise the result is a
+    conflict listing just the patched keys that differ on the server.
+    New surveys must still go through /api/sync/batch.
+    
+    Supports the Idempotency-Key header like /api/sync/batch.
+    """
+    key = batch_key(current_user.user_id, idempotency_key) if idempotency_key else None
+    stored = await _claim_idempotent(db, key, current_user, delta_request.model_dump(mode="json"))
+    if stored is not None:
+        return stored
+    
+    try:
+        results = await db.run_sync(apply_delta_batch_once, delta_request.deltas, current_user, key)
+        synced_count = sum(1 for r in results if r["status"] == "success")
+        failed_count = len(results) - synced_count
         
-        except Exception as e:
-            failed_count += 1
-            log_sync_operation(
-                db, survey_data.survey_id, current_user.user_id,
-                "create", "failed", error_message=str(e)
-            )
+        response = {
+            "status": "completed" if failed_count == 0 else "partial",
+            "synced_count": synced_count,
+            "failed_count": failed_count,
+            "results": results,
+            "message": f"Synced {synced_count} surveys successfully. {failed_count} failed."
+        }
+        await _settle_idempotent(db, key, response, final=failed_count == 0)
+    except Exception:
+        await _release_idempotent(db, key)
+        raise
     
-    db.commit()
+    return response
+
+
+@router.post("/stream")
+async def stream_sync(
+    request: Request,
+    current_user: TokenData = Depends(get_current_principal)
+):
+    """
+    Streaming variant of batch sync
     
-    return {
-        "status": "completed" if failed_count == 0 else "partial",
-        "synced_count": synced_count,
-        "failed_count": failed_count,
-        "conflicts": conflicts,
-        "message": f"Synced {synced_count} surveys successfully. {failed_count} failed."
-    }
+    Request body: newline-delimited JSON (application/x-ndjson), one
+    survey per line (same shape as the items of /api/sync/batch,
+    including the optional idempotency_key).
+    
+    Surveys are validated and applied in chunks of STREAM_CHUNK_SIZE as
+    they arrive, each chunk in its own transaction. The response streams
+    one NDJSON result line per survey as soon as its chunk commits, followed
+    by a final summary line: {"summary": {...}}.
+    """
+    return NDJSONStreamingResponse(_stream_sync_results(request, current_user))
+
+
+@router.get("/events")
+async def change_events(
+    request: Request,
+    panchayat_id: Optional[str] = None,
+    current_user: TokenData = Depends(get_event_stream_user)
+):
+    """
+    Server-Sent Events stream of change notices for a panchayat
+    
+    Instead of polling, keep this stream open and pull changes
+    (GET /api/surveys/changes) only when a notice arrives:
+    
+        event: survey
+        id: <change sequence>
+        data: {"type": "survey", "panchayat_id": "...", "version": 123}
+    
+        event: schema
+        data: {"type": "schema", "module_name": "...", "version": "1.0"}
+    
+    Staff always receive their own panchayat (staff without one are
+    refused); admins may pick one with panchayat_id or receive all. The token may be passed as ?access_token=
+    for EventSource clients. An idle stream only carries a comment
+    heartbeat every CHANGE_EVENTS_HEARTBEAT_SECONDS and holds no database
+    connection.
+    """
+    if not settings.CHANGE_EVENTS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Change events are disabled"
+        )
+    
+    if current_user.role in ["admin", "block_officer"]:
+        scope = panchayat_id
+    elif current_user.panchayat_id:
+        scope = current_user.panchayat_id
+    else:
+        # A subscription without a panchayat receives every panchayat's notices
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No panchayat assigned"
+        )
+    
+    return StreamingResponse(
+        _change_event_stream(scope),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/status")
 async def get_sync_status(
     panchayat_id: str = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
     """
     Get sync status for surveys
     
-    Returns count of pending, synced, and conflicted surveys
+    Returns count of pending, synced, and conflicted surveys,
+    read from the incrementally maintained counter table in one query
+    (counted from surveys when it holds nothing for the scope)
     """
-    query = db.query(Survey)
-    
     # Filter by panchayat
-    if panchayat_id:
-        query = query.filter(Survey.panchayat_id == panchayat_id)
-    elif current_user.panchayat_id:
-        query = query.filter(Survey.panchayat_id == current_user.panchayat_id)
+    scope = panchayat_id or current_user.panchayat_id
+    counts = await db.run_sync(read_sync_status_counts, scope)
     
-    # Count by status
-    total = query.count()
-    synced = query.filter(Survey.sync_status == "synced").count()
-    pending = query.filter(Survey.sync_status == "pending").count()
-    conflict = query.filter(Survey.sync_status == "conflict").count()
-    failed = query.filter(Survey.sync_status == "failed").count()
+    total = sum(counts.values())
+    synced = counts.get("synced", 0)
     
     return {
         "total": total,
         "synced": synced,
-        "pending": pending,
-        "conflict": conflict,
-        "failed": failed,
+        "pending": counts.get("pending", 0),
+        "conflict": counts.get("conflict", 0),
+        "failed": counts.get("failed", 0),
         "sync_percentage": round((synced / total * 100) if total > 0 else 0, 2)
     }
 
 
+@router.post("/status/rebuild")
+async def rebuild_sync_status(
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: TokenData = Depends(check_admin_role)
+):
+    """
+    Recompute the sync status counters from the surveys table (admin only)
+    
+    Use after bulk data fixes made outside the application.
+    """
+    await db.run_sync(rebuild_sync_status_counts)
+    await db.commit()
+    
+    return {"message": "Sync status counters rebuilt"}
+
+
 @router.get("/logs")
 async def get_sync_logs(
     survey_id: str = None,
     limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(get_current_principal)
 ):
     """
     Get sync logs for debugging
@@ -130,12 +317,12 @@ async def get_sync_logs(
     - survey_id: Filter logs for specific survey
     - limit: Number of logs to return (default 50)
     """
-    query = db.query(SyncLog)
+    query = select(SyncLog)
     
     if survey_id:
-        query = query.filter(SyncLog.survey_id == survey_id)
+        query = query.where(SyncLog.survey_id == survey_id)
     
-    logs = query.order_by(SyncLog.timestamp.desc()).limit(limit).all()
+    logs = (await db.scalars(query.order_by(SyncLog.timestamp.desc()).limit(limit))).all()
     
     return {
         "logs": [
@@ -155,98 +342,135 @@ async def get_sync_logs(
 
 # ============= Helper Functions =============
 
-def update_existing_survey(db: Session, existing: Survey, incoming: SurveyCreate, user: User) -> dict:
-    """Update existing survey and check for conflicts"""
-    
-    # Detect conflicts
-    conflicts = []
-    module_fields = [
-        "basic_info", "infrastructure", "sanitation",
-        "connectivity", "land_forest", "electricity", "waste_management"
-    ]
+async def _claim_idempotent(db: AsyncSession, key: Optional[str], user: TokenData, payload) -> Optional[dict]:
+    """Claim an Idempotency-Key for this request; returns the stored response of a replay"""
+    if key is None:
+        return None
+    try:
+        stored = await db.run_sync(claim_key, key, user.user_id, request_fingerprint(payload))
+        await db.commit()
+    except IdempotencyInProgress:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed"
+        )
+    except IdempotencyKeyReused:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="This Idempotency-Key was already used for a different request"
+        )
+    return stored
+
+
+async def _settle_idempotent(db: AsyncSession, key: Optional[str], response: dict, final: bool):
+    """Commit the request, storing its response under the key only if a retry should replay it"""
+    if key:
+        if final:
+            await db.run_sync(complete_key, key, response)
+        else:
+            await db.run_sync(release_key, key)
+    await db.commit()
+
+
+async def _release_idempotent(db: AsyncSession, key: Optional[str]):
+    """Roll back a failed request and free its key for a retry"""
+    await db.rollback()
+    if key:
+        await db.run_sync(release_key, key)
+        await db.commit()
+
+
+async def _stream_sync_results(request: Request, user: TokenData):
+    """Read, apply and report NDJSON surveys chunk by chunk"""
+    # The request-scoped session from get_async_db is closed before a
+    # streaming response starts, so the stream owns its own session.
+    db = AsyncSessionLocal()
+    synced_count = 0
+    failed_count = 0
+    line_number = 0
+    chunk: List[SyncSurvey] = []
     
-    for field in module_fields:
-        db_value = getattr(existing, field)
-        incoming_value = getattr(incoming, field, None)
+    try:
+        try:
+            async for line in iter_ndjson_lines(request.stream()):
+                line_number += 1
+                try:
+                    chunk.append(SyncSurvey.model_validate_json(line))
+                except ValidationError as e:
+                    failed_count += 1
+                    yield ndjson_line({
+                        "line": line_number,
+                        "status": "failed",
+                        "error_message": str(e)
+                    })
+                    continue
+                
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    for result in await _apply_stream_chunk(db, chunk, user):
+                        synced_count += result["status"] == "success"
+                        failed_count += result["status"] != "success"
+                        yield ndjson_line(result)
+                    chunk = []
+        except ValueError as e:
+            failed_count += 1
+            yield ndjson_line({"line": line_number + 1, "status": "failed", "error_message": str(e)})
         
-        if incoming_value is None:
-            continue
+        for result in await _apply_stream_chunk(db, chunk, user):
+            synced_count += result["status"] == "success"
+            failed_count += result["status"] != "success"
+            yield ndjson_line(result)
         
-        if db_value != incoming_value and db_value is not None:
-            conflicts.append({
-                "field_name": field,
-                "server_value": db_value,
-                "client_value": incoming_value
-            })
-    
-    # If conflicts exist, return conflict status
-    if conflicts:
-        return {
-            "status": "conflict",
-            "conflicts": conflicts
-        }
-    
-    # No conflicts - update survey
-    for field in module_fields:
-        incoming_value = getattr(incoming, field, None)
-        if incoming_value is not None:
-            setattr(existing, field, incoming_value)
-    
-    existing.village_name = incoming.village_name or existing.village_name
-    existing.completion_percentage = incoming.completion_percentage
-    existing.is_complete = incoming.is_complete
-    existing.sync_status = "synced"
-    existing.last_synced_at = datetime.utcnow()
-    existing.server_timestamp = datetime.utcnow()
-    existing.version += 1
-    
-    return {"status": "success"}
-
-
-def create_new_survey(db: Session, survey_data: SurveyCreate, user: User):
-    """Create a new survey from sync data"""
-    
-    new_survey = Survey(
-        survey_id=survey_data.survey_id,
-        panchayat_id=survey_data.panchayat_id,
-        user_id=user.user_id,
-        village_name=survey_data.village_name,
-        basic_info=survey_data.basic_info,
-        infrastructure=survey_data.infrastructure,
-        sanitation=survey_data.sanitation,
-        connectivity=survey_data.connectivity,
-        land_forest=survey_data.land_forest,
-        electricity=survey_data.electricity,
-        waste_management=survey_data.waste_management,
-        completion_percentage=survey_data.completion_percentage,
-        is_complete=survey_data.is_complete,
-        sync_status="synced",
-        last_synced_at=datetime.utcnow(),
-        client_timestamp=survey_data.client_timestamp,
-        server_timestamp=datetime.utcnow()
-    )
-    
-    db.add(new_survey)
+        yield ndjson_line({"summary": {
+            "status": "completed" if failed_count == 0 else "partial",
+            "synced_count": synced_count,
+            "failed_count": failed_count,
+            "message": f"Synced {synced_count} surveys successfully. {failed_count} failed."
+        }})
+    finally:
+        await db.close()
 
 
-def log_sync_operation(
-    db: Session,
-    survey_id: str,
-    user_id: str,
-    operation: str,
-    status: str,
-    conflicts: list = None,
-    error_message: str = None
-):
-    """Log sync operation for audit trail"""
-    
-    log = SyncLog(
-        survey_id=survey_id,
-        user_id=user_id,
-        operation=operation,
-        status=status,
-        conflicts=conflicts,
-        error_message=error_message
-    )
+async def _change_event_stream(panchayat_id: Optional[str]):
+    """Relay hub notices as SSE frames until the client disconnects"""
+    queue = change_hub.subscribe(panchayat_id)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                notice = await asyncio.wait_for(queue.get(), timeout=settings.CHANGE_EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            
+            frame = f"event: {notice.get('type', 'change')}\n"
+            if notice.get("type") == "survey":
+                frame += f"id: {notice.get('version')}\n"
+            yield frame + f"data: {json.dumps(notice)}\n\n"
+    finally:
+        change_hub.unsubscribe(panchayat_id, queue)
+
+
+async def _apply_stream_chunk(db: AsyncSession, chunk: List[SyncSurvey], user: TokenData) -> List[dict]:
+    """Apply one chunk in its own transaction; a failing chunk fails only its own surveys"""
+    if not chunk:
+        return []
     
-    db.add(log)
+    try:
+        results = await db.run_sync(apply_sync_batch_once, chunk, user)
+        await db.commit()
+        return results
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Streaming sync chunk failed: {e}")
+        return [
+            {
+                "survey_id": survey.survey_id,
+                "operation": "sync",
+                "status": "failed",
+                "conflicts": None,
+                "error_message": str(e)
+            }
+            for survey in chunk
+        ]
@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, desc
 from typing import List, Optional
 from datetime import datetime
 
-from ..database import get_db
-from ..models.models import User, Survey, Panchayat
-from ..schemas.schemas import UserResponse
+from ..config import settings
+from ..database import get_async_db, AsyncSessionLocal
+from ..models.models import User, Survey, Panchayat, UserActivityStat, PanchayatActivityStat
+from ..schemas.schemas import UserResponse, TokenData
+from ..services.principals import invalidate_principal
+from ..services.survey_search import search_clause, search_rank
+from ..services.survey_export import load_export_columns, export_columns, stream_csv, stream_ndjson
+from ..services.activity_stats import rebuild_activity_stats, find_activity_drift
 from ..utils.dependencies import get_current_user, check_admin_role
 from pydantic import BaseModel
 
@@ -50,6 +56,24 @@ class SurveyListItem(BaseModel):
         from_attributes = True
 
 
+class PanchayatActivity(BaseModel):
+    """Survey activity of one panchayat"""
+    panchayat_id: str
+    name: str
+    surveys_created: int
+    last_survey_date: Optional[datetime]
+
+
+class ActivityDrift(BaseModel):
+    """Activity counter that disagrees with the surveys table"""
+    scope: str  # user or panchayat
+    key: str
+    stored_count: Optional[int]
+    actual_count: int
+    stored_last_survey_date: Optional[datetime]
+    actual_last_survey_date: Optional[datetime]
+
+
 class UsersOverview(BaseModel):
     """Overview of all users and their activity"""
     total_users: int
@@ -61,84 +85,124 @@ class UsersOverview(BaseModel):
     users: List[UserStats]
 
 
+# Sortable columns of the users overview
+OVERVIEW_SORT_FIELDS = ["username", "full_name", "role", "created_at", "surveys_created", "last_survey_date"]
+
+
 # ============= API Endpoints =============
 
 @router.get("/overview", response_model=UsersOverview)
 async def get_users_overview(
-    current_user: User = Depends(check_admin_role),
-    db: Session = Depends(get_db)
+    current_user: TokenData = Depends(check_admin_role),
+    db: AsyncSession = Depends(get_async_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    sort_by: str = Query("username", pattern=f"^({'|'.join(OVERVIEW_SORT_FIELDS)})$"),
+    sort_order: str = Query("asc", pattern="^(asc|desc)$")
 ):
     """
     Get overview of all users with their statistics (Admin only)
     
+    Query Parameters:
+    - skip, limit: Pagination over users
+    - sort_by: username (default), full_name, role, created_at,
+      surveys_created or last_survey_date
+    - sort_order: asc (default) or desc
+    
     Returns:
-    - Total user counts by status and role
-    - List of all users with their survey statistics
+    - Total user counts by status and role (over all users, not the page)
+    - One page of users with their survey statistics
+    
+    Computed with a single query over users, joined with their panchayat
+    and their activity counters; the totals are window aggregates over the
+    same rows. The surveys table is not read.
     """
-    # Get all users with their panchayat info
-    users = db.query(User).all()
-    
-    # Calculate statistics
-    total_users = len(users)
-    active_users = sum(1 for u in users if u.is_active)
-    inactive_users = total_users - active_users
-    admin_users = sum(1 for u in users if u.role == 'admin')
-    staff_users = sum(1 for u in users if u.role == 'staff')
-    
-    # Get total surveys count
-    total_surveys = db.query(func.count(Survey.survey_id)).scalar()
-    
-    # Build user statistics
-    user_stats = []
-    for user in users:
-        # Get panchayat name
-        panchayat_name = None
-        if user.panchayat_id:
-            panchayat = db.query(Panchayat).filter(
-                Panchayat.panchayat_id == user.panchayat_id
-            ).first()
-            if panchayat:
-                panchayat_name = panchayat.name
-        
-        # Get user's survey count and last survey date
-        surveys_created = db.query(func.count(Survey.survey_id)).filter(
-            Survey.user_id == user.user_id
-        ).scalar()
-        
-        last_survey = db.query(Survey).filter(
-            Survey.user_id == user.user_id
-        ).order_by(desc(Survey.created_at)).first()
-        
-        last_survey_date = last_survey.created_at if last_survey else None
-        
-        user_stats.append(UserStats(
-            user_id=user.user_id,
-            username=user.username,
-            full_name=user.full_name,
-            email=user.email,
-            role=user.role,
-            panchayat_name=panchayat_name,
-            is_active=user.is_active,
-            surveys_created=surveys_created,
-            last_survey_date=last_survey_date,
-            created_at=user.created_at
-        ))
+    rows = (await db.execute(
+        overview_query(sort_by, sort_order).offset(skip).limit(limit)
+    )).mappings().all()
+    
+    if not rows and skip > 0:
+        # Paged past the end; the totals still come from the first row
+        totals = (await db.execute(overview_query(sort_by, sort_order).limit(1))).mappings().first()
+    else:
+        totals = rows[0] if rows else None
+    
+    total_users = totals["total_users"] if totals else 0
+    active_users = totals["active_users"] if totals else 0
     
     return UsersOverview(
         total_users=total_users,
         active_users=active_users,
-        inactive_users=inactive_users,
-        admin_users=admin_users,
-        staff_users=staff_users,
-        total_surveys=total_surveys,
-        users=user_stats
+        inactive_users=total_users - active_users,
+        admin_users=totals["admin_users"] if totals else 0,
+        staff_users=totals["staff_users"] if totals else 0,
+        total_surveys=int(totals["total_surveys"]) if totals else 0,
+        users=[UserStats(**row) for row in rows]
     )
 
 
+@router.get("/activity/panchayats", response_model=List[PanchayatActivity])
+async def get_panchayat_activity(
+    current_user: TokenData = Depends(check_admin_role),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Surveys created and latest survey date per panchayat (Admin only)
+    
+    Read from the activity counters, one row per panchayat.
+    """
+    rows = (await db.execute(
+        select(
+            Panchayat.panchayat_id,
+            Panchayat.name,
+            func.coalesce(PanchayatActivityStat.surveys_created, 0).label("surveys_created"),
+            PanchayatActivityStat.last_survey_date
+        ).outerjoin(
+            PanchayatActivityStat, PanchayatActivityStat.panchayat_id == Panchayat.panchayat_id
+        ).order_by(Panchayat.name)
+    )).mappings().all()
+    
+    return [PanchayatActivity(**row) for row in rows]
+
+
+@router.get("/activity/drift", response_model=List[ActivityDrift])
+async def get_activity_drift(
+    fix: bool = False,
+    current_user: TokenData = Depends(check_admin_role),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Compare the activity counters with the surveys table (Admin only)
+    
+    Returns every counter that disagrees; an empty list means no drift.
+    With fix=true the listed counters are corrected as well.
+    """
+    drift = await db.run_sync(find_activity_drift, fix)
+    await db.commit()
+    
+    return drift
+
+
+@router.post("/activity/rebuild")
+async def rebuild_activity(
+    current_user: TokenData = Depends(check_admin_role),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Recompute the activity counters from the surveys table (Admin only)
+    
+    Use after bulk data fixes made outside the application.
+    """
+    await db.run_sync(rebuild_activity_stats)
+    await db.commit()
+    
+    return {"message": "Activity counters rebuilt"}
+
+
 @router.get("/surveys", response_model=List[SurveyListItem])
 async def get_all_surveys(
-    current_user: User = Depends(check_admin_role),
-    db: Session = Depends(get_db),
+    current_user: TokenData = Depends(check_admin_role),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     user_id: Optional[str] = None,
@@ -151,16 +215,23 @@ async def get_all_surveys(
     - skip: Number of records to skip (pagination)
     - limit: Maximum number of records to return
     - user_id: Filter by specific user
-    - search: Search in village name or creator name
+    - search: Search in village name or creator name, anywhere in the
+      text ("pur" finds "Rampur"); villages starting with the term first
     
     Returns list of surveys with creator information
     """
-    # Base query with joins
-    query = db.query(
-        Survey,
-        User.username,
-        User.full_name,
-        Panchayat.name.label('panchayat_name')
+    # Base query with joins; module data is not needed for the listing
+    query = select(
+        Survey.survey_id,
+        Survey.village_name,
+        User.username.label('created_by_username'),
+        User.full_name.label('created_by_fullname'),
+        Panchayat.name.label('panchayat_name'),
+        Survey.completion_percentage,
+        Survey.is_complete,
+        Survey.created_at,
+        Survey.updated_at,
+        Survey.sync_status
     ).join(
         User, Survey.user_id == User.user_id
     ).outerjoin(
@@ -168,52 +239,61 @@ async def get_all_surveys(
     )
     
     # Apply filters
-    if user_id:
-        query = query.filter(Survey.user_id == user_id)
+    query = filter_surveys(query, user_id=user_id, search=search)
     
+    # Best matches first when searching, otherwise most recent first
     if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (Survey.village_name.ilike(search_pattern)) |
-            (User.username.ilike(search_pattern)) |
-            (User.full_name.ilike(search_pattern))
-        )
-    
-    # Order by most recent first
-    query = query.order_by(desc(Survey.updated_at))
+        query = query.order_by(desc(search_rank(search)), desc(Survey.updated_at))
+    else:
+        query = query.order_by(desc(Survey.updated_at))
     
     # Apply pagination
-    results = query.offset(skip).limit(limit).all()
+    results = (await db.execute(query.offset(skip).limit(limit))).mappings().all()
     
     # Build response
-    surveys = []
-    for survey, username, full_name, panchayat_name in results:
-        surveys.append(SurveyListItem(
-            survey_id=survey.survey_id,
-            village_name=survey.village_name,
-            created_by_username=username,
-            created_by_fullname=full_name,
-            panchayat_name=panchayat_name,
-            completion_percentage=survey.completion_percentage,
-            is_complete=survey.is_complete,
-            created_at=survey.created_at,
-            updated_at=survey.updated_at,
-            sync_status=survey.sync_status
-        ))
+    surveys = [SurveyListItem(**row) for row in results]
     
     return surveys
 
 
+@router.get("/surveys/export")
+async def export_surveys(
+    current_user: TokenData = Depends(check_admin_role),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    user_id: Optional[str] = None,
+    panchayat_id: Optional[str] = None,
+    search: Optional[str] = None
+):
+    """
+    Export all matching surveys with their module data (Admin only)
+    
+    Query Parameters:
+    - format: csv (default) or ndjson
+    - user_id, panchayat_id: Filter by creator or panchayat
+    - search: Search in village name or creator name
+    
+    Module fields are flattened into `module.field` columns using the
+    active form schemas. Rows are read through a server-side cursor and
+    streamed in chunks, so memory use does not grow with the export size.
+    """
+    filename = f"surveys_{datetime.utcnow():%Y%m%d_%H%M%S}.{format}"
+    return StreamingResponse(
+        _export_stream(format, user_id=user_id, panchayat_id=panchayat_id, search=search),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user_details(
     user_id: str,
-    current_user: User = Depends(check_admin_role),
-    db: Session = Depends(get_db)
+    current_user: TokenData = Depends(check_admin_role),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get detailed information about a specific user (Admin only)
     """
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.get(User, user_id)
     
     if not user:
         raise HTTPException(
@@ -227,13 +307,13 @@ async def get_user_details(
 @router.patch("/{user_id}/toggle-active")
 async def toggle_user_active_status(
     user_id: str,
-    current_user: User = Depends(check_admin_role),
-    db: Session = Depends(get_db)
+    current_user: TokenData = Depends(check_admin_role),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Toggle user active/inactive status (Admin only)
     """
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.get(User, user_id)
     
     if not user:
         raise HTTPException(
@@ -248,8 +328,9 @@ async def toggle_user_active_status(
         )
     
     user.is_active = not user.is_active
-    db.commit()
-    db.refresh(user)
+    await invalidate_principal(db, user.user_id, revoke_tokens=not user.is_active)
+    await db.commit()
+    await db.refresh(user)
     
     return {
         "message": f"User {'activated' if user.is_active else 'deactivated'} successfully",
@@ -261,15 +342,15 @@ async def toggle_user_active_status(
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: str,
-    current_user: User = Depends(check_admin_role),
-    db: Session = Depends(get_db)
+    current_user: TokenData = Depends(check_admin_role),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Delete a user account (Admin only)
     
     Note: This will not delete the user's surveys, only unlink them
     """
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.get(User, user_id)
     
     if not user:
         raise HTTPException(
@@ -284,16 +365,84 @@ async def delete_user(
         )
     
     # Get survey count before deletion
-    survey_count = db.query(func.count(Survey.survey_id)).filter(
-        Survey.user_id == user_id
-    ).scalar()
+    survey_count = await db.scalar(
+        select(func.count(Survey.survey_id)).where(Survey.user_id == user_id)
+    )
     
     # Delete user
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await invalidate_principal(db, user_id, revoke_tokens=True)
+    await db.commit()
     
     return {
         "message": "User deleted successfully",
         "user_id": user_id,
         "surveys_retained": survey_count
     }
+
+
+# ============= Helper Functions =============
+
+def overview_query(sort_by: str, sort_order: str):
+    """Users with panchayat name, activity counters and overview totals, sorted"""
+    surveys_created = func.coalesce(UserActivityStat.surveys_created, 0)
+    
+    sort_column = {
+        "username": User.username,
+        "full_name": User.full_name,
+        "role": User.role,
+        "created_at": User.created_at,
+        "surveys_created": surveys_created,
+        "last_survey_date": UserActivityStat.last_survey_date,
+    }[sort_by]
+    sort_column = desc(sort_column) if sort_order == "desc" else sort_column.asc()
+    
+    return select(
+        User.user_id,
+        User.username,
+        User.full_name,
+        User.email,
+        User.role,
+        Panchayat.name.label("panchayat_name"),
+        User.is_active,
+        surveys_created.label("surveys_created"),
+        UserActivityStat.last_survey_date,
+        User.created_at,
+        func.count().over().label("total_users"),
+        func.count().filter(User.is_active == True).over().label("active_users"),
+        func.count().filter(User.role == "admin").over().label("admin_users"),
+        func.count().filter(User.role == "staff").over().label("staff_users"),
+        func.sum(surveys_created).over().label("total_surveys")
+    ).outerjoin(
+        Panchayat, User.panchayat_id == Panchayat.panchayat_id
+    ).outerjoin(
+        UserActivityStat, UserActivityStat.user_id == User.user_id
+    ).order_by(sort_column.nulls_last(), User.user_id)
+
+
+def filter_surveys(query, user_id: Optional[str] = None, panchayat_id: Optional[str] = None,
+                   search: Optional[str] = None):
+    """Apply the admin survey filters"""
+    if user_id:
+        query = query.where(Survey.user_id == user_id)
+    
+    if panchayat_id:
+        query = query.where(Survey.panchayat_id == panchayat_id)
+    
+    if search:
+        query = query.where(search_clause(search))
+    
+    return query
+
+
+async def _export_stream(format: str, **filters):
+    """Stream export chunks from a server-side cursor on a dedicated session"""
+    async with AsyncSessionLocal() as db:
+        columns = await load_export_columns(db)
+        query = select(*export_columns(columns)).join(User, Survey.user_id == User.user_id)
+        query = filter_surveys(query, **filters).order_by(desc(Survey.updated_at), desc(Survey.survey_id))
+        
+        result = await db.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        writer = stream_csv if format == "csv" else stream_ndjson
+        async for chunk in writer(result, columns, settings.EXPORT_BATCH_SIZE):
+            yield chunk
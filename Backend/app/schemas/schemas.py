@@ -31,16 +31,42 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class BulkUserImportError(BaseModel):
+    row: int  # 1-based position among the submitted users
+    username: Optional[str] = None
+    detail: str
+
+
+class BulkUserImportResponse(BaseModel):
+    created: list[UserResponse]
+    errors: list[BulkUserImportError]
+
+
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     user_info: UserResponse
     panchayat_info: Optional[Dict[str, Any]] = None
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class RefreshResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+
+
 class TokenData(BaseModel):
+    """Authenticated caller as described by the signed token claims"""
     username: Optional[str] = None
     user_id: Optional[str] = None
+    role: Optional[str] = None
+    panchayat_id: Optional[str] = None
+    token_version: int = 0
 
 
 # ============= Panchayat Schemas =============
@@ -85,6 +111,10 @@ class SurveyCreate(SurveyBase):
     survey_id: str
     panchayat_id: str
     client_timestamp: Optional[datetime] = None
+    # Server version the client last synced; guards the write and enables
+    # key-level three-way merge (version is accepted as an alias)
+    base_version: Optional[int] = None
+    version: Optional[int] = None
 
 
 class SurveyUpdate(BaseModel):
@@ -99,6 +129,25 @@ class SurveyUpdate(BaseModel):
     completion_percentage: Optional[int] = Field(default=None, ge=0, le=100)
     is_complete: Optional[bool] = None
     client_timestamp: Optional[datetime] = None
+    base_version: Optional[int] = None
+    version: Optional[int] = None
+
+
+class ModuleUpdate(BaseModel):
+    """New contents of one survey module"""
+    data: Optional[Dict[str, Any]] = None  # null clears the module; omitted leaves it unchanged
+    version: Optional[int] = None  # Survey version the client last synced
+    completion_percentage: Optional[int] = Field(default=None, ge=0, le=100)
+    is_complete: Optional[bool] = None
+    client_timestamp: Optional[datetime] = None
+
+
+class ModuleUpdateResponse(BaseModel):
+    survey_id: str
+    module: str
+    data: Optional[Dict[str, Any]] = None
+    version: int
+    server_timestamp: datetime
 
 
 class SurveyResponse(SurveyBase):
@@ -116,6 +165,18 @@ class SurveyResponse(SurveyBase):
         from_attributes = True
 
 
+class SurveyChange(BaseModel):
+    survey_id: str
+    deleted: bool = False
+    survey: Optional[SurveyResponse] = None  # None for deletions
+
+
+class SurveyChangesPage(BaseModel):
+    changes: list[SurveyChange]
+    next_cursor: str  # Pass back as ?cursor= to continue
+    has_more: bool
+
+
 # ============= Conflict Resolution Schemas =============
 
 class ConflictField(BaseModel):
@@ -141,8 +202,14 @@ class ConflictResolution(BaseModel):
 
 # ============= Sync Schemas =============
 
+class SyncSurvey(SurveyCreate):
+    # Client-generated key; a retried survey with the same key is answered
+    # from the stored result instead of being applied again
+    idempotency_key: Optional[str] = None
+
+
 class SyncRequest(BaseModel):
-    surveys: list[SurveyCreate]
+    surveys: list[SyncSurvey]
 
 
 class SyncResponse(BaseModel):
@@ -153,6 +220,58 @@ class SyncResponse(BaseModel):
     message: str
 
 
+class SyncJobAccepted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+
+class SyncJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    summary: Optional[SyncResponse] = None
+    results: Optional[list[Dict[str, Any]]] = None
+    error_message: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class SurveyDelta(BaseModel):
+    """Field-level changes to one survey, relative to base_version"""
+    survey_id: str
+    base_version: int
+    # module name -> {key: new value, or None to remove the key}
+    patches: Dict[str, Dict[str, Any]] = {}
+    village_name: Optional[str] = None
+    completion_percentage: Optional[int] = Field(default=None, ge=0, le=100)
+    is_complete: Optional[bool] = None
+    client_timestamp: Optional[datetime] = None
+
+
+class DeltaSyncRequest(BaseModel):
+    deltas: list[SurveyDelta]
+
+
+class DeltaSyncResult(BaseModel):
+    survey_id: str
+    status: str  # success, conflict, failed
+    version: Optional[int] = None
+    conflicts: list[Dict[str, Any]] = []
+    error_message: Optional[str] = None
+
+
+class DeltaSyncResponse(BaseModel):
+    status: str
+    synced_count: int
+    failed_count: int
+    results: list[DeltaSyncResult]
+    message: str
+
+
 # ============= Schema Management =============
 
 class FormSchemaBase(BaseModel):
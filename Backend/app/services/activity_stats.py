@@ -0,0 +1,189 @@
+from sqlalchemy import DDL, event, text
+from sqlalchemy.orm import Session
+from typing import Dict, List
+
+from ..database import Base
+from . import counter_deltas  # Applies the staged counter deltas at commit
+
+# Survey count and latest created_at per creator and per panchayat, kept in
+# step with surveys by triggers in the same transaction as every write.
+# Inserts and deletes stage one delta per user and panchayat touched by the
+# statement; they are summed and applied at commit (see counter_deltas).
+# Reassigning a survey (a change of user_id, panchayat_id or created_at) is
+# rare and handled per row; ordinary updates are filtered out by the
+# trigger's WHEN clause without calling anything. A maximum cannot be
+# decremented, so removals only rescan a user's or panchayat's surveys when
+# they took away their latest one.
+ACTIVITY_STATS_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION user_activity_apply(p_user_id text, p_count bigint,
+                                               p_added_latest timestamp, p_removed_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO user_activity_stats (user_id, surveys_created, last_survey_date)
+    VALUES (p_user_id, p_count, CASE
+        WHEN p_removed_latest IS NULL OR p_removed_latest < p_added_latest THEN p_added_latest
+        WHEN p_added_latest IS NOT NULL THEN (SELECT max(created_at) FROM surveys WHERE surveys.user_id = p_user_id)
+    END)
+    ON CONFLICT (user_id) DO UPDATE SET
+        surveys_created = user_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = CASE
+            WHEN p_removed_latest IS NULL OR p_removed_latest < user_activity_stats.last_survey_date
+                THEN GREATEST(user_activity_stats.last_survey_date, EXCLUDED.last_survey_date)
+            ELSE (SELECT max(created_at) FROM surveys WHERE surveys.user_id = p_user_id)
+        END
+$$;
+
+CREATE OR REPLACE FUNCTION panchayat_activity_apply(p_panchayat_id text, p_count bigint,
+                                                    p_added_latest timestamp, p_removed_latest timestamp)
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO panchayat_activity_stats (panchayat_id, surveys_created, last_survey_date)
+    VALUES (p_panchayat_id, p_count, CASE
+        WHEN p_removed_latest IS NULL OR p_removed_latest < p_added_latest THEN p_added_latest
+        WHEN p_added_latest IS NOT NULL THEN (SELECT max(created_at) FROM surveys WHERE surveys.panchayat_id = p_panchayat_id)
+    END)
+    ON CONFLICT (panchayat_id) DO UPDATE SET
+        surveys_created = panchayat_activity_stats.surveys_created + EXCLUDED.surveys_created,
+        last_survey_date = CASE
+            WHEN p_removed_latest IS NULL OR p_removed_latest < panchayat_activity_stats.last_survey_date
+                THEN GREATEST(panchayat_activity_stats.last_survey_date, EXCLUDED.last_survey_date)
+            ELSE (SELECT max(created_at) FROM surveys WHERE surveys.panchayat_id = p_panchayat_id)
+        END
+$$;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta, latest)
+    SELECT 'user_activity', user_id, count(*), max(created_at) FROM new_rows GROUP BY 2
+    UNION ALL
+    SELECT 'panchayat_activity', panchayat_id, count(*), max(created_at) FROM new_rows GROUP BY 2;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta, latest)
+    SELECT 'user_activity', user_id, -count(*), max(created_at) FROM old_rows GROUP BY 2
+    UNION ALL
+    SELECT 'panchayat_activity', panchayat_id, -count(*), max(created_at) FROM old_rows GROUP BY 2;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION activity_stats_on_reassign() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta, latest) VALUES
+        ('user_activity', OLD.user_id, -1, OLD.created_at),
+        ('user_activity', NEW.user_id, 1, NEW.created_at),
+        ('panchayat_activity', OLD.panchayat_id, -1, OLD.created_at),
+        ('panchayat_activity', NEW.panchayat_id, 1, NEW.created_at);
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS user_activity_add(text, bigint, timestamp);
+DROP FUNCTION IF EXISTS user_activity_remove(text, bigint, timestamp);
+DROP FUNCTION IF EXISTS panchayat_activity_add(text, bigint, timestamp);
+DROP FUNCTION IF EXISTS panchayat_activity_remove(text, bigint, timestamp);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_activity_insert') THEN
+        CREATE TRIGGER surveys_activity_insert AFTER INSERT ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION activity_stats_on_insert();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_activity_reassign') THEN
+        CREATE TRIGGER surveys_activity_reassign AFTER UPDATE OF user_id, panchayat_id, created_at ON surveys
+        FOR EACH ROW WHEN (
+            OLD.user_id IS DISTINCT FROM NEW.user_id
+            OR OLD.panchayat_id IS DISTINCT FROM NEW.panchayat_id
+            OR OLD.created_at IS DISTINCT FROM NEW.created_at
+        )
+        EXECUTE FUNCTION activity_stats_on_reassign();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_activity_delete') THEN
+        CREATE TRIGGER surveys_activity_delete AFTER DELETE ON surveys
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION activity_stats_on_delete();
+        -- First install on an existing database: backfill the counters
+        DELETE FROM user_activity_stats;
+        INSERT INTO user_activity_stats (user_id, surveys_created, last_survey_date)
+        SELECT user_id, count(*), max(created_at) FROM surveys GROUP BY 1;
+        DELETE FROM panchayat_activity_stats;
+        INSERT INTO panchayat_activity_stats (panchayat_id, surveys_created, last_survey_date)
+        SELECT panchayat_id, count(*), max(created_at) FROM surveys GROUP BY 1;
+    END IF;
+END $$;
+"""
+
+# Installed by Base.metadata.create_all (app startup); idempotent
+event.listen(Base.metadata, "after_create", DDL(ACTIVITY_STATS_TRIGGERS_SQL))
+
+# (stats table, key column) per scope
+ACTIVITY_SCOPES = {
+    "user": ("user_activity_stats", "user_id"),
+    "panchayat": ("panchayat_activity_stats", "panchayat_id"),
+}
+
+
+def rebuild_activity_stats(db: Session) -> None:
+    """Recompute every activity counter from scratch with one GROUP BY per scope (caller commits)"""
+    _lock_stats(db)
+    for table, key in ACTIVITY_SCOPES.values():
+        db.execute(text(f"DELETE FROM {table}"))
+        db.execute(text(f"""
+            INSERT INTO {table} ({key}, surveys_created, last_survey_date)
+            SELECT {key}, count(*), max(created_at) FROM surveys GROUP BY 1
+        """))
+
+
+def find_activity_drift(db: Session, fix: bool = False) -> List[Dict]:
+    """
+    Counters that disagree with the surveys table, optionally corrected
+
+    Each scope is compared with a fresh GROUP BY in a single statement, so
+    concurrent writes never show up as drift. Returns one entry per wrong
+    counter: {"scope", "key", "stored_count", "actual_count",
+    "stored_last_survey_date", "actual_last_survey_date"}. With fix, the
+    counters are locked for the check and the wrong ones rewritten (caller
+    commits).
+    """
+    if fix:
+        _lock_stats(db)
+
+    drift = []
+    for scope, (table, key) in ACTIVITY_SCOPES.items():
+        rows = db.execute(text(f"""
+            SELECT coalesce(stats.{key}, actual.{key}) AS key,
+                   stats.surveys_created AS stored_count,
+                   coalesce(actual.surveys_created, 0) AS actual_count,
+                   stats.last_survey_date AS stored_last_survey_date,
+                   actual.last_survey_date AS actual_last_survey_date
+            FROM {table} stats
+            FULL JOIN (
+                SELECT {key}, count(*) AS surveys_created, max(created_at) AS last_survey_date
+                FROM surveys GROUP BY 1
+            ) actual ON actual.{key} = stats.{key}
+            WHERE coalesce(stats.surveys_created, 0) <> coalesce(actual.surveys_created, 0)
+               OR stats.last_survey_date IS DISTINCT FROM actual.last_survey_date
+            ORDER BY 1
+        """)).mappings().all()
+        drift.extend({"scope": scope, **row} for row in rows)
+
+        if fix and rows:
+            db.execute(text(f"""
+                INSERT INTO {table} ({key}, surveys_created, last_survey_date)
+                VALUES (:key, :actual_count, :actual_last_survey_date)
+                ON CONFLICT ({key}) DO UPDATE SET
+                    surveys_created = EXCLUDED.surveys_created,
+                    last_survey_date = EXCLUDED.last_survey_date
+            """), [dict(row) for row in rows])
+
+    return drift
+
+
+# ============= Helper Functions =============
+
+def _lock_stats(db: Session) -> None:
+    # Survey writes wait when they apply their counter deltas, until the caller commits
+    db.execute(text("LOCK TABLE user_activity_stats, panchayat_activity_stats IN EXCLUSIVE MODE"))
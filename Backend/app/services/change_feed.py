@@ -0,0 +1,178 @@
+from sqlalchemy import DDL, event, select, func, tuple_, cast, BigInteger, Text
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+import base64
+
+from ..database import Base
+from . import counter_deltas  # Applies the staged counter deltas at commit
+from ..models.models import Survey, SurveyTombstone, SurveyListRevision
+
+# Every insert and update stamps the survey with the writing transaction id
+# and a sequence number; every delete leaves a tombstone with the same
+# stamps. Readers only see changes from transactions older than the oldest
+# one still running, so a change can never appear behind a cursor that has
+# already moved past it.
+CHANGE_FEED_TRIGGERS_SQL = """
+CREATE SEQUENCE IF NOT EXISTS survey_change_seq;
+
+CREATE OR REPLACE FUNCTION surveys_stamp_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    NEW.change_seq := nextval('survey_change_seq');
+    IF TG_OP = 'INSERT' THEN
+        DELETE FROM survey_tombstones WHERE survey_id = NEW.survey_id;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION surveys_record_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO survey_tombstones (survey_id, panchayat_id, change_xid, change_seq, deleted_at)
+    VALUES (OLD.survey_id, OLD.panchayat_id, pg_current_xact_id()::text::bigint,
+            nextval('survey_change_seq'), now() AT TIME ZONE 'utc')
+    ON CONFLICT (survey_id) DO UPDATE SET
+        panchayat_id = EXCLUDED.panchayat_id,
+        change_xid = EXCLUDED.change_xid,
+        change_seq = EXCLUDED.change_seq,
+        deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_change_stamp') THEN
+        CREATE TRIGGER surveys_change_stamp BEFORE INSERT OR UPDATE ON surveys
+        FOR EACH ROW EXECUTE FUNCTION surveys_stamp_change();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_change_tombstone') THEN
+        CREATE TRIGGER surveys_change_tombstone AFTER DELETE ON surveys
+        FOR EACH ROW EXECUTE FUNCTION surveys_record_tombstone();
+    END IF;
+END $$;
+"""
+
+# Installed by Base.metadata.create_all (app startup); idempotent
+event.listen(Base.metadata, "after_create", DDL(CHANGE_FEED_TRIGGERS_SQL))
+
+# Every transaction writing surveys bumps the revision of each panchayat it
+# touched, once, when it commits (see counter_deltas). The row lock is held
+# until commit, so a reader only ever sees a new revision together with the
+# data that caused it, whatever order concurrent writers commit in.
+SURVEY_REVISION_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION surveys_bump_list_revision() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta)
+        SELECT DISTINCT 'list_revision', panchayat_id, 1 FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta)
+        SELECT 'list_revision', panchayat_id, 1 FROM (
+            SELECT panchayat_id FROM old_rows UNION SELECT panchayat_id FROM new_rows
+        ) touched;
+    ELSE
+        INSERT INTO pg_temp.survey_counter_deltas (counter, key, delta)
+        SELECT DISTINCT 'list_revision', panchayat_id, 1 FROM old_rows;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_list_revision_insert') THEN
+        CREATE TRIGGER surveys_list_revision_insert AFTER INSERT ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_bump_list_revision();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_list_revision_update') THEN
+        CREATE TRIGGER surveys_list_revision_update AFTER UPDATE ON surveys
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_bump_list_revision();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_list_revision_delete') THEN
+        CREATE TRIGGER surveys_list_revision_delete AFTER DELETE ON surveys
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_bump_list_revision();
+    END IF;
+END $$;
+"""
+
+event.listen(Base.metadata, "after_create", DDL(SURVEY_REVISION_TRIGGERS_SQL))
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(position: Tuple[int, int]) -> str:
+    """Opaque cursor for a (change_xid, change_seq) position"""
+    return base64.urlsafe_b64encode(f"{position[0]}:{position[1]}".encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    """Inverse of encode_cursor; no cursor starts from the beginning. Raises ValueError."""
+    if not cursor:
+        return (0, 0)
+    xid, seq = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+    return (int(xid), int(seq))
+
+
+def read_changes(db: Session, panchayat_id: Optional[str], cursor: Optional[str], limit: int) -> dict:
+    """
+    One page of survey changes after cursor, oldest first
+
+    Returns {"changes": [(position, survey_or_None, survey_id)], "next_cursor", "has_more"}
+    where a None survey is a deletion. Two keyset queries (live rows and
+    tombstones), each bounded by limit + 1.
+    """
+    position = decode_cursor(cursor)
+    horizon = cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+
+    surveys_query = (
+        select(Survey)
+        .where(
+            tuple_(Survey.change_xid, Survey.change_seq) > position,
+            Survey.change_xid < horizon
+        )
+        .order_by(Survey.change_xid, Survey.change_seq)
+        .limit(limit + 1)
+    )
+    tombstones_query = (
+        select(SurveyTombstone)
+        .where(
+            tuple_(SurveyTombstone.change_xid, SurveyTombstone.change_seq) > position,
+            SurveyTombstone.change_xid < horizon
+        )
+        .order_by(SurveyTombstone.change_xid, SurveyTombstone.change_seq)
+        .limit(limit + 1)
+    )
+    if panchayat_id:
+        surveys_query = surveys_query.where(Survey.panchayat_id == panchayat_id)
+        tombstones_query = tombstones_query.where(SurveyTombstone.panchayat_id == panchayat_id)
+
+    changes = [
+        ((s.change_xid, s.change_seq), s, s.survey_id)
+        for s in db.execute(surveys_query).scalars()
+    ] + [
+        ((t.change_xid, t.change_seq), None, t.survey_id)
+        for t in db.execute(tombstones_query).scalars()
+    ]
+    changes.sort(key=lambda change: change[0])
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    next_position = changes[-1][0] if changes else position
+
+    return {
+        "changes": changes,
+        "next_cursor": encode_cursor(next_position),
+        "has_more": has_more,
+    }
+
+
+def read_list_revision(db: Session, panchayat_id: Optional[str]) -> int:
+    """Current survey list revision for one panchayat (or all when None), one primary key lookup"""
+    if panchayat_id:
+        query = select(SurveyListRevision.revision).where(SurveyListRevision.panchayat_id == panchayat_id)
+    else:
+        query = select(func.sum(SurveyListRevision.revision))
+    return int(db.execute(query).scalar() or 0)
@@ -0,0 +1,65 @@
+from sqlalchemy import DDL, event
+
+from ..database import Base
+
+# Triggers on surveys do not update the counter tables (list revisions,
+# sync status counts, activity stats) themselves: they stage their deltas in
+# a per-session temporary table, and one deferred trigger applies them when
+# the transaction commits. The deltas are summed per key and applied table
+# by table in a fixed order, each table in key order. A transaction thus
+# locks each counter row once, only for the moment before it commits, and
+# concurrent transactions take those locks in the same order, so they
+# cannot deadlock on counters however their writes were ordered.
+SURVEY_COUNTER_DELTAS_SQL = """
+CREATE OR REPLACE FUNCTION stage_survey_counter_deltas() RETURNS void AS $$
+BEGIN
+    IF to_regclass('pg_temp.survey_counter_deltas') IS NULL THEN
+        CREATE TEMP TABLE survey_counter_deltas (
+            counter text NOT NULL,  -- list_revision, sync_status, user_activity, panchayat_activity
+            key text,
+            sync_status text,
+            delta bigint NOT NULL,
+            latest timestamp
+        ) ON COMMIT DELETE ROWS;
+        CREATE CONSTRAINT TRIGGER survey_counter_deltas_apply AFTER INSERT ON survey_counter_deltas
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION apply_survey_counter_deltas();
+    END IF;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apply_survey_counter_deltas() RETURNS trigger AS $$
+BEGIN
+    -- Fires once per staged row; the first call applies them all
+    IF NOT EXISTS (SELECT 1 FROM pg_temp.survey_counter_deltas) THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO survey_list_revisions (panchayat_id, revision)
+    SELECT DISTINCT key, 1 FROM pg_temp.survey_counter_deltas
+    WHERE counter = 'list_revision' ORDER BY 1
+    ON CONFLICT (panchayat_id) DO UPDATE SET revision = survey_list_revisions.revision + 1;
+
+    INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+    SELECT key, sync_status, sum(delta) FROM pg_temp.survey_counter_deltas
+    WHERE counter = 'sync_status'
+    GROUP BY 1, 2 HAVING sum(delta) <> 0 ORDER BY 1, 2
+    ON CONFLICT (panchayat_id, sync_status)
+    DO UPDATE SET survey_count = sync_status_counts.survey_count + EXCLUDED.survey_count;
+
+    PERFORM user_activity_apply(key, sum(delta)::bigint,
+                                max(latest) FILTER (WHERE delta > 0), max(latest) FILTER (WHERE delta < 0))
+    FROM pg_temp.survey_counter_deltas WHERE counter = 'user_activity'
+    GROUP BY key ORDER BY key;
+
+    PERFORM panchayat_activity_apply(key, sum(delta)::bigint,
+                                     max(latest) FILTER (WHERE delta > 0), max(latest) FILTER (WHERE delta < 0))
+    FROM pg_temp.survey_counter_deltas WHERE counter = 'panchayat_activity'
+    GROUP BY key ORDER BY key;
+
+    DELETE FROM pg_temp.survey_counter_deltas;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+"""
+
+# Installed by Base.metadata.create_all (app startup); idempotent
+event.listen(Base.metadata, "after_create", DDL(SURVEY_COUNTER_DELTAS_SQL))
@@ -0,0 +1,207 @@
+from sqlalchemy import update, select, func, literal
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY, insert
+from sqlalchemy.types import Text
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+
+from ..models.models import Survey, SyncLog, User, MODULE_FIELDS
+from ..schemas.schemas import SurveyDelta
+from .idempotency import apply_once, batch_item_key
+from .merge import load_base_versions, record_versions
+from .sync_engine import write_isolated
+
+
+def apply_delta_batch(db: Session, deltas: List[SurveyDelta], user: User) -> List[Dict[str, Any]]:
+    """
+    Apply field-level patches to existing surveys
+
+    Each module patch is a shallow JSON merge patch: keys with a value are
+    set, keys with null are removed, untouched keys stay as they are. The
+    patch is applied inside Postgres (`col || set - removed`), guarded by the
+    client's base_version, so only the changed keys travel over the wire.
+    If the base is stale but none of the patched keys changed on the server
+    since then, the patch is rebased onto the current version.
+
+    The deltas run in one savepoint; if the database rejects one (e.g. a
+    value jsonb cannot store), they are rerun one savepoint each so only
+    it fails. Snapshots of the written versions are recorded once for the
+    whole batch.
+
+    Returns one result per delta:
+        {"survey_id", "status", "version", "conflicts", "error_message"}
+    The caller owns the transaction and must commit.
+    """
+    now = datetime.utcnow()
+
+    def apply(items: List[SurveyDelta]) -> list:
+        written: Dict[tuple, Dict[str, Any]] = {}  # (survey_id, version) -> written row
+        return [(_apply_delta(db, delta, now, written), written) for delta in items]
+
+    outputs, errors = write_isolated(db, deltas, apply)
+    outputs = iter(outputs)
+    results, snapshots = [], {}
+    for index, delta in enumerate(deltas):
+        if index in errors:
+            results.append(_result(delta.survey_id, "failed", error_message=errors[index]))
+            continue
+        result, written = next(outputs)
+        results.append(result)
+        snapshots.update(written)
+    record_versions(db, snapshots.values())
+
+    logs = [
+        {
+            "survey_id": r["survey_id"],
+            "user_id": user.user_id,
+            "operation": "delta",
+            "status": r["status"],
+            "conflicts": r["conflicts"] or None,
+            "error_message": r["error_message"],
+            "timestamp": now,
+        }
+        for r in results
+        if r["version"] is not None
+    ]
+    if logs:
+        db.execute(insert(SyncLog), logs)
+
+    return results
+
+
+def apply_delta_batch_once(db: Session, deltas: List[SurveyDelta], user: User,
+                           key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    apply_delta_batch, answering deltas already applied from the idempotency store
+
+    Deltas are identified by their position in a batch sent with the
+    Idempotency-Key `key`. Successful results are stored in the caller's
+    transaction.
+    """
+    keys = [batch_item_key(key, position) if key else None for position in range(len(deltas))]
+    return apply_once(
+        db, user.user_id, deltas, keys,
+        apply=lambda db, items: apply_delta_batch(db, items, user),
+        rejected=lambda delta: _result(delta.survey_id, "failed",
+                                       error_message="Idempotency key was already used for a different delta")
+    )
+
+
+def _apply_delta(db: Session, delta: SurveyDelta, now: datetime,
+                 written: Dict[tuple, Dict[str, Any]]) -> Dict[str, Any]:
+    unknown = [module for module in delta.patches if module not in MODULE_FIELDS]
+    if unknown:
+        return _result(delta.survey_id, "failed", error_message=f"Unknown modules: {', '.join(unknown)}")
+
+    values = {
+        module: _patched_column(module, patch)
+        for module, patch in delta.patches.items()
+        if patch
+    }
+    if delta.village_name is not None:
+        values["village_name"] = delta.village_name
+    if delta.completion_percentage is not None:
+        values["completion_percentage"] = delta.completion_percentage
+    if delta.is_complete is not None:
+        values["is_complete"] = delta.is_complete
+    if delta.client_timestamp is not None:
+        values["client_timestamp"] = delta.client_timestamp
+
+    values.update(
+        sync_status="synced",
+        last_synced_at=now,
+        server_timestamp=now,
+        updated_at=now,
+        version=func.coalesce(Survey.version, 0) + 1,
+    )
+
+    row = _guarded_update(db, delta.survey_id, delta.base_version, values, written)
+    if row is not None:
+        return _result(delta.survey_id, "success", version=row["version"])
+
+    # Base version is stale (or the survey is unknown). A patched key only
+    # conflicts if the server changed it since the client's base version
+    # and to a different value than the client sent.
+    patched_modules = [Survey.__table__.c[module] for module in delta.patches]
+    current = db.execute(
+        select(Survey.version, *patched_modules).where(Survey.survey_id == delta.survey_id)
+    ).mappings().first()
+
+    if current is None:
+        return _result(delta.survey_id, "failed",
+                       error_message="Survey not found, send the full survey through /api/sync/batch")
+
+    # A base written earlier in this batch is not recorded yet
+    base_key = (delta.survey_id, delta.base_version)
+    base = written.get(base_key) or load_base_versions(db, [base_key]).get(base_key)
+
+    conflicts = []
+    for module, patch in delta.patches.items():
+        server_module = current[module] or {}
+        known = base is not None and module in base
+        base_module = (base[module] if known else None) or {}
+        for key, client_value in patch.items():
+            server_value = server_module.get(key)
+            if server_value == client_value:
+                continue
+            if known and server_value == base_module.get(key):
+                continue
+            conflicts.append({
+                "field_name": f"{module}.{key}",
+                "base_value": base_module.get(key) if known else None,
+                "server_value": server_value,
+                "client_value": client_value
+            })
+
+    if conflicts:
+        return _result(delta.survey_id, "conflict", version=current["version"], conflicts=conflicts)
+
+    # No overlapping edits: rebase the patch onto the current version
+    row = _guarded_update(db, delta.survey_id, current["version"] or 0, values, written)
+    if row is None:
+        return _result(delta.survey_id, "conflict", version=current["version"],
+                       error_message="Survey was modified concurrently")
+    return _result(delta.survey_id, "success", version=row["version"])
+
+
+def _guarded_update(db: Session, survey_id: str, expected_version: int, values: Dict[str, Any],
+                    written: Dict[tuple, Dict[str, Any]]):
+    """Apply values if the survey is still at expected_version; keep the new row for its snapshot"""
+    row = db.execute(
+        update(Survey)
+        .where(
+            Survey.survey_id == survey_id,
+            func.coalesce(Survey.version, 0) == expected_version
+        )
+        .values(**values)
+        .returning(Survey.survey_id, Survey.version, *[Survey.__table__.c[f] for f in MODULE_FIELDS])
+    ).mappings().first()
+
+    if row is not None:
+        written[(row["survey_id"], row["version"])] = dict(row)
+    return row
+
+
+def _patched_column(module: str, patch: Dict[str, Any]):
+    """SQL expression applying a shallow merge patch to one JSONB module column"""
+    column = Survey.__table__.c[module]
+    set_values = {key: value for key, value in patch.items() if value is not None}
+    removed_keys = [key for key, value in patch.items() if value is None]
+
+    expr = func.coalesce(column, literal({}, JSONB))
+    if set_values:
+        expr = expr.op("||")(literal(set_values, JSONB))
+    if removed_keys:
+        expr = expr.op("-")(literal(removed_keys, ARRAY(Text)))
+    return expr
+
+
+def _result(survey_id: str, status: str, version: int = None,
+            conflicts: list = None, error_message: str = None) -> Dict[str, Any]:
+    return {
+        "survey_id": survey_id,
+        "status": status,
+        "version": version,
+        "conflicts": conflicts or [],
+        "error_message": error_message,
+    }
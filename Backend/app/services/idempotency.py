@@ -0,0 +1,189 @@
+from sqlalchemy import select, delete, update, and_, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+import hashlib
+import json
+
+from ..config import settings
+from ..models.models import IdempotencyKey
+
+# Idempotency keys live in Postgres, so a retry is recognized by whichever
+# worker it reaches. A key is bound to a fingerprint of the request it was
+# first used with and cannot be reused for a different one. Only successful
+# outcomes are kept: a retried request or survey that conflicted or failed
+# is evaluated again. Keys expire after IDEMPOTENCY_TTL_SECONDS.
+
+
+class IdempotencyInProgress(Exception):
+    """Raised when a request with the same key is still being processed"""
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when a key is presented again with a different request"""
+
+
+def request_fingerprint(payload: Any) -> str:
+    """SHA-256 of the canonical JSON form of a request"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def claim_key(db: Session, key: str, user_id: str, request_hash: str) -> Optional[Any]:
+    """
+    Claim key for a request, or return the response stored for it
+
+    Returns None when the caller now holds the key: it must commit the claim
+    (so other workers see it), process the request, then complete_key or
+    release_key. Raises IdempotencyInProgress while another request holds
+    the key and IdempotencyKeyReused if it was used for a different request.
+    Released keys, and claims abandoned for IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS,
+    are taken over by the same request.
+    """
+    now = datetime.utcnow()
+    db.execute(
+        delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+        )
+    )
+
+    stmt = insert(IdempotencyKey).values(
+        key=key, user_id=user_id, request_hash=request_hash, status="in_progress", created_at=now
+    )
+    claimed = db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={"status": "in_progress", "created_at": stmt.excluded.created_at},
+            where=and_(
+                IdempotencyKey.request_hash == stmt.excluded.request_hash,
+                or_(
+                    IdempotencyKey.status == "released",
+                    and_(
+                        IdempotencyKey.status == "in_progress",
+                        IdempotencyKey.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS)
+                    )
+                )
+            )
+        ).returning(IdempotencyKey.key)
+    ).scalar()
+    if claimed is not None:
+        return None
+
+    stored = db.execute(
+        select(IdempotencyKey.request_hash, IdempotencyKey.status, IdempotencyKey.response)
+        .where(IdempotencyKey.key == key)
+    ).first()
+    if stored is not None and stored.request_hash != request_hash:
+        raise IdempotencyKeyReused(key)
+    if stored is None or stored.status != "completed":
+        raise IdempotencyInProgress(key)
+    return stored.response
+
+
+def complete_key(db: Session, key: str, response: Any) -> None:
+    """Store the response of a claimed key; commit it with the request's writes"""
+    db.execute(
+        update(IdempotencyKey).where(IdempotencyKey.key == key).values(status="completed", response=response)
+    )
+
+
+def release_key(db: Session, key: str) -> None:
+    """Let a retry of the same request process it again; the key stays bound to the request"""
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key, IdempotencyKey.status == "in_progress")
+        .values(status="released")
+    )
+
+
+def apply_once(
+    db: Session,
+    user_id: str,
+    items: list,
+    keys: List[Optional[str]],
+    apply: Callable[[Session, list], List[Dict[str, Any]]],
+    rejected: Callable[[Any], Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Run apply(db, items) for the items not applied yet under their key
+
+    keys holds one idempotency key (or None) per item. An item whose key
+    holds a stored result for the same item is answered from it without
+    being applied; a key stored for a different item is answered with
+    rejected(item). Results with status success are stored under their key
+    in the caller's transaction, so they commit together with the writes.
+    Results are returned in item order.
+    """
+    hashes = [request_fingerprint(item.model_dump(mode="json")) if key else None for item, key in zip(items, keys)]
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+    stored = {}
+    if any(keys):
+        stored = {
+            row.key: row
+            for row in db.execute(
+                select(IdempotencyKey.key, IdempotencyKey.request_hash, IdempotencyKey.response)
+                .where(
+                    IdempotencyKey.key.in_({key for key in keys if key}),
+                    IdempotencyKey.status == "completed",
+                    IdempotencyKey.created_at >= cutoff
+                )
+            )
+        }
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    to_apply, positions = [], []
+    for position, (item, key, request_hash) in enumerate(zip(items, keys, hashes)):
+        row = stored.get(key)
+        if row is None:
+            to_apply.append(item)
+            positions.append(position)
+        elif row.request_hash == request_hash:
+            results[position] = row.response
+        else:
+            results[position] = rejected(item)
+
+    completed = []
+    if to_apply:
+        now = datetime.utcnow()
+        for position, result in zip(positions, apply(db, to_apply)):
+            results[position] = result
+            if keys[position] and result["status"] == "success":
+                completed.append({
+                    "key": keys[position],
+                    "user_id": user_id,
+                    "request_hash": hashes[position],
+                    "status": "completed",
+                    "response": result,
+                    "created_at": now,
+                })
+
+    if completed:
+        # A key repeated within the batch keeps its first result
+        unique = list({entry["key"]: entry for entry in reversed(completed)}.values())
+        stmt = insert(IdempotencyKey).values(unique)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "status": stmt.excluded.status,
+                "response": stmt.excluded.response,
+                "created_at": stmt.excluded.created_at
+            }
+        ))
+
+    return results
+
+
+def batch_key(user_id: str, idempotency_key: str) -> str:
+    return f"{user_id}:batch:{idempotency_key}"
+
+
+def survey_key(user_id: str, idempotency_key: str) -> str:
+    return f"{user_id}:survey:{idempotency_key}"
+
+
+def batch_item_key(key: str, position: int) -> str:
+    """Key of the item at position within a batch sent with an Idempotency-Key"""
+    return f"{key}#{position}"
@@ -0,0 +1,230 @@
+from sqlalchemy import delete, select, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from ..config import settings
+from ..models.models import Survey, SurveyVersion, MODULE_FIELDS
+
+# Marks a key that is absent on one side of the merge
+_MISSING = object()
+
+
+def three_way_merge(base: Optional[dict], server: Optional[dict], client: Optional[dict]) -> Tuple[dict, List[dict]]:
+    """
+    Key-level three-way merge of one module
+
+    For every key, a side that still holds the base value loses to the side
+    that changed it. Keys changed identically on both sides merge cleanly.
+    Only keys changed differently on both sides are conflicts; for those the
+    merged result keeps the server value.
+
+    Returns (merged, conflicts) where each conflict is
+        {"key", "base_value", "server_value", "client_value"}
+    """
+    base = base or {}
+    server = server or {}
+    client = client or {}
+
+    merged = {}
+    conflicts = []
+    for key in list(server) + [k for k in client if k not in server]:
+        base_value = base.get(key, _MISSING)
+        server_value = server.get(key, _MISSING)
+        client_value = client.get(key, _MISSING)
+
+        if client_value == server_value or client_value == base_value:
+            value = server_value
+        elif server_value == base_value:
+            value = client_value
+        else:
+            conflicts.append({
+                "key": key,
+                "base_value": _visible(base_value),
+                "server_value": _visible(server_value),
+                "client_value": _visible(client_value),
+            })
+            value = server_value
+
+        if value is not _MISSING:
+            merged[key] = value
+
+    return merged, conflicts
+
+
+def merge_survey_modules(base: Dict[str, Any], current: Dict[str, Any], incoming) -> Tuple[Dict[str, Any], List[dict]]:
+    """
+    Three-way merge of every module the client sent
+
+    `base` is the stored snapshot at the client's base_version, `current` the
+    server row (mapping or ORM object), `incoming` the client payload.
+    Modules the client did not send are left out of the result. A module
+    missing from `base` has no known base value and conflicts as a whole
+    when the server copy differs.
+
+    Returns (merged_modules, conflicts) with conflicts in the API shape
+        {"field_name": "module.key", "base_value", "server_value", "client_value"}
+    """
+    merged_modules = {}
+    conflicts = []
+    for field in MODULE_FIELDS:
+        client_value = getattr(incoming, field, None)
+        if client_value is None:
+            continue
+
+        server_value = _field(current, field)
+        if field not in base:
+            merged_modules[field] = client_value
+            if server_value is not None and server_value != client_value:
+                conflicts.append({"field_name": field, "server_value": server_value, "client_value": client_value})
+            continue
+
+        merged, module_conflicts = three_way_merge(base[field], server_value, client_value)
+        merged_modules[field] = merged
+        for conflict in module_conflicts:
+            conflicts.append({"field_name": f"{field}.{conflict.pop('key')}", **conflict})
+
+    return merged_modules, conflicts
+
+
+# ============= Version Store =============
+
+def load_base_versions(db: Session, keys: Iterable[Tuple[str, int]]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    """
+    Module data of surveys at (survey_id, version) pairs that have a snapshot
+
+    Snapshots written by full-survey writes hold every module and are used
+    as is, in one query. A module write snapshots only its module; the
+    other modules are then taken from the latest older snapshot that holds
+    them, or from the survey row when no later snapshot wrote them.
+    A module whose value at the version is not known is left out.
+
+    Pruning keeps, besides the last SURVEY_VERSION_HISTORY snapshots, the
+    newest older one holding each module (see superseded_versions), so a
+    base within the history can always be rebuilt.
+    """
+    keys = set(keys)
+    if not keys:
+        return {}
+
+    rows = db.execute(
+        select(SurveyVersion.survey_id, SurveyVersion.version, SurveyVersion.data)
+        .where(tuple_(SurveyVersion.survey_id, SurveyVersion.version).in_(keys))
+    )
+    bases = {(row.survey_id, row.version): row.data for row in rows}
+
+    partial = [key for key, data in bases.items() if not set(MODULE_FIELDS) <= set(data)]
+    if partial:
+        survey_ids = {survey_id for survey_id, _ in partial}
+        history: Dict[str, list] = {}
+        for row in db.execute(
+            select(SurveyVersion.survey_id, SurveyVersion.version, SurveyVersion.data)
+            .where(SurveyVersion.survey_id.in_(survey_ids))
+            .order_by(SurveyVersion.version.desc())
+        ):
+            history.setdefault(row.survey_id, []).append(row)
+        current = {
+            row["survey_id"]: row
+            for row in db.execute(
+                select(Survey.__table__.c.survey_id, *[Survey.__table__.c[field] for field in MODULE_FIELDS])
+                .where(Survey.survey_id.in_(survey_ids))
+            ).mappings()
+        }
+        for survey_id, version in partial:
+            bases[(survey_id, version)] = _rebuild_base(history[survey_id], version, current.get(survey_id))
+
+    return bases
+
+
+def record_versions(db: Session, rows: Iterable[Dict[str, Any]]) -> None:
+    """
+    Store module snapshots for freshly written survey versions
+
+    Rows are mappings or Survey objects with survey_id, version and the
+    module columns. Older
+    snapshots beyond SURVEY_VERSION_HISTORY per survey are pruned in the
+    same statement batch.
+    """
+    snapshots = [
+        {
+            "survey_id": _field(row, "survey_id"),
+            "version": _field(row, "version"),
+            "data": {field: _field(row, field) for field in MODULE_FIELDS},
+        }
+        for row in rows
+    ]
+    if not snapshots:
+        return
+
+    db.execute(
+        insert(SurveyVersion).values(snapshots).on_conflict_do_nothing(
+            index_elements=[SurveyVersion.survey_id, SurveyVersion.version]
+        )
+    )
+
+    newest = aliased(SurveyVersion)
+    db.execute(
+        delete(SurveyVersion).where(
+            SurveyVersion.survey_id.in_({s["survey_id"] for s in snapshots}),
+            superseded_versions(
+                select(func.max(newest.version) - settings.SURVEY_VERSION_HISTORY)
+                .where(newest.survey_id == SurveyVersion.survey_id)
+                .scalar_subquery()
+            )
+        )
+    )
+
+
+def superseded_versions(cutoff):
+    """
+    Condition matching the snapshots that pruning may delete
+
+    A snapshot at or below cutoff goes once every module it holds is also
+    held by a newer snapshot at or below cutoff. The newest old value of
+    each module is kept, since module writes snapshot only their module.
+    """
+    newer = aliased(SurveyVersion)
+    module = func.jsonb_object_keys(SurveyVersion.data).table_valued("key").render_derived()
+    held_by_newer = select(newer.version).where(
+        newer.survey_id == SurveyVersion.survey_id,
+        newer.version > SurveyVersion.version,
+        newer.version <= cutoff,
+        newer.data.has_key(module.c.key)
+    ).correlate(SurveyVersion, module).exists()
+    still_needed = select(module.c.key).where(~held_by_newer).correlate(SurveyVersion).exists()
+    return (SurveyVersion.version <= cutoff) & ~still_needed
+
+
+# ============= Helper Functions =============
+
+def _rebuild_base(history: list, version: int, current: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Module data at version from a survey's snapshots, newest first"""
+    # Older snapshots than version are only complete down to the history
+    # window; past it, pruning may have left an outdated value
+    within_history = version > history[0].version - settings.SURVEY_VERSION_HISTORY
+    base: Dict[str, Any] = {}
+    written_since = set()
+    for snapshot in history:
+        if snapshot.version > version:
+            written_since.update(snapshot.data)
+        elif snapshot.version == version or within_history:
+            for field, value in snapshot.data.items():
+                base.setdefault(field, value)
+
+    # Every write after version stored a snapshot, so a module none of
+    # them holds still has the value it had at version
+    if current is not None:
+        for field in MODULE_FIELDS:
+            if field not in base and field not in written_since:
+                base[field] = current[field]
+    return base
+
+
+def _visible(value):
+    return None if value is _MISSING else value
+
+
+def _field(current, field: str):
+    if isinstance(current, dict):
+        return current.get(field)
+    return getattr(current, field)
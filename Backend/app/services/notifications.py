@@ -0,0 +1,173 @@
+from sqlalchemy import DDL, event, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Optional, Set
+import asyncio
+import json
+import logging
+
+import asyncpg
+
+from ..database import Base, async_database_url, async_connect_args
+from .principals import principal_cache, revocations, apply_principal_notice, PRINCIPAL_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+CHANGE_CHANNEL = "sampark_changes"
+
+# One NOTIFY per panchayat per statement, carrying the highest change_seq
+# written. Notifications are delivered only when the transaction commits.
+CHANGE_NOTIFY_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION surveys_notify_change() RETURNS trigger AS $$
+DECLARE
+    changed record;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        FOR changed IN
+            SELECT panchayat_id, currval('survey_change_seq') AS version
+            FROM old_rows GROUP BY panchayat_id
+        LOOP
+            PERFORM pg_notify('sampark_changes', json_build_object(
+                'type', 'survey', 'panchayat_id', changed.panchayat_id, 'version', changed.version
+            )::text);
+        END LOOP;
+    ELSE
+        FOR changed IN
+            SELECT panchayat_id, max(change_seq) AS version
+            FROM new_rows GROUP BY panchayat_id
+        LOOP
+            PERFORM pg_notify('sampark_changes', json_build_object(
+                'type', 'survey', 'panchayat_id', changed.panchayat_id, 'version', changed.version
+            )::text);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_notify_insert') THEN
+        CREATE TRIGGER surveys_notify_insert AFTER INSERT ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_notify_change();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_notify_update') THEN
+        CREATE TRIGGER surveys_notify_update AFTER UPDATE ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_notify_change();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_notify_delete') THEN
+        CREATE TRIGGER surveys_notify_delete AFTER DELETE ON surveys
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION surveys_notify_change();
+    END IF;
+END $$;
+"""
+
+# Installed by Base.metadata.create_all (app startup); idempotent
+event.listen(Base.metadata, "after_create", DDL(CHANGE_NOTIFY_TRIGGERS_SQL))
+
+
+async def notify_schema_change(db: AsyncSession, module_name: str, version: str) -> None:
+    """Queue a schema change notice; it is delivered when the caller commits"""
+    payload = json.dumps({"type": "schema", "module_name": module_name, "version": version})
+    await db.execute(select(func.pg_notify(CHANGE_CHANNEL, payload)))
+
+
+class ChangeHub:
+    """
+    In-process fan-out of change notices to event stream subscribers
+
+    One LISTEN connection per process receives notices from Postgres and
+    hands them to the subscribers of the matching panchayat. Subscribers
+    without a panchayat (admins) receive everything, and schema notices go to
+    everyone. Each subscriber has a small bounded queue; when it is full,
+    further notices are dropped, since any notice only means "pull again".
+    
+    The same connection also receives principal invalidations and applies
+    them to this process's principal cache and revocation set.
+    """
+
+    def __init__(self, queue_size: int = 32):
+        self.queue_size = queue_size
+        self._subscribers: Dict[Optional[str], Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, panchayat_id: Optional[str]) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(panchayat_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, panchayat_id: Optional[str], queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(panchayat_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[panchayat_id]
+
+    def publish(self, notice: dict) -> None:
+        panchayat_id = notice.get("panchayat_id")
+        if panchayat_id is None:
+            targets = [q for queues in self._subscribers.values() for q in queues]
+        else:
+            targets = list(self._subscribers.get(panchayat_id, ())) + list(self._subscribers.get(None, ()))
+
+        for queue in targets:
+            try:
+                queue.put_nowait(notice)
+            except asyncio.QueueFull:
+                pass
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self) -> None:
+        """Keep one LISTEN connection open, reconnecting after failures"""
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(_listen_dsn(), **async_connect_args)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(CHANGE_CHANNEL, self._on_notify)
+                await connection.add_listener(PRINCIPAL_CHANNEL, self._on_principal_notify)
+                # Invalidations sent while disconnected were lost
+                principal_cache.clear()
+                await revocations.load()
+                logger.info("Listening for change notifications")
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Change notification listener failed: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(5)
+
+    def _on_principal_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            apply_principal_notice(payload)
+        except (ValueError, KeyError):
+            logger.error(f"Invalid principal notification payload: {payload}")
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            self.publish(json.loads(payload))
+        except ValueError:
+            logger.error(f"Invalid change notification payload: {payload}")
+
+
+# ============= Helper Functions =============
+
+def _listen_dsn() -> str:
+    """DATABASE_URL as normalized for asyncpg by the async engine, in plain DSN form"""
+    return async_database_url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+change_hub = ChangeHub()
@@ -0,0 +1,87 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
+import multiprocessing
+
+from ..config import settings
+from ..utils.security import verify_password, get_password_hash
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when more hashing requests are waiting than the queue allows"""
+
+
+class PasswordHashPool:
+    """
+    Runs password hashing off the event loop with bounded concurrency
+
+    PBKDF2 takes tens of milliseconds of CPU per call; run inline it stalls
+    every other request on the worker. Here at most `workers` hashes run at
+    once on a dedicated pool and up to `max_queue` more wait their turn, in
+    arrival order. Beyond that PasswordHashingBusy is raised so a login storm
+    is shed with 503 instead of growing an unbounded backlog. A request
+    cancelled while queued (client gone) leaves without hashing.
+
+    Threads suffice for pbkdf2_sha256, whose hashlib core releases the GIL;
+    `use_processes` moves hashing to separate processes instead (spawned,
+    since forking a process with a running event loop and threads is unsafe).
+    """
+
+    def __init__(self, workers: int, max_queue: int, use_processes: bool = False):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash a batch in parallel across the workers, in order; all or nothing is queued"""
+        if self._pending + len(passwords) > self.workers + self.max_queue:
+            raise PasswordHashingBusy()
+        return await asyncio.gather(*(self.hash(password) for password in passwords))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            raise PasswordHashingBusy()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        self._pending += 1
+        try:
+            async with self._slots:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+
+password_hasher = PasswordHashPool(
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_MAX_QUEUE,
+    settings.PASSWORD_HASH_PROCESSES
+)
+
+# Bulk imports hash on their own process pool so they never queue ahead of logins
+bulk_password_hasher = PasswordHashPool(
+    settings.BULK_IMPORT_HASH_WORKERS,
+    settings.BULK_IMPORT_MAX_ROWS,
+    use_processes=True
+)
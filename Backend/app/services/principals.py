@@ -0,0 +1,184 @@
+from collections import OrderedDict
+from sqlalchemy import event, select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Dict, Optional
+from datetime import datetime
+import json
+import threading
+import time
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models.models import User, TokenRevocation
+
+# Channel carrying {"user_id", "token_version"} for users whose row changed,
+# so every worker drops its cached copy and applies revocations (see
+# ChangeHub._listen)
+PRINCIPAL_CHANNEL = "sampark_principals"
+
+
+class PrincipalCache:
+    """
+    Bounded TTL/LRU cache of authenticated users keyed by user_id
+
+    Entries are detached snapshots of the users row without the password
+    hash; they are never attached to a session, so handlers that modify the
+    user must load it again. Each worker process has its own cache. Changes
+    are propagated by invalidate_principal(); `ttl_seconds` bounds how long
+    a missed invalidation can go unnoticed.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # user_id -> (stored_at, user)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[User]:
+        """Return the cached user, or None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic() - self.ttl_seconds:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def generation(self) -> int:
+        """Token to pass to put(); taken before loading the user"""
+        return self._generation
+
+    def put(self, user: User, generation: int) -> User:
+        """
+        Cache a snapshot of user and return it
+
+        Not cached if any invalidation happened since `generation` was
+        taken, since the row may have been read before that change committed.
+        """
+        snapshot = _snapshot(user)
+        if self.ttl_seconds <= 0:
+            return snapshot
+        with self._lock:
+            if generation == self._generation:
+                self._entries.pop(user.user_id, None)
+                self._entries[user.user_id] = (time.monotonic(), snapshot)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Drop everything, e.g. after invalidations may have been missed"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class RevocationSet:
+    """
+    Current token version of every user whose tokens were ever revoked
+
+    Access tokens carry the version they were issued at (`ver` claim) and
+    are rejected once it is lower than the version held here. Users never
+    revoked are absent and their tokens are at version 0, so the set stays
+    small. It is loaded from token_revocations at startup and whenever the
+    notification listener reconnects, and kept current by notifications.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+
+    def version(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    def is_revoked(self, user_id: str, token_version: int) -> bool:
+        return token_version < self._versions.get(user_id, 0)
+
+    def update(self, user_id: str, token_version: int) -> None:
+        if token_version > self._versions.get(user_id, 0):
+            self._versions[user_id] = token_version
+
+    async def load(self) -> None:
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(select(TokenRevocation.user_id, TokenRevocation.token_version))
+            for user_id, token_version in rows:
+                self.update(user_id, token_version)
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_MAX_ENTRIES)
+revocations = RevocationSet()
+
+
+async def current_token_version(db: AsyncSession, user_id: str) -> int:
+    """Version to sign into a new access token for user_id"""
+    token_version = await db.scalar(
+        select(TokenRevocation.token_version).where(TokenRevocation.user_id == user_id)
+    )
+    return token_version or 0
+
+
+async def invalidate_principal(db: AsyncSession, user_id: str, revoke_tokens: bool = False) -> None:
+    """
+    Drop the cached copy of a user everywhere once the caller commits
+
+    With revoke_tokens, the user's token version is bumped as well, so every
+    access token issued so far is rejected. The local worker applies both on
+    commit; other workers hear about it through a notification sent by the
+    same transaction.
+    """
+    token_version = None
+    if revoke_tokens:
+        now = datetime.utcnow()
+        token_version = await db.scalar(
+            insert(TokenRevocation)
+            .values(user_id=user_id, token_version=1, revoked_at=now)
+            .on_conflict_do_update(
+                index_elements=[TokenRevocation.user_id],
+                set_={"token_version": TokenRevocation.token_version + 1, "revoked_at": now}
+            )
+            .returning(TokenRevocation.token_version)
+        )
+
+    payload = json.dumps({"user_id": user_id, "token_version": token_version})
+    await db.execute(select(func.pg_notify(PRINCIPAL_CHANNEL, payload)))
+    db.sync_session.info.setdefault("invalidated_principals", {})[user_id] = token_version
+
+
+def apply_principal_notice(payload: str) -> None:
+    """Apply a notification from PRINCIPAL_CHANNEL to this worker"""
+    notice = json.loads(payload)
+    _apply_invalidation(notice["user_id"], notice.get("token_version"))
+
+
+# ============= Helper Functions =============
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session: Session) -> None:
+    for user_id, token_version in session.info.pop("invalidated_principals", {}).items():
+        _apply_invalidation(user_id, token_version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_principals(session: Session) -> None:
+    session.info.pop("invalidated_principals", None)
+
+
+def _apply_invalidation(user_id: str, token_version: Optional[int]) -> None:
+    if token_version is not None:
+        revocations.update(user_id, token_version)
+    principal_cache.invalidate(user_id)
+
+
+def _snapshot(user: User) -> User:
+    values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+    values["hashed_password"] = None
+    return User(**values)
@@ -0,0 +1,107 @@
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
+import logging
+import secrets
+import uuid
+
+from ..config import settings
+from ..models.models import RefreshToken, TokenRevocation
+
+logger = logging.getLogger(__name__)
+
+# Refresh tokens are opaque random strings; only their SHA-256 is stored,
+# so a leaked table cannot be replayed. Every refresh uses the token up and
+# issues its successor in the same family. Presenting a used token again
+# means two parties hold it, so the whole family is revoked and both must
+# log in again. Logout, password changes and deactivation bump the user's
+# token version (see invalidate_principal), which retires refresh tokens
+# issued before it as well.
+
+
+async def issue_refresh_token(
+    db: AsyncSession, user_id: str, token_version: int, family_id: Optional[str] = None
+) -> str:
+    """Create a refresh token (a new family unless given) and return it; caller commits"""
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    # Used tokens are kept until they expire so reuse can be recognized
+    await db.execute(
+        delete(RefreshToken).where(RefreshToken.user_id == user_id, RefreshToken.expires_at < now)
+    )
+
+    db.add(RefreshToken(
+        token_hash=_hash(token),
+        family_id=family_id or uuid.uuid4().hex,
+        user_id=user_id,
+        token_version=token_version,
+        created_at=now,
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[Tuple[str, int, str]]:
+    """
+    Use up a refresh token and issue its successor; caller commits
+
+    Returns (user_id, token_version, new_refresh_token), or None if the
+    token is unknown, expired, revoked or retired by a newer token version.
+    A reused token revokes its family before None is returned, so the
+    caller must commit in that case too. The token version is checked
+    against token_revocations in the same statement, so a revocation
+    committed by any worker applies at once. Only indexed lookups by token
+    and user; no password hashing.
+    """
+    token_hash = _hash(token)
+    now = datetime.utcnow()
+    current_version = (
+        select(TokenRevocation.token_version)
+        .where(TokenRevocation.user_id == RefreshToken.user_id)
+        .scalar_subquery()
+    )
+    row = (await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.used_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+            RefreshToken.token_version >= func.coalesce(current_version, 0)
+        )
+        .values(used_at=now)
+        .returning(RefreshToken.user_id, RefreshToken.family_id, RefreshToken.token_version)
+    )).first()
+
+    if row is None:
+        await _revoke_if_reused(db, token_hash, now)
+        return None
+
+    user_id, family_id, token_version = row
+    new_token = await issue_refresh_token(db, user_id, token_version, family_id)
+    return user_id, token_version, new_token
+
+
+# ============= Helper Functions =============
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def _revoke_if_reused(db: AsyncSession, token_hash: str, now: datetime) -> None:
+    used = (await db.execute(
+        select(RefreshToken.user_id, RefreshToken.family_id)
+        .where(RefreshToken.token_hash == token_hash, RefreshToken.used_at.isnot(None))
+    )).first()
+    if used is None:
+        return
+
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == used.family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    if result.rowcount:
+        logger.warning(f"Refresh token reused for user {used.user_id}; revoked token family {used.family_id}")
@@ -0,0 +1,116 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+import csv
+import io
+import json
+
+from ..models.models import Survey, FormSchema, MODULE_FIELDS
+from ..utils.streaming import ndjson_line
+
+# Survey columns leading every export row, before the module fields
+BASE_COLUMNS = [
+    "survey_id", "panchayat_id", "village_name", "user_id",
+    "completion_percentage", "is_complete", "sync_status", "version",
+    "created_at", "updated_at"
+]
+
+# (header, module, path into the module's JSON)
+ExportColumn = Tuple[str, str, Tuple[str, ...]]
+
+
+async def load_export_columns(db: AsyncSession) -> List[ExportColumn]:
+    """
+    Module columns for an export, derived from the active form schemas
+
+    Every schema field becomes `module.field`; `table_row` fields become one
+    `module.field.column` per table column. A module without an active
+    schema is exported whole as JSON in a single `module` column.
+    """
+    schemas = {}
+    rows = await db.execute(
+        select(FormSchema.module_name, FormSchema.schema_json)
+        .where(FormSchema.is_active == True)
+        .order_by(FormSchema.updated_at)
+    )
+    for module_name, schema_json in rows:
+        schemas[module_name] = schema_json  # Latest active schema per module wins
+
+    columns = []
+    for module in MODULE_FIELDS:
+        if module not in schemas:
+            columns.append((module, module, ()))
+            continue
+
+        for field in schemas[module].get("fields", []):
+            field_id = field["field_id"]
+            if field.get("type") == "table_row" and field.get("columns"):
+                for column in field["columns"]:
+                    columns.append((f"{module}.{field_id}.{column['id']}", module, (field_id, column["id"])))
+            else:
+                columns.append((f"{module}.{field_id}", module, (field_id,)))
+    return columns
+
+
+def flatten_survey(row, columns: List[ExportColumn]) -> Dict[str, Any]:
+    """One export record: the base columns followed by the flattened module fields"""
+    record = {column: getattr(row, column) for column in BASE_COLUMNS}
+    for header, module, path in columns:
+        value = getattr(row, module)
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        record[header] = value
+    return record
+
+
+async def stream_csv(rows: AsyncIterator, columns: List[ExportColumn], chunk_rows: int) -> AsyncIterator[bytes]:
+    """CSV with a header line, sent every `chunk_rows` rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(BASE_COLUMNS + [header for header, _, _ in columns])
+
+    count = 0
+    async for row in rows:
+        writer.writerow([_csv_value(value) for value in flatten_survey(row, columns).values()])
+        count += 1
+        if count % chunk_rows == 0:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+async def stream_ndjson(rows: AsyncIterator, columns: List[ExportColumn], chunk_rows: int) -> AsyncIterator[bytes]:
+    """One flattened JSON object per line, sent every `chunk_rows` rows"""
+    lines = []
+    async for row in rows:
+        lines.append(ndjson_line(flatten_survey(row, columns)))
+        if len(lines) >= chunk_rows:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+
+def export_columns(columns: Iterable[ExportColumn]) -> list:
+    """Survey columns to select for an export"""
+    modules = {module for _, module, _ in columns}
+    return [getattr(Survey, column) for column in BASE_COLUMNS] + \
+        [getattr(Survey, module) for module in MODULE_FIELDS if module in modules]
+
+
+# ============= Helper Functions =============
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    data = buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+    return data
@@ -0,0 +1,205 @@
+from sqlalchemy import DDL, event, and_, or_, not_, func, literal_column, Numeric
+from typing import Any, List, Optional, Tuple
+import re
+
+from ..database import Base
+from ..models.models import Survey, MODULE_FIELDS
+
+# Filter expressions over module answers, e.g.
+#
+#     sanitation.open_defecation = yes and basic_info.total_population > 5000
+#
+# compile to JSONB operators: equality with text or booleans is a
+# containment test (@>) served by the GIN index on each module column, and
+# numeric comparisons go through survey_numeric(), which has expression
+# indexes on the hottest numeric fields. Field names are checked against a
+# strict pattern before being inlined; values are always bound parameters.
+
+MAX_FILTER_LENGTH = 1000
+MAX_FILTER_COMPARISONS = 20
+MAX_FILTER_DEPTH = 32
+
+# Numeric answers filtered often enough to get an expression index
+INDEXED_NUMERIC_FIELDS = [
+    ("basic_info", "total_population"),
+    ("basic_info", "total_households"),
+]
+
+# Numbers may be stored as JSON numbers or, from form inputs, as numeric
+# strings; anything else reads as NULL instead of failing the query
+SURVEY_FILTER_SQL = """
+CREATE OR REPLACE FUNCTION survey_numeric(value jsonb) RETURNS numeric
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN jsonb_typeof(value) = 'number' THEN (value #>> '{}')::numeric
+        WHEN jsonb_typeof(value) = 'string' AND (value #>> '{}') ~ '^ *-?[0-9]+([.][0-9]+)? *$'
+            THEN trim(value #>> '{}')::numeric
+    END
+$$;
+""" + "".join(
+    f"\nCREATE INDEX IF NOT EXISTS ix_surveys_{module}_{key}"
+    f" ON surveys (survey_numeric({module} -> '{key}'));\n"
+    for module, key in INDEXED_NUMERIC_FIELDS
+)
+
+# Installed by Base.metadata.create_all (app startup); idempotent
+event.listen(Base.metadata, "after_create", DDL(SURVEY_FILTER_SQL))
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<op>>=|<=|!=|=|>|<)
+      | (?P<paren>[()])
+      | (?P<number>-?\d+(?:\.\d+)?)(?![\w.])
+      | "(?P<dquoted>[^"]*)"
+      | '(?P<squoted>[^']*)'
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {"and", "or", "not"}
+
+
+def compile_filter(expression: str):
+    """
+    Compile a filter expression into a WHERE clause on Survey
+
+    Grammar:
+        expr       := term ("or" term)*
+        term       := factor ("and" factor)*
+        factor     := "not" factor | "(" expr ")" | comparison
+        comparison := module.key[.key...] (= | != | > | >= | < | <=) value
+        value      := number | "text" | 'text' | true | false | bare_word
+
+    Comparisons only match surveys that answered the question. Raises
+    ValueError with a message fit for the client on invalid input.
+    """
+    if len(expression) > MAX_FILTER_LENGTH:
+        raise ValueError(f"Filter is longer than {MAX_FILTER_LENGTH} characters")
+
+    parser = _Parser(_tokenize(expression))
+    clause = parser.expr()
+    if parser.peek() is not None:
+        raise ValueError(f"Unexpected '{parser.peek()[1]}' in filter")
+    return clause
+
+
+def comparison_clause(module: str, path: List[str], op: str, value: Any):
+    """WHERE clause for one `module.path op value` comparison"""
+    column = getattr(Survey, module)
+    answer = column
+    for key in path:
+        answer = answer.op("->")(literal_column(f"'{key}'"))
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = func.survey_numeric(answer, type_=Numeric)
+        return {
+            "=": number == value, "!=": number != value,
+            ">": number > value, ">=": number >= value,
+            "<": number < value, "<=": number <= value,
+        }[op]
+
+    if op not in ("=", "!="):
+        raise ValueError(f"'{op}' needs a number, got {value!r}")
+
+    document = value
+    for key in reversed(path):
+        document = {key: document}
+    matches = column.contains(document)
+    return matches if op == "=" else and_(answer.isnot(None), not_(matches))
+
+
+# ============= Helper Functions =============
+
+def _tokenize(expression: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Cannot parse filter near '{expression[position:position + 20]}'")
+        position = match.end()
+
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "number":
+            tokens.append(("value", float(text) if "." in text else int(text)))
+        elif kind in ("dquoted", "squoted"):
+            tokens.append(("value", text))
+        elif kind == "word" and text.lower() in _KEYWORDS:
+            tokens.append((text.lower(), text))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the token list"""
+
+    def __init__(self, tokens: List[Tuple[str, Any]]):
+        self.tokens = tokens
+        self.position = 0
+        self.comparisons = 0
+        self.depth = 0
+
+    def peek(self) -> Optional[Tuple[str, Any]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, *kinds: str) -> Tuple[str, Any]:
+        token = self.peek()
+        if token is None:
+            raise ValueError("Filter ends unexpectedly")
+        if kinds and token[0] not in kinds:
+            raise ValueError(f"Unexpected '{token[1]}' in filter")
+        self.position += 1
+        return token
+
+    def expr(self):
+        clauses = [self.term()]
+        while self.peek() and self.peek()[0] == "or":
+            self.take()
+            clauses.append(self.term())
+        return clauses[0] if len(clauses) == 1 else or_(*clauses)
+
+    def term(self):
+        clauses = [self.factor()]
+        while self.peek() and self.peek()[0] == "and":
+            self.take()
+            clauses.append(self.factor())
+        return clauses[0] if len(clauses) == 1 else and_(*clauses)
+
+    def factor(self):
+        token = self.take("not", "paren", "word")
+        if token[0] == "word":
+            return self.comparison(token[1])
+
+        # Nested parentheses and "not" recurse; bound them so a crafted
+        # filter is rejected instead of exhausting the stack
+        self.depth += 1
+        if self.depth > MAX_FILTER_DEPTH:
+            raise ValueError(f"Filter is nested more than {MAX_FILTER_DEPTH} levels deep")
+        if token[0] == "not":
+            clause = not_(self.factor())
+        else:
+            if token[1] != "(":
+                raise ValueError("Unexpected ')' in filter")
+            clause = self.expr()
+            if self.take("paren")[1] != ")":
+                raise ValueError("Expected ')' in filter")
+        self.depth -= 1
+        return clause
+
+    def comparison(self, field: str):
+        self.comparisons += 1
+        if self.comparisons > MAX_FILTER_COMPARISONS:
+            raise ValueError(f"Filter has more than {MAX_FILTER_COMPARISONS} comparisons")
+
+        module, _, rest = field.partition(".")
+        if module not in MODULE_FIELDS or not rest:
+            raise ValueError(f"Unknown field '{field}'; use module.question, e.g. sanitation.open_defecation")
+
+        op = self.take("op")[1]
+        kind, value = self.take("value", "word")
+        if kind == "word":
+            lowered = value.lower()
+            value = {"true": True, "false": False}.get(lowered, value)
+        return comparison_clause(module, rest.split("."), op, value)
@@ -0,0 +1,81 @@
+from sqlalchemy import DDL, event, select, func, or_, any_, case
+
+from ..database import Base
+from ..models.models import Survey, User
+
+# Admin search matches the term anywhere in the village name or in the
+# creator's username / full name (a case-insensitive '%term%' ILIKE).
+# pg_trgm GIN indexes serve the ILIKE on village names and on user names;
+# matching creators are resolved to user ids first and looked up by the
+# surveys.user_id index. Both branches are index scans combined with a
+# BitmapOr, so a search costs the number of matches rather than the size
+# of the table. Where pg_trgm cannot be installed the indexes are skipped
+# with a warning: search returns the same rows, without an index.
+# The full text indexes of the earlier word-prefix search are dropped.
+SURVEY_SEARCH_SQL = """
+DROP INDEX IF EXISTS ix_surveys_village_search;
+DROP INDEX IF EXISTS ix_users_search;
+DROP FUNCTION IF EXISTS survey_search_query(text);
+
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS ix_surveys_village_trgm
+        ON surveys USING gin (village_name gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS ix_users_name_trgm
+        ON users USING gin (username gin_trgm_ops, full_name gin_trgm_ops);
+EXCEPTION WHEN feature_not_supported OR insufficient_privilege THEN
+    RAISE WARNING USING MESSAGE = 'pg_trgm is not available, survey search is not indexed: ' || SQLERRM;
+END $$;
+"""
+
+# Installed by Base.metadata.create_all (app startup); idempotent
+event.listen(Base.metadata, "after_create", DDL(SURVEY_SEARCH_SQL))
+
+# Escape character for the LIKE wildcards in a search term
+LIKE_ESCAPE = "/"
+
+
+def search_clause(term: str):
+    """WHERE clause on Survey matching the term in the village or creator names"""
+    pattern = _contains_pattern(term)
+    matching_creators = func.array(
+        select(User.user_id).where(or_(
+            User.username.ilike(pattern, escape=LIKE_ESCAPE),
+            User.full_name.ilike(pattern, escape=LIKE_ESCAPE)
+        )).scalar_subquery()
+    )
+    return or_(
+        Survey.village_name.ilike(pattern, escape=LIKE_ESCAPE),
+        Survey.user_id == any_(matching_creators)
+    )
+
+
+def search_rank(term: str):
+    """
+    Relevance of a search hit, best first when sorted descending
+
+    Villages starting with the term rank first, then villages containing
+    it, then matches on the creator only.
+    """
+    escaped = _escape_like(term)
+    return case(
+        (Survey.village_name.ilike(f"{escaped}%", escape=LIKE_ESCAPE), 2),
+        (Survey.village_name.ilike(f"%{escaped}%", escape=LIKE_ESCAPE), 1),
+        else_=0
+    )
+
+
+# ============= Helper Functions =============
+
+def _escape_like(term: str) -> str:
+    """The term with LIKE wildcards taken literally"""
+    return (
+        term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+
+
+def _contains_pattern(term: str) -> str:
+    return f"%{_escape_like(term)}%"
@@ -0,0 +1,97 @@
+from sqlalchemy import select, update, delete, func, literal_column, Select
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+from ..config import settings
+from ..models.models import Survey, SurveyVersion, MODULE_FIELDS
+from .merge import superseded_versions
+
+# Statement builders for single-survey writes. Each returns one SELECT
+# whose data-modifying CTEs write the survey, store its merge-base snapshot
+# and prune old snapshots, so a write is a single round trip that
+# returns the new row. An update snapshots only the modules it wrote;
+# load_base_versions rebuilds the rest from older snapshots. Column
+# defaults are not applied to writes inside a CTE, so the timestamps are
+# set explicitly.
+
+
+def guarded_update(
+    survey_id: str,
+    expected_version: int,
+    values: Dict[str, Any],
+    panchayat_id: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> Select:
+    """
+    UPDATE ... WHERE version = expected_version RETURNING the new row
+
+    No row comes back when the survey is missing, outside panchayat_id
+    (when given) or no longer at expected_version, so a write never
+    overwrites one it did not see. `columns` narrows the returned row (all
+    columns by default); only they and the written modules leave the
+    database.
+    """
+    now = datetime.utcnow()
+    statement = update(Survey).where(
+        Survey.survey_id == survey_id,
+        func.coalesce(Survey.version, 0) == expected_version
+    )
+    if panchayat_id is not None:
+        statement = statement.where(Survey.panchayat_id == panchayat_id)
+
+    statement = statement.values(
+        **values,
+        version=func.coalesce(Survey.version, 0) + 1,
+        updated_at=now,
+        server_timestamp=now,
+        last_synced_at=now
+    )
+    modules = [field for field in MODULE_FIELDS if field in values]
+    returned = columns or [column.name for column in Survey.__table__.c]
+    needed = dict.fromkeys(returned + ["survey_id", "version", "server_timestamp"] + modules)
+    statement = statement.returning(*[Survey.__table__.c[column] for column in needed])
+    return _with_snapshot(statement, modules, columns)
+
+
+def insert_if_absent(values: Dict[str, Any]) -> Select:
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING the new row (none if the survey exists)"""
+    now = datetime.utcnow()
+    statement = insert(Survey).values(
+        **values,
+        version=1,
+        created_at=now,
+        updated_at=now,
+        server_timestamp=now,
+        last_synced_at=now
+    ).on_conflict_do_nothing(index_elements=[Survey.survey_id])
+    return _with_snapshot(statement.returning(*Survey.__table__.c), MODULE_FIELDS)
+
+
+# ============= Helper Functions =============
+
+def _with_snapshot(write, modules: List[str], columns: Optional[List[str]] = None) -> Select:
+    """Select the written row while the same statement stores the snapshot of its modules"""
+    written = write.cte("written")
+
+    snapshot = insert(SurveyVersion).from_select(
+        ["survey_id", "version", "data", "created_at"],
+        select(
+            written.c.survey_id,
+            written.c.version,
+            func.jsonb_build_object(*[
+                part for field in modules for part in (literal_column(f"'{field}'"), written.c[field])
+            ]),
+            written.c.server_timestamp
+        )
+    ).on_conflict_do_nothing(index_elements=[SurveyVersion.survey_id, SurveyVersion.version]).cte("snapshot")
+
+    # All CTEs see the same snapshot of the table, so prune relative to
+    # the version just written rather than to the stored maximum
+    prune = delete(SurveyVersion).where(
+        SurveyVersion.survey_id == select(written.c.survey_id).scalar_subquery(),
+        superseded_versions(select(written.c.version - settings.SURVEY_VERSION_HISTORY).scalar_subquery())
+    ).cte("prune")
+
+    selected = [written.c[column] for column in columns] if columns else [written]
+    return select(*selected).add_cte(snapshot).add_cte(prune)
@@ -0,0 +1,109 @@
+from sqlalchemy import DDL, event, select, func, delete, insert, text, literal_column
+from sqlalchemy.orm import Session
+from typing import Dict, Optional
+
+from ..database import Base
+from ..models.models import Survey, SyncStatusCount
+from . import counter_deltas  # Applies the staged counter deltas at commit
+
+SYNC_STATUSES = ["synced", "pending", "conflict", "failed"]
+
+# Statement-level triggers keep sync_status_counts in step with surveys in
+# the same transaction as every write, including bulk upserts and deletes.
+# Each statement stages one delta per (panchayat, status); they are summed
+# and applied at commit (see counter_deltas).
+SYNC_COUNTER_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION sync_status_counts_on_insert() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, sync_status, delta)
+    SELECT 'sync_status', panchayat_id, COALESCE(sync_status, 'unknown'), count(*)
+    FROM new_rows GROUP BY 2, 3;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_update() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, sync_status, delta)
+    SELECT 'sync_status', panchayat_id, status, sum(delta) FROM (
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown') AS status, -1 AS delta FROM old_rows
+        UNION ALL
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown') AS status, 1 AS delta FROM new_rows
+    ) changes
+    GROUP BY 2, 3 HAVING sum(delta) <> 0;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_status_counts_on_delete() RETURNS trigger AS $$
+BEGIN
+    PERFORM stage_survey_counter_deltas();
+    INSERT INTO pg_temp.survey_counter_deltas (counter, key, sync_status, delta)
+    SELECT 'sync_status', panchayat_id, COALESCE(sync_status, 'unknown'), -count(*)
+    FROM old_rows GROUP BY 2, 3;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_sync_counts_insert') THEN
+        CREATE TRIGGER surveys_sync_counts_insert AFTER INSERT ON surveys
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_status_counts_on_insert();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_sync_counts_update') THEN
+        CREATE TRIGGER surveys_sync_counts_update AFTER UPDATE ON surveys
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_status_counts_on_update();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'surveys_sync_counts_delete') THEN
+        CREATE TRIGGER surveys_sync_counts_delete AFTER DELETE ON surveys
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_status_counts_on_delete();
+        -- First install on an existing database: backfill the counters
+        DELETE FROM sync_status_counts;
+        INSERT INTO sync_status_counts (panchayat_id, sync_status, survey_count)
+        SELECT panchayat_id, COALESCE(sync_status, 'unknown'), count(*)
+        FROM surveys GROUP BY 1, 2;
+    END IF;
+END $$;
+"""
+
+# Installed by Base.metadata.create_all (app startup); idempotent
+event.listen(Base.metadata, "after_create", DDL(SYNC_COUNTER_TRIGGERS_SQL))
+
+
+def read_sync_status_counts(db: Session, panchayat_id: Optional[str]) -> Dict[str, int]:
+    """
+    Survey counts by sync status for one panchayat (or all when None)
+
+    Reads the counter table in one query. If it holds nothing for the
+    scope (no surveys, an unknown panchayat, or counters not built yet),
+    the counts come from one GROUP BY over surveys instead. Nothing is
+    written or locked, so polling never blocks survey writes; the locked
+    rebuild is left to rebuild_sync_status_counts.
+    """
+    query = select(SyncStatusCount.sync_status, func.sum(SyncStatusCount.survey_count))
+    if panchayat_id:
+        query = query.where(SyncStatusCount.panchayat_id == panchayat_id)
+    counts = {status: int(count) for status, count in db.execute(query.group_by(SyncStatusCount.sync_status))}
+
+    if not counts:
+        sync_status = func.coalesce(Survey.sync_status, literal_column("'unknown'"))
+        query = select(sync_status, func.count())
+        if panchayat_id:
+            query = query.where(Survey.panchayat_id == panchayat_id)
+        counts = {status: count for status, count in db.execute(query.group_by(sync_status))}
+
+    return counts
+
+
+def rebuild_sync_status_counts(db: Session) -> None:
+    """Recompute every counter from surveys with one GROUP BY (caller commits)"""
+    db.execute(text("LOCK TABLE sync_status_counts IN EXCLUSIVE MODE"))
+    db.execute(delete(SyncStatusCount))
+    sync_status = func.coalesce(Survey.sync_status, literal_column("'unknown'"))
+    db.execute(insert(SyncStatusCount).from_select(
+        ["panchayat_id", "sync_status", "survey_count"],
+        select(Survey.panchayat_id, sync_status, func.count()).group_by(Survey.panchayat_id, sync_status)
+    ))
@@ -0,0 +1,302 @@
+from sqlalchemy import select, case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+from datetime import datetime
+
+from ..models.models import Survey, SyncLog, User, Panchayat, MODULE_FIELDS
+from ..schemas.schemas import SurveyCreate, SyncSurvey
+from .idempotency import apply_once, survey_key, batch_item_key
+from .merge import merge_survey_modules, load_base_versions, record_versions
+
+# Columns written by the upsert. Server-managed columns (change feed
+# position) are left to the database triggers.
+INSERT_COLUMNS = MODULE_FIELDS + [
+    "survey_id", "panchayat_id", "user_id", "village_name",
+    "completion_percentage", "is_complete", "sync_status", "last_synced_at",
+    "version", "created_at", "updated_at", "client_timestamp", "server_timestamp"
+]
+
+# Columns rewritten when an existing survey is updated through sync.
+# Ownership (user_id, panchayat_id) and created_at are never touched.
+UPDATE_COLUMNS = MODULE_FIELDS + [
+    "village_name", "completion_percentage", "is_complete",
+    "sync_status", "last_synced_at", "server_timestamp", "updated_at", "version"
+]
+
+
+def apply_sync_batch(db: Session, surveys: List[SurveyCreate], user: User) -> List[Dict[str, Any]]:
+    """
+    Apply a batch of offline surveys using set-based statements
+
+    One prefetch for all survey IDs, one INSERT ... ON CONFLICT for every
+    survey that can be written, and one bulk insert for the sync logs.
+    Surveys are applied in request order, so a survey repeated within the
+    batch sees the result of its earlier copy.
+
+    Surveys that carry a base_version with a stored snapshot are merged
+    key by key against it; only keys changed differently on both sides are
+    reported as conflicts. Without a base, any differing module conflicts.
+
+    Returns one result per incoming survey:
+        {"survey_id", "operation", "status", "conflicts", "error_message"}
+    where status is one of success, conflict, failed.
+    The caller owns the transaction and must commit.
+    """
+    if not surveys:
+        return []
+
+    now = datetime.utcnow()
+    survey_ids = {s.survey_id for s in surveys}
+    panchayat_ids = {s.panchayat_id for s in surveys}
+
+    # Prefetch existing rows, merge bases and valid panchayats in three queries
+    existing = {
+        row["survey_id"]: dict(row)
+        for row in db.execute(
+            select(Survey.__table__).where(Survey.survey_id.in_(survey_ids))
+        ).mappings()
+    }
+    bases = load_base_versions(db, {
+        (s.survey_id, s.base_version) for s in surveys
+        if s.base_version is not None and s.survey_id in existing
+    })
+    known_panchayats = set(db.execute(
+        select(Panchayat.panchayat_id).where(Panchayat.panchayat_id.in_(panchayat_ids))
+    ).scalars())
+
+    # Resolve every survey in memory
+    pending: Dict[str, Dict[str, Any]] = {}  # survey_id -> row to upsert
+    expected_versions: Dict[str, int] = {}  # survey_id -> version the row must still have
+    results = []
+
+    for incoming in surveys:
+        current = pending.get(incoming.survey_id) or existing.get(incoming.survey_id)
+
+        if current is None:
+            if incoming.panchayat_id not in known_panchayats:
+                results.append(_result(incoming.survey_id, "create", "failed",
+                                       error_message="Panchayat not found"))
+                continue
+
+            pending[incoming.survey_id] = _new_row(incoming, user, now)
+            expected_versions[incoming.survey_id] = 0
+            results.append(_result(incoming.survey_id, "create", "success"))
+            continue
+
+        base = bases.get((incoming.survey_id, incoming.base_version))
+        if base is not None:
+            modules, conflicts = merge_survey_modules(base, current, incoming)
+        else:
+            modules = {
+                field: getattr(incoming, field) for field in MODULE_FIELDS
+                if getattr(incoming, field) is not None
+            }
+            conflicts = _module_conflicts(current, incoming)
+        if conflicts:
+            results.append(_result(incoming.survey_id, "update", "conflict", conflicts=conflicts))
+            continue
+
+        if incoming.survey_id not in expected_versions:
+            expected_versions[incoming.survey_id] = current["version"] or 0
+        pending[incoming.survey_id] = _updated_row(current, modules, incoming, now)
+        results.append(_result(incoming.survey_id, "update", "success"))
+
+    # One upsert for every writable survey. The WHERE guard only lets the
+    # update through if nobody else bumped the version since the prefetch;
+    # a new row racing with a concurrent create (expected version 0) is skipped.
+    # A survey the database rejects (e.g. a value jsonb cannot store) fails
+    # the statement; the rows are then retried one by one so only it fails.
+    failed: Dict[str, str] = {}
+    if pending:
+        pending_ids = list(pending)
+
+        def write(rows: List[Dict[str, Any]]) -> List[str]:
+            stmt = insert(Survey).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Survey.survey_id],
+                set_={col: stmt.excluded[col] for col in UPDATE_COLUMNS},
+                where=func.coalesce(Survey.version, 0) == _expected_version_case(expected_versions)
+            ).returning(Survey.survey_id)
+            written_ids = list(db.execute(stmt).scalars())
+            record_versions(db, [pending[survey_id] for survey_id in written_ids])
+            return written_ids
+
+        written_ids, errors = write_isolated(db, list(pending.values()), write)
+        written = set(written_ids)
+        failed = {pending_ids[index]: error for index, error in errors.items()}
+
+        for result in results:
+            if result["status"] != "success" or result["survey_id"] not in pending:
+                continue
+            if result["survey_id"] in failed:
+                result["status"] = "failed"
+                result["error_message"] = failed[result["survey_id"]]
+            elif result["survey_id"] not in written:
+                result["status"] = "conflict"
+                result["error_message"] = "Survey was modified concurrently"
+
+    # One bulk insert for the audit trail; surveys that were never stored
+    # cannot be logged (sync_logs references surveys)
+    logs = [
+        {
+            "survey_id": r["survey_id"],
+            "user_id": user.user_id,
+            "operation": r["operation"],
+            "status": r["status"],
+            "conflicts": r["conflicts"],
+            "error_message": r["error_message"],
+            "timestamp": now,
+        }
+        for r in results
+        if r["survey_id"] in existing or (r["survey_id"] in pending and r["survey_id"] not in failed)
+    ]
+    if logs:
+        def write_logs(batch: List[Dict[str, Any]]) -> None:
+            db.execute(insert(SyncLog), batch)
+
+        _, errors = write_isolated(db, logs, write_logs)
+        for index in errors:
+            # Keep the outcome even if the client values in it cannot be stored
+            logs[index]["conflicts"] = None
+        if errors:
+            db.execute(insert(SyncLog), [logs[index] for index in errors])
+
+    return results
+
+
+def apply_sync_batch_once(db: Session, surveys: List[SyncSurvey], user: User,
+                          key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    apply_sync_batch, answering surveys already applied from the idempotency store
+
+    A survey is identified by its own idempotency_key or, failing that, by
+    its position in a batch sent with the Idempotency-Key `key`. Successful
+    results are stored in the caller's transaction.
+    """
+    keys = [
+        survey_key(user.user_id, survey.idempotency_key) if survey.idempotency_key
+        else batch_item_key(key, position) if key
+        else None
+        for position, survey in enumerate(surveys)
+    ]
+    return apply_once(
+        db, user.user_id, surveys, keys,
+        apply=lambda db, items: apply_sync_batch(db, items, user),
+        rejected=lambda survey: _result(survey.survey_id, "sync", "failed",
+                                        error_message="Idempotency key was already used for a different survey")
+    )
+
+
+def summarize_results(results: List[Dict[str, Any]]) -> dict:
+    """Build the SyncResponse payload from per-survey results"""
+    synced_count = sum(1 for r in results if r["status"] == "success")
+    failed_count = len(results) - synced_count
+    conflicts = [r["survey_id"] for r in results if r["status"] == "conflict"]
+
+    return {
+        "status": "completed" if failed_count == 0 else "partial",
+        "synced_count": synced_count,
+        "failed_count": failed_count,
+        "conflicts": conflicts,
+        "message": f"Synced {synced_count} surveys successfully. {failed_count} failed."
+    }
+
+
+def write_isolated(db: Session, items: List[Any],
+                   write: Callable[[List[Any]], Iterable]) -> Tuple[list, Dict[int, str]]:
+    """
+    Run write(items) in a savepoint, falling back to one savepoint per item
+
+    Returns (outputs of the successful writes, {index: error message} for
+    the items the database rejected).
+    """
+    try:
+        with db.begin_nested():
+            return list(write(items) or []), {}
+    except DBAPIError:
+        pass
+
+    outputs, errors = [], {}
+    for index, item in enumerate(items):
+        try:
+            with db.begin_nested():
+                outputs.extend(write([item]) or [])
+        except DBAPIError as e:
+            errors[index] = str(e.orig)
+    return outputs, errors
+
+
+# ============= Helper Functions =============
+
+def _result(survey_id: str, operation: str, status: str,
+            conflicts: list = None, error_message: str = None) -> Dict[str, Any]:
+    return {
+        "survey_id": survey_id,
+        "operation": operation,
+        "status": status,
+        "conflicts": conflicts,
+        "error_message": error_message,
+    }
+
+
+def _module_conflicts(current: Dict[str, Any], incoming: SurveyCreate) -> List[dict]:
+    """A module conflicts when both sides have a value and they differ"""
+    conflicts = []
+    for field in MODULE_FIELDS:
+        db_value = current.get(field)
+        incoming_value = getattr(incoming, field, None)
+
+        if incoming_value is None:
+            continue
+
+        if db_value != incoming_value and db_value is not None:
+            conflicts.append({
+                "field_name": field,
+                "server_value": db_value,
+                "client_value": incoming_value
+            })
+    return conflicts
+
+
+def _new_row(incoming: SurveyCreate, user: User, now: datetime) -> Dict[str, Any]:
+    row = {field: getattr(incoming, field) for field in MODULE_FIELDS}
+    row.update(
+        survey_id=incoming.survey_id,
+        panchayat_id=incoming.panchayat_id,
+        user_id=user.user_id,
+        village_name=incoming.village_name,
+        completion_percentage=incoming.completion_percentage,
+        is_complete=incoming.is_complete,
+        sync_status="synced",
+        last_synced_at=now,
+        version=1,
+        created_at=now,
+        updated_at=now,
+        client_timestamp=incoming.client_timestamp,
+        server_timestamp=now,
+    )
+    return row
+
+
+def _updated_row(current: Dict[str, Any], modules: Dict[str, Any],
+                 incoming: SurveyCreate, now: datetime) -> Dict[str, Any]:
+    row = {column: current[column] for column in INSERT_COLUMNS}
+    row.update(modules)
+    row.update(
+        village_name=incoming.village_name or current["village_name"],
+        completion_percentage=incoming.completion_percentage,
+        is_complete=incoming.is_complete,
+        sync_status="synced",
+        last_synced_at=now,
+        server_timestamp=now,
+        updated_at=now,
+        version=(current["version"] or 0) + 1,
+    )
+    return row
+
+
+def _expected_version_case(expected_versions: Dict[str, int]):
+    """CASE expression mapping each survey_id to the version it was read at"""
+    return case(expected_versions, value=Survey.survey_id, else_=-1)
@@ -0,0 +1,190 @@
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import uuid
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.models import SyncJob, User
+from ..schemas.schemas import SyncSurvey
+from .sync_engine import apply_sync_batch_once, summarize_results
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_sync_job(db: Session, surveys: List[SyncSurvey], user: User) -> SyncJob:
+    """Store a batch for background processing (caller commits)"""
+    job = SyncJob(
+        job_id=f"JOB_{uuid.uuid4().hex[:12].upper()}",
+        user_id=user.user_id,
+        status="queued",
+        payload=[survey.model_dump(mode="json") for survey in surveys],
+        attempts=0,
+        created_at=datetime.utcnow()
+    )
+    db.add(job)
+    return job
+
+
+def claim_next_job(db: Session) -> Optional[SyncJob]:
+    """
+    Claim the oldest runnable job and commit the claim
+
+    Uses FOR UPDATE SKIP LOCKED so concurrent workers, in this process or
+    others, never block on or double-claim the same job. A requeued job
+    waits until its available_at. Jobs left running by a crashed worker
+    become claimable again after SYNC_JOB_TIMEOUT_SECONDS, or are marked
+    failed if they used up SYNC_JOB_MAX_ATTEMPTS.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.SYNC_JOB_TIMEOUT_SECONDS)
+
+    db.execute(
+        update(SyncJob)
+        .where(
+            SyncJob.status == "running",
+            SyncJob.started_at < stale_before,
+            SyncJob.attempts >= settings.SYNC_JOB_MAX_ATTEMPTS
+        )
+        .values(
+            status="failed",
+            error_message=f"Gave up after {settings.SYNC_JOB_MAX_ATTEMPTS} attempts that did not finish",
+            finished_at=now
+        )
+    )
+
+    next_job = (
+        select(SyncJob.job_id)
+        .where(or_(
+            and_(
+                SyncJob.status == "queued",
+                or_(SyncJob.available_at.is_(None), SyncJob.available_at <= now)
+            ),
+            and_(
+                SyncJob.status == "running",
+                SyncJob.started_at < stale_before,
+                SyncJob.attempts < settings.SYNC_JOB_MAX_ATTEMPTS
+            )
+        ))
+        .order_by(SyncJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    job_id = db.execute(
+        update(SyncJob)
+        .where(SyncJob.job_id == next_job)
+        .values(status="running", started_at=now, attempts=SyncJob.attempts + 1)
+        .returning(SyncJob.job_id)
+    ).scalar()
+    db.commit()
+
+    if job_id is None:
+        return None
+    return db.get(SyncJob, job_id)
+
+
+def process_next_job() -> bool:
+    """
+    Claim and apply one job; returns False when the queue is empty
+
+    The survey writes, sync logs, idempotency records and the job's results
+    are committed in one transaction, so a job is either fully applied or
+    not at all. Surveys already applied under their idempotency_key are
+    answered from the stored result. A job that raises is queued again
+    after a backoff of SYNC_JOB_RETRY_BACKOFF_SECONDS, doubled per attempt,
+    until it used up SYNC_JOB_MAX_ATTEMPTS; then it is marked failed.
+    """
+    db = SessionLocal()
+    try:
+        job = claim_next_job(db)
+        if job is None:
+            return False
+
+        job_id = job.job_id
+        attempts = job.attempts
+        try:
+            user = db.get(User, job.user_id)
+            surveys = [SyncSurvey.model_validate(item) for item in job.payload]
+            results = apply_sync_batch_once(db, surveys, user)
+
+            job.results = results
+            job.summary = summarize_results(results)
+            job.status = "completed"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if attempts < settings.SYNC_JOB_MAX_ATTEMPTS:
+                backoff = settings.SYNC_JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+                logger.warning(f"Sync job {job_id} attempt {attempts} failed, retrying in {backoff}s: {e}")
+                values = {
+                    "status": "queued",
+                    "error_message": str(e),
+                    "available_at": datetime.utcnow() + timedelta(seconds=backoff)
+                }
+            else:
+                logger.error(f"Sync job {job_id} failed: {e}")
+                values = {"status": "failed", "error_message": str(e), "finished_at": datetime.utcnow()}
+            db.execute(update(SyncJob).where(SyncJob.job_id == job_id).values(**values))
+            db.commit()
+        return True
+    finally:
+        db.close()
+
+
+class SyncJobWorkers:
+    """
+    Background workers applying queued sync jobs
+
+    Each worker runs the blocking job processing in a thread and holds a
+    pooled connection only while it claims or applies a job. Idle workers
+    poll every SYNC_JOB_POLL_SECONDS, or wake at once when a job is queued
+    by this process.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} sync job workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was queued"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await asyncio.to_thread(process_next_job)
+            except Exception as e:
+                logger.error(f"Sync job worker error: {e}")
+                processed = False
+
+            if not processed:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+sync_job_workers = SyncJobWorkers(
+    concurrency=settings.SYNC_JOB_WORKERS,
+    poll_interval=settings.SYNC_JOB_POLL_SECONDS
+)
@@ -0,0 +1,152 @@
+from pydantic import ValidationError
+from sqlalchemy import select, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List
+from datetime import datetime
+import csv
+import io
+import json
+import uuid
+
+from ..models.models import User, Panchayat
+from ..schemas.schemas import UserCreate
+from .password_hashing import bulk_password_hasher
+
+# Columns of a CSV import; the header line names them, in any order
+CSV_COLUMNS = ["username", "password", "email", "full_name", "role", "panchayat_id"]
+
+
+def parse_user_rows(body: bytes, content_type: str) -> List[Dict[str, Any]]:
+    """
+    Raw user records from a CSV (text/csv) or JSON array body
+
+    Empty CSV cells read as missing values. Raises ValueError with a message
+    fit for the client if the body cannot be read at all.
+    """
+    if content_type.startswith("text/csv"):
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        except UnicodeDecodeError:
+            raise ValueError("CSV must be UTF-8 encoded")
+        if not reader.fieldnames or not {"username", "password"} <= set(reader.fieldnames):
+            raise ValueError(f"CSV header must include username and password (columns: {', '.join(CSV_COLUMNS)})")
+        return [
+            {key: value for key, value in row.items() if key in CSV_COLUMNS and value not in (None, "")}
+            for row in reader
+        ]
+
+    try:
+        rows = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(rows, list):
+        raise ValueError("JSON body must be an array of users")
+    return rows
+
+
+async def import_users(db: AsyncSession, rows: List[Any]) -> Dict[str, list]:
+    """
+    Create users in bulk; invalid rows are reported and skipped
+
+    Returns {"created": [User], "errors": [{"row", "username", "detail"}]}
+    with 1-based row numbers. Usernames, emails and panchayats are checked
+    with one query each for the whole batch, passwords are hashed in
+    parallel on the bulk hashing pool, and the valid users are inserted
+    with one statement. Commits.
+    """
+    errors = []
+    candidates = []  # (row, UserCreate)
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            candidates.append((row_number, UserCreate.model_validate(row)))
+        except ValidationError as e:
+            username = row.get("username") if isinstance(row, dict) else None
+            errors.append(_error(row_number, username, _validation_message(e)))
+
+    usernames = [user.username for _, user in candidates]
+    emails = [user.email for _, user in candidates if user.email]
+    panchayat_ids = {user.panchayat_id for _, user in candidates if user.panchayat_id}
+
+    taken_usernames, taken_emails = set(), set()
+    if candidates:
+        existing = await db.execute(
+            select(User.username, User.email)
+            .where(or_(User.username.in_(usernames), User.email.in_(emails)))
+        )
+        for username, email in existing:
+            taken_usernames.add(username)
+            taken_emails.add(email)
+    known_panchayats = set()
+    if panchayat_ids:
+        known_panchayats = set((await db.scalars(
+            select(Panchayat.panchayat_id).where(Panchayat.panchayat_id.in_(panchayat_ids))
+        )).all())
+    await db.commit()  # Release the connection while hashing
+
+    accepted = []
+    for row_number, user in candidates:
+        detail = None
+        if user.username in taken_usernames:
+            detail = "Username already registered"
+        elif user.email and user.email in taken_emails:
+            detail = "Email already registered"
+        elif user.panchayat_id and user.panchayat_id not in known_panchayats:
+            detail = f"Unknown panchayat '{user.panchayat_id}'"
+
+        if detail:
+            errors.append(_error(row_number, user.username, detail))
+            continue
+        # Later rows repeating a username or email in this batch are rejected too
+        taken_usernames.add(user.username)
+        if user.email:
+            taken_emails.add(user.email)
+        accepted.append((row_number, user))
+
+    created = []
+    if accepted:
+        hashed_passwords = await bulk_password_hasher.hash_many([user.password for _, user in accepted])
+        now = datetime.utcnow()
+        values = [
+            {
+                "user_id": f"USER_{uuid.uuid4().hex[:12].upper()}",
+                "username": user.username,
+                "email": user.email,
+                "hashed_password": hashed_password,
+                "full_name": user.full_name,
+                "role": user.role,
+                "panchayat_id": user.panchayat_id,
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for (_, user), hashed_password in zip(accepted, hashed_passwords)
+        ]
+        # Registrations racing this import lose nothing: their usernames are skipped
+        inserted = await db.scalars(
+            insert(User).values(values).on_conflict_do_nothing().returning(User)
+        )
+        created_by_username = {user.username: user for user in inserted}
+        await db.commit()
+
+        for row_number, user in accepted:
+            if user.username in created_by_username:
+                created.append(created_by_username[user.username])
+            else:
+                errors.append(_error(row_number, user.username, "Username or email already registered"))
+
+    errors.sort(key=lambda error: error["row"])
+    return {"created": created, "errors": errors}
+
+
+# ============= Helper Functions =============
+
+def _error(row: int, username: Any, detail: str) -> dict:
+    return {"row": row, "username": username if isinstance(username, str) else None, "detail": detail}
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+        for item in error.errors()
+    )
@@ -0,0 +1,261 @@
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Optional
+import gzip
+import io
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd support is optional
+    zstandard = None
+
+# Endpoints that accept compressed request bodies
+DECOMPRESS_ENDPOINTS = {
+    ("POST", "/api/sync/batch"),
+    ("POST", "/api/sync/delta"),
+    ("POST", "/api/surveys"),
+}
+
+# Never compressed: already compressed or must reach the client unbuffered
+SKIP_COMPRESSION_TYPES = ("text/event-stream", "image/", "application/gzip", "application/zstd")
+
+READ_SIZE = 64 * 1024
+
+# Compressed bodies above this size are decoded in the threadpool so they
+# do not hold up the event loop
+INLINE_DECOMPRESS_MAX = 16 * 1024
+
+
+def supported_encodings() -> list:
+    """Content codings this server can decode and encode, in preference order"""
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+class RequestDecompressionMiddleware:
+    """
+    Decode gzip or zstd request bodies for DECOMPRESS_ENDPOINTS
+
+    The compressed body and the decompressed output are both capped at
+    max_body_size, so a small compressed body cannot expand into a huge
+    one (413). Unknown codings get 415 and corrupt data gets 400. Bodies
+    above INLINE_DECOMPRESS_MAX are decoded in the threadpool.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = headers.get("content-encoding", "identity").strip().lower()
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        if (scope["method"], scope["path"].rstrip("/")) not in DECOMPRESS_ENDPOINTS \
+                or encoding not in supported_encodings():
+            await _error(scope, receive, send, 415, f"Content-Encoding '{encoding}' is not supported here")
+            return
+
+        compressed = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            compressed += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(compressed) > self.max_body_size:
+                await _error(scope, receive, send, 413, "Request body too large")
+                return
+
+        try:
+            if len(compressed) > INLINE_DECOMPRESS_MAX:
+                body = await run_in_threadpool(_decompress, encoding, bytes(compressed), self.max_body_size)
+            else:
+                body = _decompress(encoding, bytes(compressed), self.max_body_size)
+        except _TooLarge:
+            await _error(scope, receive, send, 413, "Decompressed request body too large")
+            return
+        except Exception:
+            await _error(scope, receive, send, 400, f"Invalid {encoding} request body")
+            return
+
+        new_headers = MutableHeaders(scope=scope)
+        del new_headers["content-encoding"]
+        new_headers["content-length"] = str(len(body))
+
+        sent = False
+
+        async def receive_decompressed() -> Message:
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_decompressed, send)
+
+
+class ResponseCompressionMiddleware:
+    """
+    Compress responses with the best coding the client accepts (zstd, gzip)
+
+    Complete bodies smaller than minimum_size are sent as they are. Streamed
+    bodies are compressed chunk by chunk and flushed after every chunk, so
+    NDJSON progress lines still reach the client as they are produced.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024,
+                 gzip_level: int = 6, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding, self.minimum_size,
+                                          self.gzip_level, self.zstd_level)
+        await self.app(scope, receive, responder.send)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the preferred supported coding from an Accept-Encoding header"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        if not part.strip():
+            continue
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    candidates = [
+        coding for coding in supported_encodings()
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda coding: accepted.get(coding, accepted.get("*", 0.0)))
+
+
+# ============= Helper Functions =============
+
+class _TooLarge(Exception):
+    pass
+
+
+def _decompress(encoding: str, data: bytes, limit: int) -> bytes:
+    """Decompress data in bounded reads, raising _TooLarge past limit bytes"""
+    if encoding == "gzip":
+        reader = gzip.GzipFile(fileobj=io.BytesIO(data))
+    else:
+        reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data))
+
+    output = bytearray()
+    with reader:
+        while True:
+            piece = reader.read(READ_SIZE)
+            if not piece:
+                break
+            output += piece
+            if len(output) > limit:
+                raise _TooLarge()
+    return bytes(output)
+
+
+async def _error(scope: Scope, receive: Receive, send: Send, status_code: int, detail: str) -> None:
+    response = JSONResponse(status_code=status_code, content={"detail": detail})
+    await response(scope, receive, send)
+
+
+class _CompressingResponder:
+    """Wraps `send` to compress the response body on the fly"""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int,
+                 gzip_level: int, zstd_level: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.start_message: Optional[Message] = None
+        self.active = False  # compressing this response
+        self.started = False  # start message forwarded
+        self.compressor = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.started and not self.active:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = Headers(raw=self.start_message["headers"])
+            self.active = (
+                "content-encoding" not in headers
+                and self.start_message["status"] not in (204, 304)
+                and not headers.get("content-type", "").startswith(SKIP_COMPRESSION_TYPES)
+                and (more_body or len(body) >= self.minimum_size)
+            )
+            if not self.active:
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.compressor = self._new_compressor()
+            new_headers = MutableHeaders(raw=self.start_message["headers"])
+            new_headers["Content-Encoding"] = self.encoding
+            new_headers.add_vary_header("Accept-Encoding")
+            # The compressed bytes differ from the identity representation,
+            # so a strong validator becomes weak (If-None-Match compares weakly)
+            etag = new_headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                new_headers["ETag"] = f"W/{etag}"
+            del new_headers["content-length"]
+            await self._send(self.start_message)
+
+        if more_body:
+            chunk = self.compressor.compress(body) + self._flush()
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _new_compressor(self):
+        if self.encoding == "zstd":
+            return zstandard.ZstdCompressor(level=self.zstd_level).compressobj()
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def _flush(self) -> bytes:
+        if self.encoding == "zstd":
+            return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
@@ -1,29 +1,25 @@
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import jwt
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.models import User
 from ..schemas.schemas import TokenData
 from ..config import settings
+from ..services.principals import principal_cache, revocations
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+def decode_principal(token: str) -> TokenData:
     """
-    Dependency to get current authenticated user from JWT token
+    Verify a JWT access token and return the caller it describes
     
-    Usage in routes:
-        @router.get("/protected")
-        def protected_route(current_user: User = Depends(get_current_user)):
-            return {"user": current_user.username}
+    Raises 401 for invalid, expired or revoked tokens.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,15 +36,76 @@ async def get_current_user(
         if username is None or user_id is None:
             raise credentials_exception
         
-        token_data = TokenData(username=username, user_id=user_id)
+        principal = TokenData(
+            username=username,
+            user_id=user_id,
+            role=payload.get("role"),
+            panchayat_id=payload.get("panchayat_id"),
+            token_version=payload.get("ver", 0)
+        )
     except jwt.InvalidTokenError:
         raise credentials_exception
     
-    # Fetch user from database
-    user = db.query(User).filter(User.user_id == token_data.user_id).first()
+    if revocations.is_revoked(principal.user_id, principal.token_version):
+        raise credentials_exception
+    
+    return principal
+
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> TokenData:
+    """
+    Dependency for the authenticated caller, from the signed token claims
+    
+    Carries user_id, username, role and panchayat_id, which is all the
+    authorization checks need, without touching the database. Deactivating
+    or deleting a user revokes their tokens, so no is_active check is
+    needed either. Use get_current_user when the full profile is required.
+    """
+    principal = decode_principal(token)
+    
+    if principal.role is None:
+        # Token issued before role claims were added
+        user = await load_current_user(principal.user_id, db)
+        principal = principal.model_copy(update={"role": user.role, "panchayat_id": user.panchayat_id})
+    
+    return principal
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    Dependency to get current authenticated user from JWT token
+    
+    Usage in routes:
+        @router.get("/protected")
+        def protected_route(current_user: User = Depends(get_current_user)):
+            return {"user": current_user.username}
     
+    The user is a detached snapshot from the principal cache (no password
+    hash, no session); load it again to modify it.
+    """
+    principal = decode_principal(token)
+    return await load_current_user(principal.user_id, db)
+
+
+async def load_current_user(user_id: str, db: AsyncSession) -> User:
+    """Cached principal, or fetch user from database"""
+    user = principal_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        generation = principal_cache.generation()
+        db_user = await db.get(User, user_id)
+        if db_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user = principal_cache.put(db_user, generation)
     
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -56,6 +113,19 @@ async def get_current_user(
     return user
 
 
+async def get_event_stream_user(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+) -> TokenData:
+    """
+    Like get_current_principal, but also accepts the token as ?access_token=
+    
+    Browsers' EventSource cannot send an Authorization header.
+    """
+    return await get_current_principal(token or access_token or "", db)
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -65,7 +135,7 @@ async def get_current_active_user(
     return current_user
 
 
-def check_admin_role(current_user: User = Depends(get_current_user)):
+def check_admin_role(current_user: TokenData = Depends(get_current_principal)) -> TokenData:
     """Dependency to check if user has admin role"""
     if current_user.role not in ["admin", "block_officer"]:
         raise HTTPException(
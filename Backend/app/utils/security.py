@@ -15,6 +15,17 @@ def get_password_hash(password: str) -> str:
     return pbkdf2_sha256.hash(password)
 
 
+def user_claims(user, token_version: int) -> dict:
+    """Claims identifying and authorizing a user, signed into access tokens"""
+    return {
+        "sub": user.username,
+        "user_id": user.user_id,
+        "role": user.role,
+        "panchayat_id": user.panchayat_id,
+        "ver": token_version
+    }
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create JWT access token
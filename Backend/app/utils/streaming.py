@@ -0,0 +1,56 @@
+from typing import AsyncIterator, Any
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+import json
+
+# Longest single NDJSON line accepted from a client (one survey)
+MAX_NDJSON_LINE_BYTES = 1024 * 1024
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Streaming response for newline-delimited JSON
+
+    Starlette's StreamingResponse listens for disconnects by reading from
+    `receive`, which would swallow request body chunks. This response only
+    streams, so the body iterator can keep reading the request while results
+    are already being sent back.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Split a byte stream into NDJSON lines as they arrive
+
+    Blank lines are skipped. Only one partial line is buffered at a time,
+    and it is bounded by MAX_NDJSON_LINE_BYTES.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline == -1:
+                break
+            line, buffer = buffer[:newline].strip(), buffer[newline + 1:]
+            if line:
+                yield line
+
+        if len(buffer) > MAX_NDJSON_LINE_BYTES:
+            raise ValueError(f"NDJSON line exceeds {MAX_NDJSON_LINE_BYTES} bytes")
+
+    buffer = buffer.strip()
+    if buffer:
+        yield buffer
+
+
+def ndjson_line(data: Any) -> bytes:
+    """Serialize one object as an NDJSON line"""
+    return (json.dumps(data, default=str) + "\n").encode("utf-8")
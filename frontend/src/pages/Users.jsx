@@ -27,7 +27,7 @@ const Users = () => {
   const fetchUsersData = async () => {
     try {
       setLoading(true);
-      const response = await api.get('/api/users/overview');
+      const response = await api.get('/api/users/overview', { params: { limit: 500 } });
       setUsersData(response.data);
     } catch (error) {
       console.error('Error fetching users:', error);
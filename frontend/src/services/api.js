@@ -21,12 +21,49 @@ api.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+// One refresh at a time: a refresh token works only once, so concurrent
+// 401s must share the same exchange
+let refreshing = null;
+
+function refreshAccessToken() {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    return Promise.reject(new Error('No refresh token'));
+  }
+  if (!refreshing) {
+    refreshing = axios
+      .post(`${API_BASE_URL}/api/auth/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('access_token', response.data.access_token);
+        localStorage.setItem('refresh_token', response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+}
+
 // Response interceptor to handle errors
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const request = error.config;
+    if (error.response?.status === 401 && request && !request._retried && !request.url?.includes('/api/auth/login')) {
+      // Access tokens are short-lived; renew once and retry
+      request._retried = true;
+      try {
+        const token = await refreshAccessToken();
+        request.headers.Authorization = `Bearer ${token}`;
+        return api(request);
+      } catch {
+        // Fall through to sign-out
+      }
+    }
     if (error.response?.status === 401) {
       localStorage.removeItem('access_token');
+      localStorage.removeItem('refresh_token');
       localStorage.removeItem('user_info');
       window.location.href = '/login';
     }
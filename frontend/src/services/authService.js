@@ -12,9 +12,10 @@ export const authService = {
       },
     });
 
-    const { access_token, user_info, panchayat_info } = response.data;
+    const { access_token, refresh_token, user_info, panchayat_info } = response.data;
     
     localStorage.setItem('access_token', access_token);
+    localStorage.setItem('refresh_token', refresh_token);
     localStorage.setItem('user_info', JSON.stringify(user_info));
     if (panchayat_info) {
       localStorage.setItem('panchayat_info', JSON.stringify(panchayat_info));
@@ -42,6 +43,7 @@ export const authService = {
     } finally {
       // Always clear local storage, even if API call fails
       localStorage.removeItem('access_token');
+      localStorage.removeItem('refresh_token');
       localStorage.removeItem('user_info');
       localStorage.removeItem('panchayat_info');
     }
@@ -68,6 +70,11 @@ export const authService = {
         new_password: newPassword
       }
     });
+    // Older tokens are revoked by the password change
+    if (response.data.access_token) {
+      localStorage.setItem('access_token', response.data.access_token);
+      localStorage.setItem('refresh_token', response.data.refresh_token);
+    }
     return response.data;
   },
 };
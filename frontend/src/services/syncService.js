@@ -304,6 +304,7 @@ class SyncService {
         await indexedDBService.updateSurvey(localSurvey.id, {
           synced: true,
           synced_at: new Date().toISOString(),
+          version: response.data.version, // sent back as the write guard next time
         }, false); // false = don't add to sync queue!
       }
       
@@ -365,6 +366,7 @@ class SyncService {
         await indexedDBService.updateSurvey(localSurvey.id, {
           synced: true,
           synced_at: new Date().toISOString(),
+          version: response.data.version, // sent back as the write guard next time
         }, false); // false = don't add to sync queue!
       }
       